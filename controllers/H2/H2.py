@@ -1,35 +1,69 @@
+import os
 import numpy as np
-import skfuzzy as fuzz
-import csv
-from skfuzzy import control as ctrl
 from controller import Robot, Camera
-import cv2
-
-class CustomCamera:
-    def __init__(self, camera):
-        self.camera = camera
-        self.width = int(self.camera.getWidth())
-        self.height = int(self.camera.getHeight())
-        self.image_data = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-
-    def getImage(self):
-        res = self.camera.getImageArray()
-        if res is not None:
-            self.image_data = np.array(res, dtype=np.uint8)
-        return self.image_data
-        
-    def displayImage(self):
-        # Convert BGR to RGB
-        rgb_image = cv2.cvtColor(self.image_data, cv2.COLOR_BGR2RGB)
-        cv2.imshow('Camera Image', rgb_image)
-        cv2.waitKey(1)
+from obstacle_avoidance.behaviours import BehaviourStack
+from obstacle_avoidance.cache import ArtifactCache
+from obstacle_avoidance.camera import CustomCamera
+from obstacle_avoidance.display import DisplaySink
+from obstacle_avoidance.engines import build_engine, engine_key
+from obstacle_avoidance.parameters import DEFAULT_OVERRIDE_THRESHOLD, apply_terms, load_parameters
+from obstacle_avoidance.pipeline import VisionPipeline
+from obstacle_avoidance.profiling import NULL_PROFILER, StageProfiler
+from obstacle_avoidance.runtime import lazy_import
+from obstacle_avoidance.scheduler import StepScheduler
+from obstacle_avoidance.vision import WindowedBlobTracker
+from obstacle_avoidance.telemetry import PERFORMANCE_COLUMNS, TelemetryRecorder
+
+# Imported on first use: skfuzzy only to build the fuzzy system, cv2 on the first frame
+fuzz = lazy_import('skfuzzy')
+ctrl = lazy_import('skfuzzy.control')
+cv2 = lazy_import('cv2')
+
+# Fuzzy inference engine: 'skfuzzy', 'lut' (precompiled control surface), 'active'
+# (exact, evaluates only the rules the inputs can fire, see obstacle_avoidance.activerules) or 'fixed'
+# (integer-only rules on 8-bit inputs, see obstacle_avoidance.fixedpoint)
+FUZZY_ENGINE = 'skfuzzy'
+LUT_RESOLUTION = 21
+# Keep the 'lut', 'active' or 'fixed' engine on disk between launches, a warm start does not import
+# skfuzzy (see obstacle_avoidance.engines)
+LUT_CACHE = True
+# Camera acquisition: 'array' (getImageArray) or 'buffer' (zero-copy getImage)
+CAMERA_MODE = 'array'
+# Camera preview: 'inline' (every frame, in the loop), 'none', 'throttled' (background thread, DISPLAY_RATE Hz)
+# or 'disk' (every 10th frame to frames/)
+DISPLAY_MODE = 'inline'
+DISPLAY_RATE = 10
+# Blob search: 'components' or 'contours' (see obstacle_avoidance.vision)
+TRACKER_METHOD = 'components'
+# Search a window around the last target position instead of every full frame
+WINDOWED_TRACKING = False
+# Run the blob search on a worker thread, acting on the previous frame's result
+PIPELINED_VISION = False
+# Time each stage of the loop, summary written next to the CSV at shutdown
+PROFILE_STAGES = False
+# Blob search every VISION_EVERY steps, the last result is reused in between (see obstacle_avoidance.scheduler)
+VISION_EVERY = 1
+# Print the sensor and motor values every CONSOLE_EVERY steps
+CONSOLE_EVERY = 1
+# Tuned override threshold and membership functions (see tools/tune_membership.py, tuned for the CRUISE below),
+# None for the hand-picked ones
+FUZZY_PARAMS = None
+# Lowest-priority behaviour: 'straight' (drive ahead, what the obstacle override always left) or 'fuzzy'
+# (the fuzzy speeds, computed only on the steps no higher behaviour fires, see obstacle_avoidance.behaviours)
+CRUISE = 'straight'
 
 class FuzzyController:
-    def __init__(self):
+    def __init__(self, fuzzy_engine='skfuzzy', lut_resolution=21, lut_cache=True, camera_mode='array',
+                 tracker_method='components', windowed_tracking=False,
+                 pipelined_vision=False, profile_stages=False,
+                 display_mode='inline', display_rate=10, vision_every=1, console_every=1,
+                 fuzzy_params=None, cruise='straight'):
+        if cruise not in ('straight', 'fuzzy'):
+            raise ValueError("Unknown cruise '{}', expected one of {}".format(cruise, ['straight', 'fuzzy']))
         self.robot = Robot()
 
-        # Initialize data storage
-        self.data = []
+        # Initialize data storage, streamed to disk in fixed-size chunks
+        self.recorder = TelemetryRecorder(PERFORMANCE_COLUMNS, 'robot_performance_data.col')
 
         # Definisi waktu langkah dasar
         self.TIME_STEP = int(self.robot.getBasicTimeStep())
@@ -43,6 +77,8 @@ class FuzzyController:
             sensor = self.robot.getDevice(name)
             sensor.enable(self.TIME_STEP)
             self.ps.append(sensor)
+        # Readings of this step, shared by the behaviours
+        self.ps_values = [0.0] * len(self.ps)
 
         # Motors
         self.left_motor = self.robot.getDevice('left wheel motor')
@@ -55,12 +91,54 @@ class FuzzyController:
         # Camera
         camera_device = self.robot.getDevice('camera')
         camera_device.enable(self.TIME_STEP)
-        self.camera = CustomCamera(camera_device)
+        self.camera = CustomCamera(camera_device, mode=camera_mode)
+        self.display = DisplaySink(display_mode, rate=display_rate)
+        # Blue target tracker, ignores single-pixel specks like the old contour search
+        self.blob_tracker = WindowedBlobTracker(method=tracker_method, min_area=1)
+        self.windowed_tracking = windowed_tracking
+        self.vision = VisionPipeline(self.findBlob) if pipelined_vision else None
+        self.profiler = StageProfiler(self.TIME_STEP) if profile_stages else NULL_PROFILER
+
+        # Loop tasks, run in this order on the steps they are due
+        self.blob = None
+        self.scheduler = StepScheduler(self.TIME_STEP)
+        self.scheduler.add('vision', self.visionStep, every=vision_every)
+        self.scheduler.add('control', self.controlStep)
+        self.scheduler.add('console', self.consoleStep, every=console_every)
+
+        # Tuned membership functions and the reading above which the robot turns away
+        self.fuzzy_params = load_parameters(fuzzy_params, cruise, 'H2', 'front') if fuzzy_params else None
+        self.override_threshold = (self.fuzzy_params['override_threshold'] if self.fuzzy_params
+                                   else DEFAULT_OVERRIDE_THRESHOLD)
+
+        # Behaviours, highest priority first, only the first one that fires is computed
+        self.behaviours = BehaviourStack()
+        self.behaviours.add('target_stop', lambda: (0, 0), self.targetClose)
+        self.behaviours.add('follow_target', self.followTarget, lambda: self.blob is not None)
+        self.behaviours.add('avoid_right', lambda: (-1, 1), self.obstacleRight)
+        self.behaviours.add('avoid_left', lambda: (1, -1), self.obstacleLeft)
+        if cruise == 'fuzzy':
+            self.behaviours.add('fuzzy_cruise', self.fuzzyCruise, self.inputsInRange)
+        self.behaviours.add('cruise', lambda: (1, 1))
 
         # Define the Control System Simulation attribute
         self.speeding = None
+        self.fuzzy_engine = fuzzy_engine
+        self.lut_resolution = lut_resolution
+        self.lut_cache = lut_cache
+        self.lut = None
 
     def initFuzzySystem(self):
+        if self.fuzzy_engine == 'skfuzzy':
+            self.speeding = ctrl.ControlSystemSimulation(self.buildFuzzySystem())
+            return
+
+        # Compiled once, then loaded from the cache until this file or the parameters change
+        self.lut = build_engine(self.fuzzy_engine, self.buildFuzzySystem, ('left_distance', 'right_distance'),
+                                ('left_speed', 'right_speed'), engine_key(__file__, self.fuzzy_params),
+                                cache=ArtifactCache() if self.lut_cache else None, resolution=self.lut_resolution)
+
+    def buildFuzzySystem(self):
         # Input Variables
         self.left_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'left_distance')
         self.right_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'right_distance')
@@ -77,7 +155,18 @@ class FuzzyController:
 
         # Control System
         self.speed_ctrl = ctrl.ControlSystem([self.rule1, self.rule2, self.rule3, self.rule4, self.rule5, self.rule6, self.rule7, self.rule8, self.rule9])
-        self.speeding = ctrl.ControlSystemSimulation(self.speed_ctrl)
+        return self.speed_ctrl
+
+    def computeSpeeds(self, left_distance_input, right_distance_input):
+        if self.lut is not None:
+            return self.lut.compute(left_distance_input, right_distance_input)
+
+        self.speeding.input['left_distance'] = left_distance_input
+        self.speeding.input['right_distance'] = right_distance_input
+
+        self.speeding.compute()
+
+        return self.speeding.output['left_speed'], self.speeding.output['right_speed']
 
     def initMembershipFunctions(self):
         # Left Distance
@@ -100,6 +189,10 @@ class FuzzyController:
         self.right_speed['sedangR'] = fuzz.trapmf(self.right_speed.universe, [-0.5, 0, 0, 0.5])
         self.right_speed['cepatR'] = fuzz.trapmf(self.right_speed.universe, [0, 0.5, 1, 1])
 
+        if self.fuzzy_params is not None:
+            apply_terms([self.left_distance, self.right_distance, self.left_speed, self.right_speed],
+                        self.fuzzy_params['terms'])
+
     def initRules(self):
         # Rules
         self.rule1 = ctrl.Rule(self.left_distance['dekatL'] & self.right_distance['dekatR'], [self.left_speed['lambatL'], self.right_speed['lambatR']])
@@ -113,118 +206,129 @@ class FuzzyController:
         self.rule9 = ctrl.Rule(self.left_distance['jauhL'] & self.right_distance['jauhR'], [self.left_speed['cepatL'], self.right_speed['cepatR']])
 
     def run(self):
+        profiler = self.profiler
         while self.robot.step(self.TIME_STEP) != -1:
-            # Get camera image data
-            camera_image = self.camera.getImage()
-            # Display the camera image
-            self.camera.displayImage()
-            
-            # Convert the image to HSV color space
-            hsv_image = cv2.cvtColor(camera_image, cv2.COLOR_BGR2HSV)
-            
-            # Define the range of blue color in HSV color space
-            lower_blue = np.array([110, 50, 50])  # Lower bound of blue color range in HSV
-            upper_blue = np.array([130, 255, 255])  # Upper bound of blue color range in HSV
-            
-            # Create a mask for blue
-            mask = cv2.inRange(hsv_image, lower_blue, upper_blue)
-            
-            # Find contours of the blue object
-            contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Draw contours and find the largest one
-            largest_contour = None
-            max_area = 0
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > max_area:
-                    max_area = area
-                    largest_contour = contour
-            
-            if largest_contour is not None:
-                # Compute the center of the largest contour
-                M = cv2.moments(largest_contour)
-                if M["m00"] != 0:
-                    object_x = int(M["m10"] / M["m00"])
-                    object_y = int(M["m01"] / M["m00"])
-                    cv2.circle(camera_image, (object_x, object_y), 5, (0, 255, 0), -1)
-                    print(object_y)
-                    print(object_x)
-                    
-                    # Get the image width
-                    height, width, _ = camera_image.shape
-                    img_center_x = width // 2
-                    
-                    # Draw the vertical center line
-                    cv2.line(camera_image, (img_center_x, 0), (img_center_x, height), (0, 255, 0), 1)
-                    
-                    # Additional logic based on the centroid
-                    left_distance_input = self.ps[7].getValue()
-                    right_distance_input = self.ps[0].getValue()
-                    if left_distance_input < 10 or right_distance_input < 10:
-                        self.left_motor.setVelocity(0)
-                        self.right_motor.setVelocity(0)
-                    else:
-                        if object_x < self.camera.width // 3:
-                            self.left_motor.setVelocity(-self.Max)
-                            self.right_motor.setVelocity(self.Max)
-                        elif object_x > 2 * self.camera.width // 3:
-                            self.left_motor.setVelocity(self.Max)
-                            self.right_motor.setVelocity(-self.Max)
-                        else:
-                            self.left_motor.setVelocity(self.Max)
-                            self.right_motor.setVelocity(self.Max)
-                else:
-                    self.left_motor.setVelocity(0)
-                    self.right_motor.setVelocity(0)
-            else:
-                # Get sensor data
-                ps_values = [sensor.getValue() for sensor in self.ps]
-                left_distance_input = ps_values[7]  # Using ps7 sensor
-                right_distance_input = ps_values[0]  # Using ps0 sensor
-
-                if 0 <= left_distance_input <= 100 and 0 <= right_distance_input <= 100:
-                    self.speeding.input['left_distance'] = left_distance_input
-                    self.speeding.input['right_distance'] = right_distance_input
-
-                    self.speeding.compute()
-
-                    left_speed_val = self.speeding.output['left_speed']
-                    right_speed_val = self.speeding.output['right_speed']
-                else:
-                    left_speed_val = 1
-                    right_speed_val = 1
-
-                if max(ps_values[0], ps_values[1], ps_values[2], ps_values[3]) > 100:
-                    left_speed_val = -1
-                    right_speed_val = 1
-                elif max(ps_values[4], ps_values[5], ps_values[6], ps_values[7]) > 100:
-                    left_speed_val = 1
-                    right_speed_val = -1
-                else:
-                    left_speed_val = 1
-                    right_speed_val = 1
-
-                self.left_motor.setVelocity(left_speed_val * self.Max)
-                self.right_motor.setVelocity(right_speed_val * self.Max)
-
-            # Record data
-            self.data.append([left_distance_input, right_distance_input, left_speed_val * self.Max, right_speed_val * self.Max])
-
-            print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
-            print("Nilai Sensor Jarak:", [round(val, 2) for val in ps_values])
-            print("Kecepatan Motor Kiri:", left_speed_val * self.Max)
-            print("Kecepatan Motor Kanan:", right_speed_val * self.Max)
-            print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+            profiler.start_step()
+            self.scheduler.run_step()
+            profiler.end_step()
+
+        self.display.close()
+        if self.vision is not None:
+            self.vision.close()
+            print(self.vision.summary())
+
+    def visionStep(self):
+        profiler = self.profiler
+        # Get camera image data
+        camera_image = self.camera.getImage()
+        profiler.mark('acquire')
+        # Find the largest blue blob, near the last one when tracking
+        if self.vision is not None:
+            # Result of the previous frame, this one is processed during the next step
+            blob = self.vision.submit(camera_image)
+        elif self.windowed_tracking:
+            blob = self.blob_tracker.track(camera_image)
+        else:
+            mask = self.blob_tracker.segment(self.camera.getHSV())
+            profiler.mark('hsv_mask')
+            blob = self.blob_tracker.search(mask)
+        self.blob = blob
+        profiler.mark('search')
+
+        # Display the camera image, overlays are only drawn on frames that are shown
+        if self.display.wants_frame():
+            frame = self.camera.displayFrame()
+            if blob is not None:
+                cv2.circle(frame, (blob.x, blob.y), 5, (0, 255, 0), -1)
+                # Draw the vertical center line
+                height, width, _ = frame.shape
+                img_center_x = width // 2
+                cv2.line(frame, (img_center_x, 0), (img_center_x, height), (0, 255, 0), 1)
+            self.display.show(frame)
+        profiler.mark('display')
+
+    def targetClose(self):
+        ps_values = self.ps_values
+        return self.blob is not None and (ps_values[7] < 10 or ps_values[0] < 10)
+
+    def followTarget(self):
+        # Turn towards the third of the image the target is in
+        if self.blob.x < self.camera.width // 3:
+            return -1, 1
+        if self.blob.x > 2 * self.camera.width // 3:
+            return 1, -1
+        return 1, 1
+
+    def obstacleRight(self):
+        ps_values = self.ps_values
+        return max(ps_values[0], ps_values[1], ps_values[2], ps_values[3]) > self.override_threshold
+
+    def obstacleLeft(self):
+        ps_values = self.ps_values
+        return max(ps_values[4], ps_values[5], ps_values[6], ps_values[7]) > self.override_threshold
+
+    def inputsInRange(self):
+        ps_values = self.ps_values
+        return 0 <= ps_values[7] <= 100 and 0 <= ps_values[0] <= 100
+
+    def fuzzyCruise(self):
+        ps_values = self.ps_values
+        return self.computeSpeeds(ps_values[7], ps_values[0])
+
+    def controlStep(self):
+        profiler = self.profiler
+        # Get sensor data
+        self.ps_values = ps_values = [sensor.getValue() for sensor in self.ps]
+        left_distance_input = ps_values[7]  # Using ps7 sensor
+        right_distance_input = ps_values[0]  # Using ps0 sensor
+        profiler.mark('sensors')
+
+        left_speed_val, right_speed_val = self.behaviours.run_step()
+        profiler.mark('behaviours')
+
+        self.left_motor.setVelocity(left_speed_val * self.Max)
+        self.right_motor.setVelocity(right_speed_val * self.Max)
+        profiler.mark('motors')
+
+        # Record data
+        self.left_speed_val = left_speed_val
+        self.right_speed_val = right_speed_val
+        self.recorder.append([left_distance_input, right_distance_input, left_speed_val * self.Max, right_speed_val * self.Max])
+        profiler.mark('logging')
+
+    def consoleStep(self):
+        if self.blob is not None:
+            print(self.blob.y)
+            print(self.blob.x)
+        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+        print("Nilai Sensor Jarak:", [round(val, 2) for val in self.ps_values])
+        print("Kecepatan Motor Kiri:", self.left_speed_val * self.Max)
+        print("Kecepatan Motor Kanan:", self.right_speed_val * self.Max)
+        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+        self.profiler.mark('console')
+
+    def findBlob(self, image):
+        # Runs on the vision worker thread, so it must not touch the camera buffers
+        if self.windowed_tracking:
+            return self.blob_tracker.track(image)
+        return self.blob_tracker.find(cv2.cvtColor(image, cv2.COLOR_BGR2HSV))
 
     def save_data(self, filename='robot_performance_data.csv'):
-        with open(filename, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Left Distance", "Right Distance", "Left Speed", "Right Speed"])
-            writer.writerows(self.data)
+        self.recorder.export_csv(filename)
+        report = self.profiler.dump(os.path.splitext(filename)[0] + '_stages.json')
+        if report:
+            print(report)
+        print(self.scheduler.report())
+        print(self.behaviours.report())
 
 if __name__ == "__main__":
-    controller = FuzzyController()
+    controller = FuzzyController(fuzzy_engine=FUZZY_ENGINE, lut_resolution=LUT_RESOLUTION, lut_cache=LUT_CACHE,
+                                 camera_mode=CAMERA_MODE, tracker_method=TRACKER_METHOD,
+                                 windowed_tracking=WINDOWED_TRACKING,
+                                 pipelined_vision=PIPELINED_VISION, profile_stages=PROFILE_STAGES,
+                                 display_mode=DISPLAY_MODE, display_rate=DISPLAY_RATE,
+                                 vision_every=VISION_EVERY, console_every=CONSOLE_EVERY,
+                                 fuzzy_params=FUZZY_PARAMS, cruise=CRUISE)
     controller.initFuzzySystem()
     controller.run()
     controller.save_data()
\ No newline at end of file
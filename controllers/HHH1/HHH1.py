@@ -4,6 +4,20 @@ import numpy as np
 import skfuzzy as fuzz
 from skfuzzy import control as ctrl
 import csv
+from obstacle_avoidance.display import DisplaySink
+from obstacle_avoidance.pipeline import VisionPipeline
+from obstacle_avoidance.vision import WindowedBlobTracker
+
+# Blob search: 'components' or 'contours' (see obstacle_avoidance.vision)
+TRACKER_METHOD = 'components'
+# Search a window around the last target position instead of every full frame
+WINDOWED_TRACKING = False
+# Run the blob search on a worker thread, acting on the previous frame's result
+PIPELINED_VISION = False
+# Camera preview: 'inline' (every frame, in the loop), 'none', 'throttled' (background thread, DISPLAY_RATE Hz)
+# or 'disk' (every 10th frame to frames/)
+DISPLAY_MODE = 'inline'
+DISPLAY_RATE = 10
 
 # create the Robot instance.
 robot = Robot()
@@ -13,6 +27,18 @@ def run_robot(robot):
     
     camera = robot.getDevice("camera")
     camera.enable(timestep)
+    # Blue target tracker, reuses its bounds and mask buffer between steps
+    blob_tracker = WindowedBlobTracker(method=TRACKER_METHOD, min_area=1)
+
+    def find_blob(img):
+        if WINDOWED_TRACKING:
+            return blob_tracker.track(img)
+        # Convert BGR image to HSV
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        return blob_tracker.find(hsv)
+
+    vision = VisionPipeline(find_blob) if PIPELINED_VISION else None
+    display = DisplaySink(DISPLAY_MODE, rate=DISPLAY_RATE, window="Camera View")
     
     ds = []
     dsNames = ['left infrared sensor','front left infrared sensor', 'front infrared sensor',
@@ -85,67 +111,44 @@ def run_robot(robot):
                 img = np.frombuffer(img, np.uint8).reshape((camera.getHeight(), camera.getWidth(), 4))
                 img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
                 
-                # Convert BGR image to HSV
-                hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-                
-                # Define range of blue color in HSV
-                lower_blue = np.array([110, 50, 50])
-                upper_blue = np.array([130, 255, 255])
-                
-                # Create masks for blue color
-                mask = cv2.inRange(hsv, lower_blue, upper_blue)
-                
-                # Find contours
-                contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-                
-                # Draw contours and find the largest one
-                largest_contour = None
-                max_area = 0
-                for contour in contours:
-                    area = cv2.contourArea(contour)
-                    if area > max_area:
-                        max_area = area
-                        largest_contour = contour
+                # Find the largest blue blob, near the last one when tracking
+                if vision is not None:
+                    # Result of the previous frame, this one is processed during the next step
+                    blob = vision.submit(img)
+                else:
+                    blob = find_blob(img)
                 
-                if largest_contour is not None:
-                    # Compute the center of the largest contour
-                    M = cv2.moments(largest_contour)
-                    if M["m00"] != 0:
-                        object_x = int(M["m10"] / M["m00"])
-                        object_y = int(M["m01"] / M["m00"])
-                        cv2.circle(img, (object_x, object_y), 5, (0, 255, 0), -1)
-                        print(object_y)
-                        print(object_x)
-                        # Get the image width
-                        height, width, _ = img.shape
-                        img_center_x = width // 2
-                        
-                        # Draw the vertical center line
-                        cv2.line(img, (img_center_x, 0), (img_center_x, height), (0, 255, 0), 1)
-                        
-                        # Calculate the error between the center of the object and the center of the image
-                        error_value = img_center_x - object_x
-                        d_error = error_value - e_prev
-                        e_prev = error_value
+                if blob is not None:
+                    object_x, object_y = blob.x, blob.y
+                    print(object_y)
+                    print(object_x)
+                    # Get the image width
+                    height, width, _ = img.shape
+                    img_center_x = width // 2
+                    
+                    # Calculate the error between the center of the object and the center of the image
+                    error_value = img_center_x - object_x
+                    d_error = error_value - e_prev
+                    e_prev = error_value
 
-                        # Set the fuzzy input
-                        speed.input['error'] = error_value
-                        speed.input['delta_error'] = d_error
+                    # Set the fuzzy input
+                    speed.input['error'] = error_value
+                    speed.input['delta_error'] = d_error
 
-                        # Compute the fuzzy output
-                        speed.compute()
-                        
-                        # Get the fuzzy output for wheel speeds
-                        l_speed = speed.output['left_speed']
-                        r_speed = speed.output['right_speed']
+                    # Compute the fuzzy output
+                    speed.compute()
+                    
+                    # Get the fuzzy output for wheel speeds
+                    l_speed = speed.output['left_speed']
+                    r_speed = speed.output['right_speed']
 
-                        current_time = robot.getTime()
+                    current_time = robot.getTime()
 
-                        writer.writerow([current_time, object_x, error_value, d_error, l_speed, r_speed])
+                    writer.writerow([current_time, object_x, error_value, d_error, l_speed, r_speed])
 
-                        if ds[2].getValue() >= 250:
-                            l_speed = 0
-                            r_speed = 0
+                    if ds[2].getValue() >= 250:
+                        l_speed = 0
+                        r_speed = 0
                 else:
                     # If no object is detected, use obstacle avoidance logic
                     if ds[0].getValue() >= 200:
@@ -164,11 +167,19 @@ def run_robot(robot):
                         l_speed = 8
                         r_speed = 8
                 
-                img_resized = cv2.resize(img, (0, 0), fx=0.5, fy=0.5) # Resize the image to half its original size
-                
-                # Display the image with the center line and detected object
-                cv2.imshow("Camera View", img_resized)
-                cv2.waitKey(1)
+                # Overlays and resize only for frames that are actually shown
+                if display.wants_frame():
+                    if blob is not None:
+                        cv2.circle(img, (blob.x, blob.y), 5, (0, 255, 0), -1)
+                        
+                        # Draw the vertical center line
+                        height, width, _ = img.shape
+                        cv2.line(img, (width // 2, 0), (width // 2, height), (0, 255, 0), 1)
+                    
+                    img_resized = cv2.resize(img, (0, 0), fx=0.5, fy=0.5) # Resize the image to half its original size
+                    
+                    # Display the image with the center line and detected object
+                    display.show(img_resized)
             else:
                 # Default wheel speeds if no image is received
                 l_speed = 0
@@ -178,5 +189,10 @@ def run_robot(robot):
             wheels[0].setVelocity(l_speed)
             wheels[1].setVelocity(r_speed)
 
+    display.close()
+    if vision is not None:
+        vision.close()
+        print(vision.summary())
+
 if __name__ == "__main__":
     run_robot(robot)
\ No newline at end of file
@@ -26,39 +26,44 @@ right_motor.setPosition(float('inf'))
 left_motor.setVelocity(0.0)
 right_motor.setVelocity(0.0)
 
-data = []
+# Recorded data is written to the CSV as it comes, so memory stays flat on long runs. The file is flushed every
+# FLUSH_EVERY rows (a chunk of TelemetryRecorder), so a killed run loses at most that many, and closed even if
+# the loop raises
+FLUSH_EVERY = 256
 
-# Main control loop
-while robot.step(TIME_STEP) != -1:
-    ps_values = [sensor.getValue() for sensor in ps]
+with open('data_speed.csv', 'w', newline='') as file:
+    writer = csv.writer(file)
+    writer.writerow(["Left Distance", "Right Distance", "Left Speed", "Right Speed"])
+    rows = 0
 
-    right_obstacle = ps_values[0] > 80.0 or ps_values[1] > 80.0 or ps_values[2] > 80.0
-    left_obstacle = ps_values[5] > 80.0 or ps_values[6] > 80.0 or ps_values[7] > 80.0
+    # Main control loop
+    while robot.step(TIME_STEP) != -1:
+        ps_values = [sensor.getValue() for sensor in ps]
 
-    left_speed = 0.5 * MAX_SPEED
-    right_speed = 0.5 * MAX_SPEED
+        right_obstacle = ps_values[0] > 80.0 or ps_values[1] > 80.0 or ps_values[2] > 80.0
+        left_obstacle = ps_values[5] > 80.0 or ps_values[6] > 80.0 or ps_values[7] > 80.0
 
-    if left_obstacle:
         left_speed = 0.5 * MAX_SPEED
-        right_speed = -0.5 * MAX_SPEED
-    elif right_obstacle:
-        left_speed = -0.5 * MAX_SPEED
         right_speed = 0.5 * MAX_SPEED
 
-    left_motor.setVelocity(left_speed)
-    right_motor.setVelocity(right_speed)
+        if left_obstacle:
+            left_speed = 0.5 * MAX_SPEED
+            right_speed = -0.5 * MAX_SPEED
+        elif right_obstacle:
+            left_speed = -0.5 * MAX_SPEED
+            right_speed = 0.5 * MAX_SPEED
+
+        left_motor.setVelocity(left_speed)
+        right_motor.setVelocity(right_speed)
     
-    # Record data
-    data.append([ps_values[5], ps_values[0], left_speed, right_speed])
+        # Record data
+        writer.writerow([ps_values[5], ps_values[0], left_speed, right_speed])
+        rows += 1
+        if rows % FLUSH_EVERY == 0:
+            file.flush()
     
-    print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
-    print("Nilai Sensor Jarak:", [round(val, 2) for val in ps_values])
-    print("Kecepatan Motor Kiri:", left_speed)
-    print("Kecepatan Motor Kanan:", right_speed)
-    print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
-
-# Save data to CSV file
-with open('data_speed.csv', 'w', newline='') as file:
-    writer = csv.writer(file)
-    writer.writerow(["Left Distance", "Right Distance", "Left Speed", "Right Speed"])
-    writer.writerows(data)
\ No newline at end of file
+        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+        print("Nilai Sensor Jarak:", [round(val, 2) for val in ps_values])
+        print("Kecepatan Motor Kiri:", left_speed)
+        print("Kecepatan Motor Kanan:", right_speed)
+        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
@@ -1,35 +1,55 @@
+import os
 import numpy as np
-import skfuzzy as fuzz
-import csv
-from skfuzzy import control as ctrl
 from controller import Robot, Camera
-import cv2
-
-class CustomCamera:
-    def __init__(self, camera):
-        self.camera = camera
-        self.width = int(self.camera.getWidth())
-        self.height = int(self.camera.getHeight())
-        self.image_data = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-
-    def getImage(self):
-        res = self.camera.getImageArray()
-        if res is not None:
-            self.image_data = np.array(res, dtype=np.uint8)
-        return self.image_data
-        
-    def displayImage(self):
-        # Convert BGR to RGB
-        rgb_image = cv2.cvtColor(self.image_data, cv2.COLOR_BGR2RGB)
-        cv2.imshow('Camera Image', rgb_image)
-        cv2.waitKey(1)
+from obstacle_avoidance.behaviours import BehaviourStack
+from obstacle_avoidance.cache import ArtifactCache
+from obstacle_avoidance.camera import CustomCamera
+from obstacle_avoidance.display import DisplaySink
+from obstacle_avoidance.engines import build_engine, engine_key
+from obstacle_avoidance.parameters import DEFAULT_OVERRIDE_THRESHOLD, apply_terms, load_parameters
+from obstacle_avoidance.sensors import EPUCK_GROUPS, EPUCK_SENSORS, SensorBank
+from obstacle_avoidance.profiling import NULL_PROFILER, StageProfiler
+from obstacle_avoidance.runtime import lazy_import
+from obstacle_avoidance.vision import ColorBlobTracker
+from obstacle_avoidance.telemetry import PERFORMANCE_COLUMNS, TelemetryRecorder
+
+# Imported on first use: skfuzzy only to build the fuzzy system, cv2 on the first frame
+fuzz = lazy_import('skfuzzy')
+ctrl = lazy_import('skfuzzy.control')
+cv2 = lazy_import('cv2')
+
+# Fuzzy inference engine: 'skfuzzy', 'lut' (precompiled control surface) or 'active'
+# (exact, evaluates only the rules the inputs can fire, see obstacle_avoidance.activerules)
+FUZZY_ENGINE = 'skfuzzy'
+LUT_RESOLUTION = 21
+# Keep the 'lut' or 'active' engine on disk between launches, a warm start does not import skfuzzy
+# (see obstacle_avoidance.engines)
+LUT_CACHE = True
+# Camera acquisition: 'array' (getImageArray) or 'buffer' (zero-copy getImage)
+CAMERA_MODE = 'array'
+# Camera preview: 'inline' (every frame, in the loop), 'none', 'throttled' (background thread, DISPLAY_RATE Hz)
+# or 'disk' (every 10th frame to frames/)
+DISPLAY_MODE = 'inline'
+DISPLAY_RATE = 10
+# Time each stage of the loop, summary written next to the CSV at shutdown
+PROFILE_STAGES = False
+# Tuned override threshold and membership functions (see tools/tune_membership.py, tuned for the CRUISE below),
+# None for the hand-picked ones
+FUZZY_PARAMS = None
+# Lowest-priority behaviour: 'straight' (drive ahead, what the obstacle override always left) or 'fuzzy'
+# (the fuzzy speeds, computed only on the steps no higher behaviour fires, see obstacle_avoidance.behaviours)
+CRUISE = 'straight'
 
 class FuzzyController:
-    def __init__(self):
+    def __init__(self, fuzzy_engine='skfuzzy', lut_resolution=21, lut_cache=True, camera_mode='array',
+                 display_mode='inline', display_rate=10, profile_stages=False,
+                 fuzzy_params=None, cruise='straight'):
+        if cruise not in ('straight', 'fuzzy'):
+            raise ValueError("Unknown cruise '{}', expected one of {}".format(cruise, ['straight', 'fuzzy']))
         self.robot = Robot()
 
-        # Initialize data storage
-        self.data = []
+        # Initialize data storage, streamed to disk in fixed-size chunks
+        self.recorder = TelemetryRecorder(PERFORMANCE_COLUMNS, 'robot_performance_data.col')
 
         # Definisi waktu langkah dasar
         self.TIME_STEP = int(self.robot.getBasicTimeStep())
@@ -37,12 +57,7 @@ class FuzzyController:
         self.Max = 3.14
 
         # Get devices
-        self.ps = []
-        self.ps_names = ['ps0', 'ps1', 'ps2', 'ps3', 'ps4', 'ps5', 'ps6', 'ps7']
-        for name in self.ps_names:
-            sensor = self.robot.getDevice(name)
-            sensor.enable(self.TIME_STEP)
-            self.ps.append(sensor)
+        self.ps = SensorBank(self.robot, EPUCK_SENSORS, EPUCK_GROUPS, sampling_period=self.TIME_STEP)
 
         # Motors
         self.left_motor = self.robot.getDevice('left wheel motor')
@@ -55,12 +70,55 @@ class FuzzyController:
         # Camera
         camera_device = self.robot.getDevice('camera')
         camera_device.enable(self.TIME_STEP)
-        self.camera = CustomCamera(camera_device)
+        self.camera = CustomCamera(camera_device, mode=camera_mode)
+        self.display = DisplaySink(display_mode, rate=display_rate)
+        self.profiler = StageProfiler(self.TIME_STEP) if profile_stages else NULL_PROFILER
+        # Red range in HSV, kept between steps instead of rebuilt every frame
+        self.red_tracker = ColorBlobTracker(lower=[0, 100, 100], upper=[0, 100, 50])
+
+        # Tuned membership functions and the reading above which the robot turns away
+        self.fuzzy_params = load_parameters(fuzzy_params, cruise, 'my_controller1', 'groups') if fuzzy_params else None
+        self.override_threshold = (self.fuzzy_params['override_threshold'] if self.fuzzy_params
+                                   else DEFAULT_OVERRIDE_THRESHOLD)
+
+        # Behaviours, highest priority first, only the first one that fires is computed
+        self.red_seen = False
+        self.behaviours = BehaviourStack()
+        self.behaviours.add('red_stop', lambda: (0, 0), self.redClose)
+        self.behaviours.add('avoid_right', lambda: (-1, 1), lambda: self.ps.max('right') > self.override_threshold)
+        self.behaviours.add('avoid_left', lambda: (1, -1), lambda: self.ps.max('left') > self.override_threshold)
+        if cruise == 'fuzzy':
+            self.behaviours.add('fuzzy_cruise', self.fuzzyCruise, self.inputsInRange)
+        self.behaviours.add('cruise', lambda: (1, 1))
 
         # Define the Control System Simulation attribute
         self.speeding = None
+        self.fuzzy_engine = fuzzy_engine
+        self.lut_resolution = lut_resolution
+        self.lut_cache = lut_cache
+        self.lut = None
+
+    def redClose(self):
+        # Stop if a red object is detected within 10 cm
+        return self.red_seen and (self.ps.min('left') < 10 or self.ps.min('right') < 10)
+
+    def inputsInRange(self):
+        return 0 <= self.ps.min('left') <= 100 and 0 <= self.ps.min('right') <= 100
+
+    def fuzzyCruise(self):
+        return self.computeSpeeds(self.ps.min('left'), self.ps.min('right'))
 
     def initFuzzySystem(self):
+        if self.fuzzy_engine == 'skfuzzy':
+            self.speeding = ctrl.ControlSystemSimulation(self.buildFuzzySystem())
+            return
+
+        # Compiled once, then loaded from the cache until this file or the parameters change
+        self.lut = build_engine(self.fuzzy_engine, self.buildFuzzySystem, ('left_distance', 'right_distance'),
+                                ('left_speed', 'right_speed'), engine_key(__file__, self.fuzzy_params),
+                                cache=ArtifactCache() if self.lut_cache else None, resolution=self.lut_resolution)
+
+    def buildFuzzySystem(self):
         # Input Variables
         self.left_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'left_distance')
         self.right_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'right_distance')
@@ -77,7 +135,18 @@ class FuzzyController:
 
         # Control System
         self.speed_ctrl = ctrl.ControlSystem([self.rule1, self.rule2, self.rule3, self.rule4, self.rule5, self.rule6, self.rule7, self.rule8, self.rule9])
-        self.speeding = ctrl.ControlSystemSimulation(self.speed_ctrl)
+        return self.speed_ctrl
+
+    def computeSpeeds(self, left_distance_input, right_distance_input):
+        if self.lut is not None:
+            return self.lut.compute(left_distance_input, right_distance_input)
+
+        self.speeding.input['left_distance'] = left_distance_input
+        self.speeding.input['right_distance'] = right_distance_input
+
+        self.speeding.compute()
+
+        return self.speeding.output['left_speed'], self.speeding.output['right_speed']
 
     def initMembershipFunctions(self):
         # Left Distance
@@ -100,6 +169,10 @@ class FuzzyController:
         self.right_speed['sedangR'] = fuzz.trapmf(self.right_speed.universe, [-0.5, 0, 0, 0.5])
         self.right_speed['cepatR'] = fuzz.trapmf(self.right_speed.universe, [0, 0.5, 1, 1])
 
+        if self.fuzzy_params is not None:
+            apply_terms([self.left_distance, self.right_distance, self.left_speed, self.right_speed],
+                        self.fuzzy_params['terms'])
+
     def initRules(self):
         # Rules
         self.rule1 = ctrl.Rule(self.left_distance['dekatL'] & self.right_distance['dekatR'], [self.left_speed['lambatL'], self.right_speed['lambatR']])
@@ -113,76 +186,65 @@ class FuzzyController:
         self.rule9 = ctrl.Rule(self.left_distance['jauhL'] & self.right_distance['jauhR'], [self.left_speed['cepatL'], self.right_speed['cepatR']])
 
     def run(self):
+        profiler = self.profiler
         while self.robot.step(self.TIME_STEP) != -1:
+            profiler.start_step()
             # Get camera image data
             camera_image = self.camera.getImage()
+            profiler.mark('acquire')
             # Display the camera image
-            self.camera.displayImage()
+            if self.display.wants_frame():
+                self.display.show(self.camera.displayFrame())
+            profiler.mark('display')
             
             # Convert the image to HSV color space
-            hsv_image = cv2.cvtColor(camera_image, cv2.COLOR_BGR2HSV)
-            
-            # Define the range of red color in HSV color space
-            lower_red = np.array([0, 100, 100])  # Lower bound of red color range in HSV
-            upper_red = np.array([0, 100, 50])  # Upper bound of red color range in HSV
+            hsv_image = self.camera.getHSV()
             
             # Create a mask for red 
-            mask = cv2.inRange(hsv_image, lower_red, upper_red)
+            mask = self.red_tracker.segment(hsv_image)
+            profiler.mark('hsv_mask')
             
             # Get sensor data
-            ps_values = [sensor.getValue() for sensor in self.ps]
-    
-            left_distance_input = min(ps_values[4], ps_values[5], ps_values[6], ps_values[7])
-            right_distance_input = min(ps_values[0], ps_values[1], ps_values[2], ps_values[3])
+            self.ps.update()
+            ps_values = self.ps.values
     
-            # Check for red object detection and proximity condition
-            if cv2.countNonZero(mask) > 0 and (left_distance_input < 10 or right_distance_input < 10):
-                # Stop the robot if a red object is detected within 10 cm
-                self.left_motor.setVelocity(0)
-                self.right_motor.setVelocity(0)
-            else:
-                if 0 <= left_distance_input <= 100 and 0 <= right_distance_input <= 100:
-                    self.speeding.input['left_distance'] = left_distance_input
-                    self.speeding.input['right_distance'] = right_distance_input
+            left_distance_input = self.ps.min('left')
+            right_distance_input = self.ps.min('right')
+            profiler.mark('sensors')
     
-                    self.speeding.compute()
-    
-                    left_speed_val = self.speeding.output['left_speed']
-                    right_speed_val = self.speeding.output['right_speed']
-                else:
-                    left_speed_val = 1
-                    right_speed_val = 1
-    
-                if max(ps_values[0], ps_values[1], ps_values[2], ps_values[3]) > 100:
-                    left_speed_val = -1
-                    right_speed_val = 1
-                elif max(ps_values[4], ps_values[5], ps_values[6], ps_values[7]) > 100:
-                    left_speed_val = 1
-                    right_speed_val = -1
-                else:
-                    left_speed_val = 1
-                    right_speed_val = 1
-    
-                self.left_motor.setVelocity(left_speed_val * self.Max)
-                self.right_motor.setVelocity(right_speed_val * self.Max)
+            # Check for red object detection, the proximity condition is the trigger of 'red_stop'
+            self.red_seen = cv2.countNonZero(mask) > 0
+            left_speed_val, right_speed_val = self.behaviours.run_step()
+            profiler.mark('behaviours')
+
+            self.left_motor.setVelocity(left_speed_val * self.Max)
+            self.right_motor.setVelocity(right_speed_val * self.Max)
+            profiler.mark('motors')
     
             # Record data
-            self.data.append([left_distance_input, right_distance_input, left_speed_val * self.Max, right_speed_val * self.Max])
+            self.recorder.append([left_distance_input, right_distance_input, left_speed_val * self.Max, right_speed_val * self.Max])
     
             print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
             print("Nilai Sensor Jarak:", [round(val, 2) for val in ps_values])
             print("Kecepatan Motor Kiri:", left_speed_val * self.Max)
             print("Kecepatan Motor Kanan:", right_speed_val * self.Max)
             print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+            profiler.mark('logging')
+            profiler.end_step()
+
+        self.display.close()
     
     def save_data(self, filename='robot_performance_data.csv'):
-        with open(filename, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Left Distance", "Right Distance", "Left Speed", "Right Speed"])
-            writer.writerows(self.data)
+        self.recorder.export_csv(filename)
+        report = self.profiler.dump(os.path.splitext(filename)[0] + '_stages.json')
+        if report:
+            print(report)
+        print(self.behaviours.report())
 
 if __name__ == "__main__":
-    controller = FuzzyController()
+    controller = FuzzyController(fuzzy_engine=FUZZY_ENGINE, lut_resolution=LUT_RESOLUTION, lut_cache=LUT_CACHE,
+                                 camera_mode=CAMERA_MODE, display_mode=DISPLAY_MODE, display_rate=DISPLAY_RATE,
+                                 profile_stages=PROFILE_STAGES, fuzzy_params=FUZZY_PARAMS, cruise=CRUISE)
     controller.initFuzzySystem()
     controller.run()
     controller.save_data()
\ No newline at end of file
@@ -1,15 +1,32 @@
 import numpy as np
-import skfuzzy as fuzz
-import csv
-from skfuzzy import control as ctrl
 from controller import Robot
+from obstacle_avoidance.cache import ArtifactCache
+from obstacle_avoidance.engines import build_engine, engine_key
+from obstacle_avoidance.parameters import DEFAULT_OVERRIDE_THRESHOLD, load_parameters
+from obstacle_avoidance.runtime import lazy_import
+from obstacle_avoidance.telemetry import PERFORMANCE_COLUMNS, TelemetryRecorder
+
+# Only imported to build the fuzzy system
+fuzz = lazy_import('skfuzzy')
+ctrl = lazy_import('skfuzzy.control')
+
+# Fuzzy inference engine: 'skfuzzy', 'lut' (precompiled control surface) or 'active'
+# (exact, evaluates only the rules the inputs can fire, see obstacle_avoidance.activerules)
+FUZZY_ENGINE = 'skfuzzy'
+LUT_RESOLUTION = 21
+# Keep the 'lut' or 'active' engine on disk between launches, a warm start does not import skfuzzy
+# (see obstacle_avoidance.engines)
+LUT_CACHE = True
+# Tuned override threshold (see tools/tune_membership.py --cruise straight), None for 100. The fuzzy speeds are
+# always overridden here, so tuned membership functions would change nothing and are not loaded
+FUZZY_PARAMS = None
 
 class FuzzyController:
-    def __init__(self):
+    def __init__(self, fuzzy_engine='skfuzzy', lut_resolution=21, lut_cache=True, fuzzy_params=None):
         self.robot = Robot()
 
-        # Initialize data storage
-        self.data = []
+        # Initialize data storage, streamed to disk in fixed-size chunks
+        self.recorder = TelemetryRecorder(PERFORMANCE_COLUMNS, 'robot_performance_data.col')
 
         # Definisi waktu langkah dasar
         self.TIME_STEP = int(self.robot.getBasicTimeStep())
@@ -33,7 +50,23 @@ class FuzzyController:
 
         self.left_motor.setVelocity(0.0)
         self.right_motor.setVelocity(0.0)
- # Variabel input
+        # Tuned reading above which the robot turns away
+        self.fuzzy_params = load_parameters(fuzzy_params, 'straight') if fuzzy_params else None
+        self.override_threshold = (self.fuzzy_params['override_threshold'] if self.fuzzy_params
+                                   else DEFAULT_OVERRIDE_THRESHOLD)
+
+        self.speeding = None
+        self.lut = None
+        if fuzzy_engine == 'skfuzzy':
+            self.speeding = ctrl.ControlSystemSimulation(self.buildFuzzySystem())
+        else:
+            # Compiled once, then loaded from the cache until this file changes
+            self.lut = build_engine(fuzzy_engine, self.buildFuzzySystem, ('left_distance', 'right_distance'),
+                                    ('left_speed', 'right_speed'), engine_key(__file__),
+                                    cache=ArtifactCache() if lut_cache else None, resolution=lut_resolution)
+
+    def buildFuzzySystem(self):
+        # Variabel input
         self.left_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'left_distance')
         self.right_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'right_distance')
 
@@ -72,7 +105,18 @@ class FuzzyController:
 
         # Kompilasi aturan menjadi kontroler fuzzy
         self.speed_ctrl = ctrl.ControlSystem([self.rule1, self.rule2, self.rule3, self.rule4, self.rule5, self.rule6, self.rule7, self.rule8, self.rule9])
-        self.speeding = ctrl.ControlSystemSimulation(self.speed_ctrl)
+        return self.speed_ctrl
+
+    def computeSpeeds(self, left_distance_input, right_distance_input):
+        if self.lut is not None:
+            return self.lut.compute(left_distance_input, right_distance_input)
+
+        self.speeding.input['left_distance'] = left_distance_input
+        self.speeding.input['right_distance'] = right_distance_input
+
+        self.speeding.compute()
+
+        return self.speeding.output['left_speed'], self.speeding.output['right_speed']
 
     def run(self):
         while self.robot.step(self.TIME_STEP) != -1:
@@ -82,21 +126,15 @@ class FuzzyController:
             right_distance_input = min(ps_values[0], ps_values[1], ps_values[2], ps_values[3])
 
             if 0 <= left_distance_input <= 100 and 0 <= right_distance_input <= 100:
-                self.speeding.input['left_distance'] = left_distance_input
-                self.speeding.input['right_distance'] = right_distance_input
-
-                self.speeding.compute()
-
-                left_speed_val = self.speeding.output['left_speed']
-                right_speed_val = self.speeding.output['right_speed']
+                left_speed_val, right_speed_val = self.computeSpeeds(left_distance_input, right_distance_input)
             else:
                 left_speed_val = 1
                 right_speed_val = 1
 
-            if max(ps_values[0], ps_values[1], ps_values[2], ps_values[3]) > 100:
+            if max(ps_values[0], ps_values[1], ps_values[2], ps_values[3]) > self.override_threshold:
                 left_speed_val = -1
                 right_speed_val = 1
-            elif max(ps_values[4], ps_values[5], ps_values[6], ps_values[7]) > 100:
+            elif max(ps_values[4], ps_values[5], ps_values[6], ps_values[7]) > self.override_threshold:
                 left_speed_val = 1
                 right_speed_val = -1
             else:
@@ -107,7 +145,7 @@ class FuzzyController:
             self.right_motor.setVelocity(right_speed_val * self.Max)
 
             # Record data
-            self.data.append([left_distance_input, right_distance_input, left_speed_val * self.Max, right_speed_val * self.Max])
+            self.recorder.append([left_distance_input, right_distance_input, left_speed_val * self.Max, right_speed_val * self.Max])
 
             print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
             print("Nilai Sensor Jarak:", [round(val, 2) for val in ps_values])
@@ -116,12 +154,10 @@ class FuzzyController:
             print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
 
     def save_data(self, filename='robot_performance_data.csv'):
-        with open(filename, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Left Distance", "Right Distance", "Left Speed", "Right Speed"])
-            writer.writerows(self.data)
+        self.recorder.export_csv(filename)
 
 if __name__ == "__main__":
-    controller = FuzzyController()
+    controller = FuzzyController(fuzzy_engine=FUZZY_ENGINE, lut_resolution=LUT_RESOLUTION, lut_cache=LUT_CACHE,
+                                 fuzzy_params=FUZZY_PARAMS)
     controller.run()
     controller.save_data()
\ No newline at end of file
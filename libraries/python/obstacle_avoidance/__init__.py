@@ -0,0 +1,31 @@
+"""Shared helpers for the obstacle avoidance e-puck controllers.
+
+Controllers pick this package up through the ``PYTHONPATH`` entry in their
+``runtime.ini``.
+
+The names below are imported on first use, so ``import
+obstacle_avoidance.telemetry`` does not pull in skfuzzy and scipy.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'ActiveRuleEngine': '.activerules',
+    'BatchMamdani': '.batch',
+    'AnalyticCentroid': '.defuzz',
+    'FixedPointMamdani': '.fixedpoint',
+    'FixedPointSurface': '.fixedpoint',
+    'FuzzyLookupTable': '.lut',
+    'RuleAnalysis': '.ruleanalysis',
+    'RuleMatrix': '.rulematrix',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
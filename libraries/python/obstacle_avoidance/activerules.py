@@ -0,0 +1,184 @@
+"""Evaluate only the rules that can fire for a sample.
+
+H2's three distance trapezoids overlap pairwise, so an input meets at most
+two terms, and at most four of the nine rules fire for any input pair.
+``Obstacle_Avoidance_FLC`` is sparser still.  skfuzzy, ``BatchMamdani`` and
+``RuleMatrix`` evaluate every rule anyway.  Rule bases over all eight
+proximity sensors have hundreds of rules, with a handful live at a time.
+
+``ActiveRuleIndex`` cuts each input's universe at the ends of the supports
+of its terms.  Inside one interval the set of terms with non-zero
+membership is fixed, so each interval keeps a bitmask of the rules that
+input does not rule out.  The candidates of a sample are the AND of its
+intervals' masks for AND rules (``'min'`` / ``'prod'``), and the OR for OR
+rules (``'max'``).  The candidate lists are memoized per cell (tuple of
+intervals), so a step costs one ``bisect`` per input and a dict lookup.
+
+Supports come from the sampled membership functions.  Under linear
+interpolation a term is non-zero strictly between the samples around its
+non-zero samples.  The support is open-ended where the membership is
+non-zero at the edge of the universe, since inputs are clipped to it.  A
+negated term counts as live everywhere.  The candidates are a superset of
+the rules that fire: a candidate may fire at 0 (at the very end of a
+support), but a rule left out always fires at exactly 0.
+
+``ActiveRuleIndex.cuts`` runs one sample, as a controller step does.  It
+fuzzifies only the terms the candidates read, fires the candidates with
+scalar arithmetic and accumulates the cuts of the terms they write.
+``ActiveRuleEngine`` adds the defuzzification of ``BatchMamdani``.  The
+work before the defuzzification grows with the number of candidates, not
+of rules.  The result equals ``BatchMamdani.compute`` bit for bit, since a
+rule left out would only have added a zero cut.  ``compute(x, y)`` matches
+``FuzzyLookupTable.compute``, so the distance controllers take it as
+``FUZZY_ENGINE = 'active'``.
+"""
+
+import bisect
+import operator
+
+import numpy as np
+
+from .batch import BatchMamdani
+
+# Scalar form of the RuleMatrix connectives
+_SCALAR = {'min': min, 'prod': operator.mul, 'max': max}
+
+
+def term_support(universe, mf):
+    """Open interval ``(low, high)`` where ``np.interp`` of the sampled ``mf`` is non-zero."""
+    live = np.flatnonzero(np.asarray(mf) > 0)
+    if not len(live):
+        return (np.inf, -np.inf)
+    first, last = live[0], live[-1]
+    low = -np.inf if first == 0 else float(universe[first - 1])
+    high = np.inf if last == len(universe) - 1 else float(universe[last + 1])
+    return (low, high)
+
+
+class ActiveRuleIndex:
+    """Candidate rules of a compiled ``matrix`` for crisp samples.
+
+    ``terms`` gives ``(input, universe, mf)`` for every input term in
+    ``matrix.input_terms`` order: the position of its input in a sample and
+    its sampled membership function.
+    """
+
+    def __init__(self, matrix, terms):
+        if len(terms) != len(matrix.input_terms):
+            raise ValueError("Expected {} input terms, got {}".format(len(matrix.input_terms), len(terms)))
+        self.matrix = matrix
+        self._terms = [(i, np.asarray(universe, dtype=np.float64), float(universe[0]), float(universe[-1]),
+                        np.asarray(mf, dtype=np.float64)) for i, universe, mf in terms]
+        supports = [term_support(universe, mf) for _, universe, mf in terms]
+        self.edges = []
+        self._and_masks = []
+        self._or_masks = []
+        or_rules = [c == 'max' for c in matrix.connectives]
+        for label in matrix.inputs:
+            columns = {c for c, (variable, _) in enumerate(matrix.input_terms) if variable == label}
+            edges = sorted({e for c in columns for e in supports[c] if np.isfinite(e)})
+            bounds = [-np.inf] + edges + [np.inf]
+            and_masks, or_masks = [], []
+            for low, high in zip(bounds[:-1], bounds[1:]):
+                live = {c for c in columns if supports[c][0] < high and supports[c][1] > low}
+                and_mask = or_mask = 0
+                for r, antecedent in enumerate(matrix.antecedents):
+                    reads = [negated or c in live for c, negated in antecedent if c in columns]
+                    if or_rules[r]:
+                        or_mask |= any(reads) << r
+                    else:
+                        and_mask |= all(reads) << r
+                and_masks.append(and_mask)
+                or_masks.append(or_mask)
+            self.edges.append(edges)
+            self._and_masks.append(and_masks)
+            self._or_masks.append(or_masks)
+        self._any_or = any(or_rules)
+        self._all_and = sum(1 << r for r, is_or in enumerate(or_rules) if not is_or)
+        self._rules = [(_SCALAR[connective], antecedent, consequent) for connective, antecedent, consequent in
+                       zip(matrix.connectives, matrix.antecedents, matrix.consequents)]
+        self._memo = {}
+
+    def cell(self, sample):
+        """Interval of every input value of ``sample``."""
+        return tuple(bisect.bisect_right(edges, value) for edges, value in zip(self.edges, sample))
+
+    def candidates(self, sample):
+        """Indices of the rules that can fire for ``sample``, in rule order."""
+        cell = self.cell(sample)
+        rules = self._memo.get(cell)
+        if rules is None:
+            mask = self._all_and
+            for masks, k in zip(self._and_masks, cell):
+                mask &= masks[k]
+            if self._any_or:
+                for masks, k in zip(self._or_masks, cell):
+                    mask |= masks[k]
+            rules = tuple(r for r in range(self.matrix.rule_count) if mask >> r & 1)
+            self._memo[cell] = rules
+        return rules
+
+    def candidate_mask(self, samples):
+        """``(n_rules, N)`` booleans, the candidates of every row of ``samples`` ``(N, n_inputs)``."""
+        samples = np.atleast_2d(samples)
+        mask = np.zeros((self.matrix.rule_count, samples.shape[0]), dtype=bool)
+        for n, sample in enumerate(samples.tolist()):
+            mask[list(self.candidates(sample)), n] = True
+        return mask
+
+    def cuts(self, sample):
+        """Cut level of every term of ``matrix.output_terms`` for one ``sample``, from its candidates."""
+        cuts = [0.] * len(self.matrix.output_terms)
+        memberships = {}
+        for r in self.candidates(sample):
+            combine, antecedent, consequent = self._rules[r]
+            firing = None
+            for column, negated in antecedent:
+                value = memberships.get(column)
+                if value is None:
+                    i, universe, low, high, mf = self._terms[column]
+                    value = float(np.interp(min(max(sample[i], low), high), universe, mf))
+                    memberships[column] = value
+                if negated:
+                    value = 1. - value
+                firing = value if firing is None else combine(firing, value)
+            for column, weight in consequent:
+                cut = firing * weight
+                if cut > cuts[column]:
+                    cuts[column] = cut
+        return cuts
+
+
+class ActiveRuleEngine:
+    """One-sample-at-a-time inference over the candidate rules of a ``ControlSystem``.
+
+    Arguments as for ``BatchMamdani``; the rule base must compile to a
+    ``RuleMatrix``.  ``control_system`` may also be a ``BatchMamdani`` (one
+    from ``BatchMamdani.from_arrays`` in particular), which is used as is.
+    """
+
+    def __init__(self, control_system, inputs=None, outputs=None, **options):
+        if isinstance(control_system, BatchMamdani):
+            self.engine = control_system
+        else:
+            self.engine = BatchMamdani(control_system, inputs, outputs, **options)
+        if self.engine.matrix is None:
+            raise ValueError("The rule base does not compile to a rule matrix, see obstacle_avoidance.rulematrix")
+        self.inputs = self.engine.inputs
+        self.outputs = self.engine.outputs
+        self.index = ActiveRuleIndex(self.engine.matrix, [(i, self.engine._universes[i], mf)
+                                                          for i, mf in self.engine._matrix_terms])
+        self._columns = [out['columns'] for out in self.engine._output_vars]
+
+    def compute(self, *sample, strict=False):
+        """Crisp outputs, in ``outputs`` order, for one value per input.
+
+        An output no candidate rule writes to is NaN, or raises
+        ``ValueError`` with ``strict`` (see ``BatchMamdani.check_defined``).
+        """
+        cuts = self.index.cuts(sample)
+        result = tuple(float(self.engine.defuzzify(k, np.array([[cuts[c] for c in columns]]))[0])
+                       for k, columns in enumerate(self._columns))
+        if strict and any(value != value for value in result):
+            self.engine.check_defined(sample, result)
+        return result
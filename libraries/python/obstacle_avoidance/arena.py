@@ -0,0 +1,208 @@
+"""2D geometry of ``worlds/OBSTACLE ARENA.wbt`` for the offline simulator.
+
+Everything in the world that can block an e-puck or its distance sensors is
+reduced to the floor plane: the inner face of the ``CircleArena`` wall (a
+circle of ``radius``) and one oriented box per static obstacle (centre, half
+extents, yaw), as extracted by ``obstacle_avoidance.wbt.static_boxes``.
+Obstacle heights are ignored; the two stacked ``Obstacle`` nodes give two
+identical boxes, which is harmless.
+
+The queries are vectorized over any number of rays or disks and compute
+in the dtype of the points they are given (float32 or float64).  Boxes are
+indexed by a ``BoxGrid``; queries with a bounded reach (``near_pairs``,
+``disk_collides``, ``ray_distance`` with a finite ``max_range``) only test
+the boxes in the cells they overlap, so their cost follows the number of
+nearby boxes rather than the number of boxes.  ``near_pairs`` skips the
+index for arenas of at most ``DENSE_BOXES`` boxes, like the project's.  ``box_gaps`` and an
+unbounded ``ray_distance`` test every box.
+"""
+
+import os
+
+import numpy as np
+
+from . import wbt
+from .spatial import BoxGrid, box_bounds
+
+DEFAULT_WORLD = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'worlds',
+                             'OBSTACLE ARENA.wbt')
+
+# CircleArena.proto default
+CIRCLE_ARENA_RADIUS = 1.0
+# Up to this many boxes, testing all of them beats looking candidates up in the grid
+DENSE_BOXES = 16
+
+
+def _as_points(points):
+    """``points`` as a float array, keeping float32 input in float32."""
+    points = np.asarray(points)
+    return points if points.dtype in (np.float32, np.float64) else points.astype(np.float64)
+
+
+class Arena:
+    """Circular arena of ``radius`` centred on the origin, plus oriented boxes.
+
+    ``boxes`` is an ``(M, 5)`` array of ``x, y, half_x, half_y, yaw``.
+    """
+
+    def __init__(self, radius=CIRCLE_ARENA_RADIUS, boxes=(), names=(), cell_size=None):
+        self.radius = float(radius)
+        self.boxes = np.asarray(boxes, dtype=float).reshape(-1, 5)
+        self.names = list(names) or ['box{}'.format(i) for i in range(len(self.boxes))]
+        self._columns = {}
+        lower, upper = box_bounds(self.boxes)
+        bounds = (np.minimum(lower.min(axis=0, initial=-self.radius), -self.radius),
+                  np.maximum(upper.max(axis=0, initial=self.radius), self.radius))
+        self.index = BoxGrid(self.boxes, bounds, cell_size)
+
+    @classmethod
+    def from_wbt(cls, path=DEFAULT_WORLD, cell_size=None):
+        """Arena of the first ``CircleArena`` and the static obstacles of the world file ``path``."""
+        nodes = wbt.read(path)
+        radius = CIRCLE_ARENA_RADIUS
+        for node in wbt.find(nodes, 'CircleArena'):
+            radius = float(node.get('radius', radius))
+            break
+        boxes, names = wbt.static_boxes(nodes)
+        return cls(radius, boxes, names, cell_size)
+
+    def _box_columns(self, dtype):
+        """``x, y, half_x, half_y, cos(yaw), sin(yaw)`` of the boxes in ``dtype``."""
+        dtype = np.dtype(dtype)
+        if dtype not in self._columns:
+            boxes = self.boxes
+            columns = (boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3], np.cos(boxes[:, 4]), np.sin(boxes[:, 4]))
+            self._columns[dtype] = tuple(column.astype(dtype) for column in columns)
+        return self._columns[dtype]
+
+    def _to_local(self, points, boxes=None):
+        """Coordinates of ``points`` (K, 2) in box frames.
+
+        Against every box by default, two (M, K) arrays; with ``boxes`` (K,)
+        each point only in the frame of its own box, two (K,) arrays.
+        """
+        x, y, _, _, cos, sin = self._box_columns(points.dtype)
+        if boxes is None:
+            dx = points[:, 0] - x[:, None]
+            dy = points[:, 1] - y[:, None]
+            cos, sin = cos[:, None], sin[:, None]
+        else:
+            dx = points[:, 0] - x[boxes]
+            dy = points[:, 1] - y[boxes]
+            cos, sin = cos[boxes], sin[boxes]
+        return dx * cos + dy * sin, dy * cos - dx * sin
+
+    def box_gaps(self, centres):
+        """Distance from each of ``centres`` (K, 2) to each box, 0 inside; shape (K, M).
+
+        The result is the transpose of a C-ordered (M, K) array, so that
+        reductions over the boxes (``axis=1``) run over contiguous rows.
+        """
+        centres = _as_points(centres)
+        _, _, half_x, half_y, _, _ = self._box_columns(centres.dtype)
+        local_x, local_y = self._to_local(centres)
+        qx = np.abs(local_x, out=local_x)
+        qx -= half_x[:, None]
+        np.maximum(qx, 0.0, out=qx)
+        qy = np.abs(local_y, out=local_y)
+        qy -= half_y[:, None]
+        np.maximum(qy, 0.0, out=qy)
+        return np.hypot(qx, qy, out=qx).T
+
+    def wall_gaps(self, centres):
+        """Distance from each of ``centres`` (K, 2) to the arena wall."""
+        centres = _as_points(centres)
+        return self.radius - np.sqrt(np.einsum('ij,ij->i', centres, centres))
+
+    def ray_wall_distance(self, origins, directions):
+        """Distance along unit rays from inside the arena to its wall."""
+        origins, directions = _as_points(origins), _as_points(directions)
+        # Far root of |o + t d| = radius
+        b = np.einsum('ij,ij->i', origins, directions)
+        c = np.einsum('ij,ij->i', origins, origins) - self.radius ** 2
+        return -b + np.sqrt(np.maximum(b * b - c, 0.0))
+
+    def ray_box_distance(self, origins, directions, boxes):
+        """Distance along unit ray ``k`` to box ``boxes[k]``, inf on a miss, 0 from inside."""
+        origins, directions = _as_points(origins), _as_points(directions)
+        _, _, half_x, half_y, cos, sin = self._box_columns(origins.dtype)
+        half_x, half_y, cos, sin = half_x[boxes], half_y[boxes], cos[boxes], sin[boxes]
+        local_x, local_y = self._to_local(origins, boxes)
+        dx = directions[:, 0] * cos + directions[:, 1] * sin
+        dy = directions[:, 1] * cos - directions[:, 0] * sin
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_x = 1.0 / dx
+            inv_y = 1.0 / dy
+            tx1 = (-half_x - local_x) * inv_x
+            tx2 = (half_x - local_x) * inv_x
+            ty1 = (-half_y - local_y) * inv_y
+            ty2 = (half_y - local_y) * inv_y
+        # A ray parallel to a slab and on its boundary gives NaN (0 * inf);
+        # fmin / fmax skip it and the comparison below rejects the rest
+        near = np.fmax(np.fmin(tx1, tx2), np.fmin(ty1, ty2))
+        far = np.fmin(np.fmax(tx1, tx2), np.fmax(ty1, ty2))
+        hit = far >= np.maximum(near, 0.0)
+        return np.where(hit, np.maximum(near, 0.0), np.inf)
+
+    def pair_gaps(self, points, boxes):
+        """Distance from ``points[k]`` to box ``boxes[k]``, 0 inside."""
+        points = _as_points(points)
+        _, _, half_x, half_y, _, _ = self._box_columns(points.dtype)
+        local_x, local_y = self._to_local(points, boxes)
+        qx = np.maximum(np.abs(local_x) - half_x[boxes], 0.0)
+        qy = np.maximum(np.abs(local_y) - half_y[boxes], 0.0)
+        return np.hypot(qx, qy)
+
+    def near_pairs(self, centres, reach):
+        """``(points, boxes, gaps)`` of the boxes closer than ``reach`` to ``centres`` (K, 2).
+
+        Sorted by point.  Up to ``DENSE_BOXES`` boxes every box is tested,
+        beyond that the candidates come from the grid index.
+        """
+        centres = _as_points(centres)
+        if len(self.boxes) <= DENSE_BOXES:
+            gaps = self.box_gaps(centres)
+            points, boxes = np.nonzero(gaps < reach)
+            return points, boxes, gaps[points, boxes]
+        points, boxes = self.index.disk_pairs(centres, reach)
+        gaps = self.pair_gaps(centres[points], boxes)
+        near = gaps < reach
+        return points[near], boxes[near], gaps[near]
+
+    def ray_distance(self, origins, directions, max_range=np.inf):
+        """Distance along each unit ray to the first box or the arena wall.
+
+        ``origins`` and ``directions`` are ``(K, 2)``; the result is capped
+        at ``max_range``.  With a finite ``max_range`` the rays are
+        segments and only meet the boxes of the grid cells they cross;
+        otherwise every ray is tested against every box.
+        """
+        origins, directions = _as_points(origins), _as_points(directions)
+        distance = self.ray_wall_distance(origins, directions)
+        if not len(self.boxes):
+            return np.minimum(distance, max_range)
+        if np.isfinite(max_range):
+            rays, boxes = self.index.segment_pairs(origins, origins + directions * max_range)
+        else:
+            rays = np.repeat(np.arange(len(origins)), len(self.boxes))
+            boxes = np.tile(np.arange(len(self.boxes)), len(origins))
+        hits = self.ray_box_distance(origins[rays], directions[rays], boxes)
+        pair_minimum(distance, rays, hits)
+        return np.minimum(distance, max_range)
+
+    def disk_collides(self, centres, radius):
+        """Whether disks of ``radius`` at ``centres`` (K, 2) touch a box or leave the arena."""
+        collides = self.wall_gaps(centres) < radius
+        points, _, _ = self.near_pairs(centres, radius)
+        collides[points] = True
+        return collides
+
+
+def pair_minimum(out, queries, values):
+    """``out[q] = min(out[q], values of q)`` for ``queries`` sorted, as the index returns them."""
+    if not len(queries):
+        return out
+    starts = np.flatnonzero(np.diff(queries, prepend=-1))
+    first = queries[starts]
+    out[first] = np.minimum(out[first], np.minimum.reduceat(values, starts, axis=0))
+    return out
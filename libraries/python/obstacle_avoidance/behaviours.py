@@ -0,0 +1,96 @@
+"""Prioritized behaviours with short-circuit evaluation.
+
+The distance controllers computed the fuzzy speeds on every step, then the
+``max(...) > threshold`` block below overwrote them.  Its ``else`` branch
+drives straight, so the fuzzy result was thrown away on every step, not
+only when an obstacle was close.
+
+``BehaviourStack`` makes the priorities explicit.  Each behaviour declares
+a trigger and an action.  ``run_step()`` checks the triggers from the top,
+runs the action of the first behaviour that fires and returns its result.
+The behaviours below it are not checked and not run.  A behaviour without
+a trigger always fires, so it belongs at the bottom of the stack, as the
+cruise that runs when nothing else does.
+
+Every behaviour counts how often its trigger was checked and how often it
+fired, and times its action.  ``report()`` lists them, so the share of
+steps that reached the fuzzy cruise shows up directly.
+"""
+
+import time
+
+
+class Behaviour:
+    def __init__(self, name, action, trigger):
+        self.name = name
+        self.action = action
+        self.trigger = trigger
+        self.checks = 0
+        self.fired = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class BehaviourStack:
+    """Behaviours run by ``run_step()``, highest priority first."""
+
+    def __init__(self):
+        self.behaviours = []
+        self.steps = 0
+        self.active = None
+
+    def add(self, name, action, trigger=None):
+        """Add ``action()`` below the behaviours already added, run on the steps ``trigger()`` is true.
+
+        Without ``trigger`` the behaviour always fires.  Returns the
+        ``Behaviour``.
+        """
+        if any(behaviour.name == name for behaviour in self.behaviours):
+            raise ValueError("Behaviour '{}' is already in the stack".format(name))
+        if self.behaviours and self.behaviours[-1].trigger is None:
+            raise ValueError("Behaviour '{}' would never run, '{}' above it always fires".format(
+                name, self.behaviours[-1].name))
+        behaviour = Behaviour(name, action, trigger)
+        self.behaviours.append(behaviour)
+        return behaviour
+
+    def run_step(self):
+        """Result of the action of the first behaviour that fires, ``None`` if none does."""
+        self.steps += 1
+        for behaviour in self.behaviours:
+            behaviour.checks += 1
+            if behaviour.trigger is not None and not behaviour.trigger():
+                continue
+            start = time.perf_counter()
+            result = behaviour.action()
+            elapsed = time.perf_counter() - start
+            behaviour.fired += 1
+            behaviour.total += elapsed
+            if elapsed > behaviour.max:
+                behaviour.max = elapsed
+            self.active = behaviour.name
+            return result
+        self.active = None
+        return None
+
+    def counts(self):
+        return {
+            behaviour.name: {
+                'checks': behaviour.checks,
+                'fired': behaviour.fired,
+                'share': behaviour.fired / self.steps if self.steps else 0.0,
+                'mean_ms': 1000 * behaviour.total / max(behaviour.fired, 1),
+                'max_ms': 1000 * behaviour.max,
+            }
+            for behaviour in self.behaviours
+        }
+
+    def report(self):
+        """Checks and firings per behaviour as a text table."""
+        lines = ["{:<14} {:>7} {:>7} {:>7} {:>9} {:>9}".format('behaviour', 'checks', 'fired', 'share', 'mean ms',
+                                                             'max ms')]
+        for name, row in self.counts().items():
+            lines.append("{:<14} {:>7} {:>7} {:6.1%} {:9.3f} {:9.3f}".format(
+                name, row['checks'], row['fired'], row['share'], row['mean_ms'], row['max_ms']))
+        lines.append("{} steps".format(self.steps))
+        return '\n'.join(lines)
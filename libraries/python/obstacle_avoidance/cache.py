@@ -0,0 +1,198 @@
+"""On-disk cache of compiled fuzzy artifacts, shared across controller launches.
+
+Webots starts a fresh controller process on every world reload, so anything
+derived from the fuzzy definitions (the sampled control surface of a
+``FuzzyLookupTable`` in particular, ``resolution ** 2`` calls to
+``compute()``) would otherwise be rebuilt before the first step.
+
+Entries are keyed by ``source_hash()``, a SHA-256 over the files the fuzzy
+definitions are written in plus the builder's own parameters, so an entry
+is found before anything is built; ``engines.build_engine`` is the one
+place that derives the keys, so a warm start never imports skfuzzy.
+Changing any of the files gives a new key, so a stale entry is never read.
+Entries not loaded for ``max_age`` days are removed whenever a new entry is
+stored, which clears out the ones old definitions left behind without the
+controllers (which share the cache) evicting each other.
+
+``definition_hash()`` is a SHA-256 over everything that affects the result
+of inference in a built ``ControlSystem`` -- every universe and membership
+array, the rule antecedent trees with their AND/OR functions, the
+consequent terms and weights, the accumulation and defuzzification
+methods.  It does not key entries; ``tools/check_rulebases.py`` uses it to
+compare a controller's definitions with ``rulebases``.
+
+Each entry is a directory of ``.npy`` files, one per array, read back with
+``np.load(mmap_mode='r')`` so a warm start only maps the files.  Entries are
+written to a temporary directory and renamed into place, so a controller
+killed mid-write leaves no partial entry behind.
+
+The cache lives in ``$OBSTACLE_AVOIDANCE_CACHE`` if set, otherwise in
+``$XDG_CACHE_HOME/obstacle_avoidance`` (``~/.cache/obstacle_avoidance``).
+Deleting the directory is always safe.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from .runtime import lazy_import
+
+skfuzzy_term = lazy_import('skfuzzy.control.term')
+
+# Bump when the layout of the hashed definition or of the entries changes
+CACHE_VERSION = 1
+KEY_LENGTH = 32
+
+
+def default_directory():
+    directory = os.environ.get('OBSTACLE_AVOIDANCE_CACHE')
+    if directory:
+        return directory
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'obstacle_avoidance')
+
+
+def _function_name(function):
+    return '{}.{}'.format(getattr(function, '__module__', ''), getattr(function, '__qualname__', repr(function)))
+
+
+def _update_array(digest, values):
+    values = np.ascontiguousarray(values)
+    digest.update('{}{}'.format(values.dtype.str, values.shape).encode())
+    digest.update(values.tobytes())
+
+
+def _antecedent_key(node):
+    if isinstance(node, skfuzzy_term.Term):
+        return '{}[{}]'.format(node.parent.label, node.label)
+    if isinstance(node, skfuzzy_term.TermAggregate):
+        if node.kind == 'not':
+            return 'not({})'.format(_antecedent_key(node.term1))
+        return '{}({},{})'.format(node.kind, _antecedent_key(node.term1), _antecedent_key(node.term2))
+    raise ValueError("Unsupported antecedent {!r}".format(node))
+
+
+def definition_hash(control_system, *params):
+    """Hex digest of the fuzzy definitions of ``control_system`` and ``params``.
+
+    ``params`` are any further settings to compare along with the
+    definitions; they are hashed through ``repr``.
+    """
+    digest = hashlib.sha256('obstacle_avoidance cache v{}'.format(CACHE_VERSION).encode())
+    variables = [('antecedent', v) for v in control_system.antecedents]
+    variables += [('consequent', v) for v in control_system.consequents]
+    for role, variable in sorted(variables, key=lambda item: (item[0], item[1].label)):
+        digest.update('{}:{}'.format(role, variable.label).encode())
+        _update_array(digest, variable.universe)
+        for label, term in variable.terms.items():
+            digest.update('term:{}'.format(label).encode())
+            _update_array(digest, term.mf)
+        if role == 'consequent':
+            digest.update('defuzzify:{}'.format(variable.defuzzify_method).encode())
+            digest.update('accumulate:{}'.format(_function_name(variable.accumulation_method)).encode())
+
+    for rule in control_system.rules:
+        digest.update('rule:{}'.format(_antecedent_key(rule.antecedent)).encode())
+        digest.update('and:{} or:{}'.format(_function_name(rule.and_func), _function_name(rule.or_func)).encode())
+        for weighted in rule.consequent:
+            digest.update('then:{}[{}]*{!r}'.format(weighted.term.parent.label, weighted.term.label,
+                                                    float(weighted.weight)).encode())
+
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+def source_hash(paths, *params):
+    """Hex digest of the contents of the files ``paths`` and of ``params``.
+
+    A missing file is hashed as missing, ``params`` through ``repr`` as for
+    ``definition_hash``.
+    """
+    digest = hashlib.sha256('obstacle_avoidance sources v{}'.format(CACHE_VERSION).encode())
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                contents = f.read()
+        except OSError:
+            digest.update('missing:{}'.format(os.path.basename(path)).encode())
+            continue
+        digest.update('file:{}:{}'.format(os.path.basename(path), len(contents)).encode())
+        digest.update(contents)
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """Directory of named, hash-keyed entries of numpy arrays."""
+
+    def __init__(self, directory=None, max_age=30):
+        self.directory = directory or default_directory()
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, name, key):
+        return os.path.join(self.directory, '{}-{}'.format(name, key[:KEY_LENGTH]))
+
+    def load(self, name, key):
+        """Arrays of the entry as read-only memory maps, or ``None`` on a miss."""
+        path = self.path(name, key)
+        try:
+            files = sorted(f for f in os.listdir(path) if f.endswith('.npy'))
+            arrays = {f[:-4]: np.load(os.path.join(path, f), mmap_mode='r') for f in files}
+        except (OSError, ValueError):
+            # Missing, or unreadable (another process replacing it, truncated file)
+            arrays = None
+        if not arrays:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            # Record the use for prune()
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def store(self, name, key, arrays):
+        """Write ``arrays`` (name -> array) as the entry.
+
+        Failing to write (read-only or full disk) is not an error, the
+        caller already has the arrays; ``False`` is returned in that case.
+        """
+        target = self.path(name, key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix='.{}-'.format(name), dir=self.directory)
+            for label, values in arrays.items():
+                np.save(os.path.join(staging, label + '.npy'), np.asarray(values))
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another launch stored the same entry first
+                shutil.rmtree(staging, ignore_errors=True)
+        except OSError:
+            return False
+        self.prune()
+        return True
+
+    def prune(self, max_age=None):
+        """Remove entries (and abandoned staging directories) unused for ``max_age`` days."""
+        max_age = self.max_age if max_age is None else max_age
+        cutoff = time.time() - max_age * 86400
+        try:
+            entries = os.listdir(self.directory)
+        except OSError:
+            return
+        for entry in entries:
+            path = os.path.join(self.directory, entry)
+            try:
+                stale = os.path.isdir(path) and os.path.getmtime(path) < cutoff
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,79 @@
+"""Camera acquisition shared by the camera controllers.
+
+``CustomCamera`` used to be copied into H2, my_controller1 and cobain1.  It
+has two acquisition modes:
+
+``'array'``
+    The original path: ``camera.getImageArray()`` builds a nested Python
+    list of ``width x height x 3`` ints which is copied into a new uint8
+    array every step.  Note that Webots indexes that list ``[x][y]`` in RGB
+    order, so the resulting array is transposed and the channels are RGB
+    even though the controllers treat it as BGR.
+
+``'buffer'``
+    Wraps the raw BGRA bytes from ``camera.getImage()`` with
+    ``np.frombuffer`` (as HHH1 does) and converts them into a preallocated
+    BGR buffer, so no per-step allocation happens.  The image is
+    ``height x width`` in proper BGR order.
+
+``getHSV()`` converts the current image into a preallocated HSV buffer in
+both modes.  The returned arrays are reused on the next call; copy them if
+they must outlive the step.
+
+``displayImage()`` shows the image on the calling thread; controllers that
+use ``obstacle_avoidance.display.DisplaySink`` pass it ``displayFrame()``
+instead.
+"""
+
+import numpy as np
+
+from .runtime import lazy_import
+
+# Only imported once the first frame is converted
+cv2 = lazy_import('cv2')
+
+CAMERA_MODES = ('array', 'buffer')
+
+
+class CustomCamera:
+    def __init__(self, camera, mode='array', rgb_display=True):
+        if mode not in CAMERA_MODES:
+            raise ValueError("Unknown camera mode '{}', expected one of {}".format(mode, CAMERA_MODES))
+        self.camera = camera
+        self.mode = mode
+        self.rgb_display = rgb_display
+        self.width = int(self.camera.getWidth())
+        self.height = int(self.camera.getHeight())
+        self.image_data = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.hsv_data = np.zeros_like(self.image_data)
+
+    def getImage(self):
+        if self.mode == 'buffer':
+            raw = self.camera.getImage()
+            if raw:
+                bgra = np.frombuffer(raw, np.uint8).reshape((self.height, self.width, 4))
+                cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=self.image_data)
+            return self.image_data
+
+        res = self.camera.getImageArray()
+        if res is not None:
+            self.image_data = np.array(res, dtype=np.uint8)
+        return self.image_data
+
+    def getHSV(self):
+        if self.hsv_data.shape != self.image_data.shape:
+            self.hsv_data = np.zeros_like(self.image_data)
+        cv2.cvtColor(self.image_data, cv2.COLOR_BGR2HSV, dst=self.hsv_data)
+        return self.hsv_data
+
+    def displayFrame(self):
+        """Current image in the channel order ``imshow`` expects."""
+        image = self.image_data
+        # The array mode holds RGB data, swap it for imshow
+        if self.mode == 'array' and self.rgb_display:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return image
+
+    def displayImage(self):
+        cv2.imshow('Camera Image', self.displayFrame())
+        cv2.waitKey(1)
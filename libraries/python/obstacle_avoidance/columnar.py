@@ -0,0 +1,176 @@
+"""Chunked columnar telemetry files read through ``np.memmap``.
+
+CSV is written and parsed one row at a time, which dominates the cost of
+long recordings.  A columnar file stores the same table as raw little-endian
+float64, in chunks of ``chunk_rows`` rows laid out column by column, so a
+column is read straight from disk without any parsing.
+
+Layout::
+
+    0   8 bytes   magic  b'OACOL1\\0\\0'
+    8   uint64    number of valid rows (rewritten after every chunk)
+    16  uint64    length of the JSON header
+    24  JSON      {"columns": [...], "dtype": "<f8", "chunk_rows": K}
+        padding   up to a multiple of 64 bytes
+    data          n_chunks x n_columns x K values
+
+The last chunk is padded with zeros to ``chunk_rows``; the row count in the
+header says how many rows are valid.  Because the count is only rewritten
+once a chunk is on disk, a file cut short by a crash still loads with every
+complete chunk.
+"""
+
+import csv
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b'OACOL1\0\0'
+DTYPE = '<f8'
+_ALIGN = 64
+
+
+class ColumnarWriter:
+    """Append rows or whole chunks to a new columnar file."""
+
+    def __init__(self, path, columns, chunk_rows=4096):
+        self.path = path
+        self.columns = tuple(columns)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._buffer = np.zeros((len(self.columns), chunk_rows), dtype=DTYPE)
+        self._pending = 0
+        self._partial = False
+
+        header = json.dumps({'columns': list(self.columns), 'dtype': DTYPE, 'chunk_rows': chunk_rows}).encode()
+        self.data_offset = -(-(24 + len(header)) // _ALIGN) * _ALIGN
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + struct.pack('<QQ', 0, len(header)) + header)
+        self._file.write(b'\0' * (self.data_offset - 24 - len(header)))
+
+    def append(self, row):
+        """Buffer one row; the chunk is written once ``chunk_rows`` are buffered."""
+        self._buffer[:, self._pending] = row
+        self._pending += 1
+        if self._pending == self.chunk_rows:
+            self._write(self._buffer, self._pending)
+            self._pending = 0
+
+    def write_chunk(self, block):
+        """Write a ``rows x columns`` block of at most ``chunk_rows`` rows.
+
+        Only the last block written may be shorter than ``chunk_rows``.
+        """
+        if self._pending:
+            raise ValueError("write_chunk() cannot follow a partially buffered append()")
+        block = np.asarray(block, dtype=DTYPE)
+        rows = len(block)
+        if rows < self.chunk_rows:
+            chunk = np.zeros((len(self.columns), self.chunk_rows), dtype=DTYPE)
+            chunk[:, :rows] = block.T
+        else:
+            chunk = block.T
+        self._write(chunk, rows)
+
+    def close(self):
+        if self._file is None:
+            return
+        if self._pending:
+            self._buffer[:, self._pending:] = 0
+            self._write(self._buffer, self._pending)
+            self._pending = 0
+        self._file.close()
+        self._file = None
+
+    def _write(self, chunk, rows):
+        if self._partial:
+            raise ValueError("a short chunk was already written, the file is complete")
+        self._partial = rows < self.chunk_rows
+        self._file.write(np.ascontiguousarray(chunk, dtype=DTYPE).tobytes())
+        self.rows += rows
+        self._file.seek(8)
+        self._file.write(struct.pack('<Q', self.rows))
+        self._file.seek(0, 2)
+        self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ColumnarFile:
+    """Read-only view of a columnar file; nothing is read until a column is used."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            prefix = file.read(24)
+            if len(prefix) < 24 or prefix[:8] != MAGIC:
+                raise ValueError("'{}' is not a columnar telemetry file".format(path))
+            self.rows, header_length = struct.unpack('<QQ', prefix[8:])
+            header = json.loads(file.read(header_length))
+        self.columns = tuple(header['columns'])
+        self.chunk_rows = header['chunk_rows']
+        self.data_offset = -(-(24 + header_length) // _ALIGN) * _ALIGN
+        chunks = -(-self.rows // self.chunk_rows)
+        if chunks:
+            self._data = np.memmap(path, dtype=header['dtype'], mode='r', offset=self.data_offset,
+                                   shape=(chunks, len(self.columns), self.chunk_rows))
+        else:
+            self._data = np.zeros((0, len(self.columns), self.chunk_rows), dtype=header['dtype'])
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name):
+        """Column ``name`` as a 1-D array of ``len(self)`` values.
+
+        A file of a single chunk returns a view of the mapping; otherwise the
+        chunks of that one column are gathered into a new array.
+        """
+        chunks = self._data[:, self.columns.index(name), :]
+        if len(chunks) == 1:
+            return chunks[0, :self.rows]
+        return chunks.reshape(-1)[:self.rows]
+
+    def chunks(self, name):
+        """Column ``name`` as the mapped ``n_chunks x chunk_rows`` array, padding included."""
+        return self._data[:, self.columns.index(name), :]
+
+    def to_array(self, columns=None):
+        """``rows x columns`` array of the selected columns (all by default)."""
+        columns = self.columns if columns is None else columns
+        return np.column_stack([self.column(name) for name in columns])
+
+
+def csv_to_columnar(csv_path, path, chunk_rows=4096):
+    """Convert a CSV with a header row of column names; returns the row count."""
+    with open(csv_path, newline='') as file:
+        reader = csv.reader(file)
+        columns = next(reader)
+        with ColumnarWriter(path, columns, chunk_rows) as writer:
+            block = []
+            for row in reader:
+                if not row:
+                    continue
+                block.append([float(value) for value in row])
+                if len(block) == chunk_rows:
+                    writer.write_chunk(block)
+                    block = []
+            if block:
+                writer.write_chunk(block)
+            return writer.rows
+
+
+def columnar_to_csv(path, csv_path):
+    """Write a columnar file as CSV with its column names as header, chunk by chunk."""
+    table = ColumnarFile(path)
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(table.columns)
+        for index in range(len(table._data)):
+            rows = min(table.chunk_rows, table.rows - index * table.chunk_rows)
+            writer.writerows(np.asarray(table._data[index, :, :rows]).T.tolist())
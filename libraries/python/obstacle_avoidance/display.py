@@ -0,0 +1,145 @@
+"""Camera preview output for the camera controllers.
+
+The controllers called ``cv2.imshow`` + ``cv2.waitKey(1)`` on every control
+step, which stalls the loop on GUI event processing and fails outright on a
+machine without a display.  ``DisplaySink`` keeps that as the default and
+adds three modes:
+
+``'inline'``
+    Every frame is shown from the calling thread with ``cv2.imshow`` and
+    ``cv2.waitKey(1)``, as the controllers always did.
+
+``'none'``
+    Nothing is shown.  Meant for headless batch runs.
+
+``'throttled'``
+    At most ``rate`` frames per second are shown by a background thread,
+    which owns the window and the ``waitKey`` calls.  A frame that arrives
+    while the previous one is still waiting replaces it.
+
+``'disk'``
+    Every ``every``-th frame is written to ``directory`` as a PNG by a
+    background thread.
+
+Without a GUI backend in OpenCV, the ``'inline'`` and ``'throttled'`` modes
+print one message and turn themselves off.
+
+Controllers ask ``wants_frame()`` once per step and only draw their overlays
+and call ``show()`` when it returns True, so a frame that is never shown
+costs nothing.  ``show()`` copies the image for the background modes, the
+caller may reuse it.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from .runtime import lazy_import
+
+# Only imported once a frame is written or shown
+cv2 = lazy_import('cv2')
+
+DISPLAY_MODES = ('inline', 'none', 'throttled', 'disk')
+
+
+class DisplaySink:
+    def __init__(self, mode='inline', rate=10.0, every=10, directory='frames', window='Camera Image'):
+        if mode not in DISPLAY_MODES:
+            raise ValueError("Unknown display mode '{}', expected one of {}".format(mode, DISPLAY_MODES))
+        self.mode = mode
+        self.period = 1.0 / rate
+        self.every = every
+        self.directory = directory
+        self.window = window
+        self.frame = -1
+        self.shown = 0
+        self.dropped = 0
+        self._next_time = 0.0
+        self._queue = None
+        self._worker = None
+        if mode in ('inline', 'none'):
+            return
+
+        if mode == 'disk':
+            os.makedirs(directory, exist_ok=True)
+            self._queue = queue.Queue(maxsize=8)
+        else:
+            self._queue = queue.Queue(maxsize=1)
+        self._worker = threading.Thread(target=self._run, name='display', daemon=True)
+        self._worker.start()
+
+    def wants_frame(self):
+        """Whether the frame of this step will be shown; call once per step."""
+        self.frame += 1
+        if self.mode == 'none':
+            return False
+        if self.mode == 'inline':
+            return True
+        if self.mode == 'disk':
+            return self.frame % self.every == 0
+        now = time.monotonic()
+        if now < self._next_time:
+            return False
+        self._next_time = now + self.period
+        return True
+
+    def show(self, image):
+        if self.mode == 'inline':
+            if self._imshow(image):
+                self.shown += 1
+            return
+        if self._queue is None:
+            return
+        item = (self.frame, image.copy())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.mode == 'disk':
+                # The writer is behind, skip this frame rather than block the step
+                self.dropped += 1
+                return
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(item)
+
+    def close(self):
+        """Flush the pending frames and stop the background thread."""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def _run(self):
+        shown_window = False
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, image = item
+            if self.mode == 'disk':
+                cv2.imwrite(os.path.join(self.directory, 'frame_{:06d}.png'.format(frame)), image)
+            elif self.mode == 'throttled':
+                if not self._imshow(image):
+                    # Stop asking for frames and only drain what is queued
+                    continue
+                shown_window = True
+            else:
+                continue
+            self.shown += 1
+        if shown_window:
+            cv2.destroyWindow(self.window)
+
+    def _imshow(self, image):
+        try:
+            cv2.imshow(self.window, image)
+            cv2.waitKey(1)
+            return True
+        except cv2.error as error:
+            # OpenCV built without a GUI backend or no display available
+            print("Camera preview disabled: {}".format(str(error).strip().splitlines()[-1]))
+            self.mode = 'none'
+            return False
@@ -0,0 +1,95 @@
+"""Fuzzy engines of the controllers, kept in the ``ArtifactCache``.
+
+A controller that picks ``'lut'``, ``'active'`` or ``'fixed'`` never runs
+skfuzzy after startup, yet building any of them starts from the skfuzzy
+``ControlSystem``, and importing skfuzzy (with scipy) is most of the
+startup time.  ``build_engine`` restores the engine from the cache instead
+and only calls the controller's ``build_system`` on a miss, so skfuzzy is
+imported once per change of the definitions, not once per launch.
+
+The cache key cannot come from ``definition_hash()``, which needs the
+built system.  ``engine_key()`` hashes what the system is built from: the
+controller's own script, where its membership functions and rules are
+written, plus whatever else the caller passes (the tuned parameters),
+the modules of this package that compute the engines and the installed
+skfuzzy version.  Editing any of them rebuilds the engine on the next
+launch.
+
+The lookup table is stored as sampled; ``'active'`` and ``'fixed'`` share
+one entry of the compiled ``BatchMamdani`` (see ``BatchMamdani.arrays``)
+and build their own tables from it, which takes a few milliseconds.
+"""
+
+import importlib.util
+import os
+
+from .cache import source_hash
+
+ENGINES = ('lut', 'active', 'fixed')
+
+# Modules whose code decides what an engine computes
+_ENGINE_MODULES = ('activerules', 'batch', 'defuzz', 'fixedpoint', 'lut', 'ruleanalysis', 'rulematrix')
+
+
+def _skfuzzy_version_file():
+    # Its __init__ carries __version__; find_spec locates it without the import
+    try:
+        spec = importlib.util.find_spec('skfuzzy')
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec is not None else None
+
+
+def engine_key(script, *params):
+    """Cache key of the fuzzy system defined in the file ``script`` with ``params``.
+
+    Controllers pass their ``__file__`` and the parameters that change the
+    system built there (``fuzzy_params``).
+    """
+    package = os.path.dirname(os.path.abspath(__file__))
+    paths = [script] + [os.path.join(package, module + '.py') for module in _ENGINE_MODULES]
+    version_file = _skfuzzy_version_file()
+    if version_file:
+        paths.append(version_file)
+    return source_hash(paths, *params)
+
+
+def build_engine(kind, build_system, inputs, outputs, key, cache=None, resolution=21):
+    """Engine ``kind`` (one of ``ENGINES``) over ``inputs`` / ``outputs``, each a tuple of labels.
+
+    ``build_system()`` returns the skfuzzy ``ControlSystem`` and is only
+    called when ``cache`` (an ``ArtifactCache``, or ``None`` to always
+    build) has no entry for ``key`` (see ``engine_key``).  ``resolution``
+    is the grid of the ``'lut'`` engine.  The engine's ``from_cache`` tells
+    which happened.
+    """
+    if kind not in ENGINES:
+        raise ValueError("Unknown fuzzy engine '{}', expected one of {}".format(kind, list(ENGINES)))
+    from .activerules import ActiveRuleEngine
+    from .batch import BatchMamdani
+    from .fixedpoint import FixedPointMamdani
+    from .lut import FuzzyLookupTable
+
+    inputs, outputs = tuple(inputs), tuple(outputs)
+    if kind == 'lut':
+        name, entry_key = 'lut', source_hash((), key, inputs, outputs, int(resolution))
+    else:
+        name, entry_key = 'mamdani', source_hash((), key, inputs, outputs)
+
+    arrays = cache.load(name, entry_key) if cache is not None else None
+    if kind == 'lut':
+        if arrays is not None:
+            saved = FuzzyLookupTable.from_arrays(arrays)
+        else:
+            saved = FuzzyLookupTable(build_system(), inputs, outputs, resolution=resolution)
+        engine = saved
+    else:
+        if arrays is not None:
+            saved = BatchMamdani.from_arrays(arrays)
+        else:
+            saved = BatchMamdani(build_system(), inputs, outputs)
+        engine = ActiveRuleEngine(saved) if kind == 'active' else FixedPointMamdani(saved)
+    engine.from_cache = arrays is not None
+    if arrays is None and cache is not None:
+        cache.store(name, entry_key, saved.arrays())
+    return engine
@@ -0,0 +1,141 @@
+"""Precompiled control surface for two-input fuzzy controllers.
+
+The distance controllers (H2, my_controller1, my_controller57, cobain1) only
+have two crisp inputs on a 0-100 grid, so the whole Mamdani system can be
+sampled once at startup and every step becomes a bilinear table lookup.
+
+The lookup is exact on the grid nodes; between nodes the error is bounded by
+the curvature of the surface.  Measured against ``ControlSystemSimulation``
+at the cell centres (where bilinear interpolation is worst) for the H2 rule
+base:
+
+    resolution   step   max |error| left_speed   max |error| right_speed
+    11           10.0   0.253                    0.365
+    21            5.0   0.120                    0.163
+    51            2.0   0.077                    0.102
+    101           1.0   0.028                    0.036
+
+The error concentrates along the kinks where a rule starts or stops firing.
+Building the table costs ``resolution ** 2`` calls to ``compute()`` (about
+6 s for H2 at resolution 21).
+
+Use ``FuzzyLookupTable.max_error()`` to measure the bound for another rule
+base or resolution.
+
+``arrays()`` / ``from_arrays()`` save and restore a sampled table without
+the control system, which is how ``engines.build_engine`` keeps it on disk
+between launches without importing skfuzzy.
+"""
+
+import numpy as np
+
+from .runtime import lazy_import
+
+# Only needed to sample the table, not to load it from the cache
+ctrl = lazy_import('skfuzzy.control')
+
+
+class FuzzyLookupTable:
+    """Bilinear lookup table sampled from a two-input ``ControlSystem``.
+
+    ``inputs`` and ``outputs`` are the antecedent and consequent labels, in
+    the order the values are passed to and returned from ``compute``.
+    ``resolution`` is the number of grid nodes per input axis.
+    """
+
+    def __init__(self, control_system, inputs, outputs, resolution=21):
+        if len(inputs) != 2:
+            raise ValueError("FuzzyLookupTable needs exactly two inputs")
+        if resolution < 2:
+            raise ValueError("resolution must be at least 2")
+
+        self.control_system = control_system
+        antecedents = {a.label: a for a in control_system.antecedents}
+        self._set_axes(inputs, outputs, resolution, [(antecedents[label].universe.min(),
+                                                      antecedents[label].universe.max()) for label in inputs])
+
+        self.table = self.sample(self.x_axis, self.y_axis)
+        # Plain lists are faster than numpy scalars for per-step indexing
+        self._rows = self.table.tolist()
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Table saved with ``arrays()``; ``sample`` and ``max_error`` need the control system."""
+        self = cls.__new__(cls)
+        self.control_system = None
+        table = arrays['table']
+        self._set_axes([str(label) for label in arrays['inputs']], [str(label) for label in arrays['outputs']],
+                       table.shape[1], arrays['bounds'].tolist())
+        self.table = table
+        self._rows = table.tolist()
+        return self
+
+    def arrays(self):
+        """The sampled table with its input bounds and labels, for ``from_arrays``."""
+        return {'table': self.table, 'bounds': np.array([[self.x_min, self.x_max], [self.y_min, self.y_max]]),
+                'inputs': np.array(self.inputs), 'outputs': np.array(self.outputs)}
+
+    def _set_axes(self, inputs, outputs, resolution, bounds):
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.resolution = int(resolution)
+        (self.x_min, self.x_max), (self.y_min, self.y_max) = [(float(low), float(high)) for low, high in bounds]
+        self.x_axis = np.linspace(self.x_min, self.x_max, self.resolution)
+        self.y_axis = np.linspace(self.y_min, self.y_max, self.resolution)
+        self.x_step = (self.x_max - self.x_min) / (self.resolution - 1)
+        self.y_step = (self.y_max - self.y_min) / (self.resolution - 1)
+
+    def sample(self, x_values, y_values):
+        """Evaluate the skfuzzy system on the grid ``x_values`` x ``y_values``.
+
+        Returns an array of shape ``(n_outputs, len(x_values), len(y_values))``.
+        """
+        sim = ctrl.ControlSystemSimulation(self.control_system, cache=False)
+        table = np.zeros((len(self.outputs), len(x_values), len(y_values)))
+        for i, x in enumerate(x_values):
+            for j, y in enumerate(y_values):
+                sim.input[self.inputs[0]] = x
+                sim.input[self.inputs[1]] = y
+                sim.compute()
+                for k, label in enumerate(self.outputs):
+                    table[k, i, j] = sim.output[label]
+        return table
+
+    def compute(self, x, y):
+        """Return the interpolated outputs for the crisp inputs ``x``, ``y``."""
+        # Clip to the universe like ControlSystemSimulation does
+        x = min(max(x, self.x_min), self.x_max)
+        y = min(max(y, self.y_min), self.y_max)
+
+        fx = (x - self.x_min) / self.x_step
+        fy = (y - self.y_min) / self.y_step
+        i = min(int(fx), self.resolution - 2)
+        j = min(int(fy), self.resolution - 2)
+        tx = fx - i
+        ty = fy - j
+
+        result = []
+        for rows in self._rows:
+            v00 = rows[i][j]
+            v01 = rows[i][j + 1]
+            v10 = rows[i + 1][j]
+            v11 = rows[i + 1][j + 1]
+            top = v00 + (v01 - v00) * ty
+            bottom = v10 + (v11 - v10) * ty
+            result.append(top + (bottom - top) * tx)
+        return tuple(result)
+
+    def max_error(self):
+        """Maximum absolute error per output against skfuzzy.
+
+        Bilinear interpolation is worst in the middle of a cell, so the
+        reference is evaluated at every cell centre.
+        """
+        x_mid = (self.x_axis[:-1] + self.x_axis[1:]) / 2
+        y_mid = (self.y_axis[:-1] + self.y_axis[1:]) / 2
+        reference = self.sample(x_mid, y_mid)
+        errors = []
+        for k in range(len(self.outputs)):
+            approx = np.array([[self.compute(x, y)[k] for y in y_mid] for x in x_mid])
+            errors.append(float(np.max(np.abs(approx - reference[k]))))
+        return tuple(errors)
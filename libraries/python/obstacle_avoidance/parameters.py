@@ -0,0 +1,97 @@
+"""Tuned fuzzy parameters shared between the tuner and the controllers.
+
+A parameter file is JSON::
+
+    {
+      "cruise": "fuzzy",
+      "rule_base": "H2",
+      "inputs": "front",
+      "terms": {"left_distance": {"dekatL": ["trapmf", [0, 0, 22.5, 47.1]], ...}, ...},
+      "override_threshold": 112.4,
+      "score": {...}
+    }
+
+``cruise`` is the control law the file was tuned for, the ``CRUISE`` of the
+controllers: ``'straight'`` (only the threshold matters, ``terms`` is
+empty) or ``'fuzzy'``.  ``load_parameters`` refuses a file tuned for
+another cruise than the controller runs.  A ``'fuzzy'`` file also names
+the rule base (in ``rulebases.RULE_BASES``) and the inputs (``'front'``,
+ps7 / ps0, or ``'groups'``, the group minima) its terms were tuned with,
+and is refused by a controller running other ones.  ``terms`` maps variable labels to
+``{term: [mf, params]}`` with ``mf`` the name of a skfuzzy membership
+function (``'trimf'``, ``'trapmf'``, ...).  Variables and terms the file
+does not mention keep their hand-picked shapes.  ``override_threshold``
+replaces the reading above which the distance controllers turn away (100 in
+H2, my_controller1, cobain1 and my_controller57).  Anything else (the
+score, the tuning settings) is informative.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .runtime import lazy_import
+
+fuzz = lazy_import('skfuzzy')
+
+DEFAULT_OVERRIDE_THRESHOLD = 100
+
+
+def load_parameters(path, cruise='straight', rule_base=None, inputs=None):
+    """Parameter file ``path`` as a dict with at least ``terms`` and ``override_threshold``.
+
+    ``cruise`` is the controller's ``CRUISE``, ``rule_base`` and ``inputs``
+    what its fuzzy system is and reads.  A file tuned for another cruise, or
+    with terms tuned for another rule base or inputs, raises ``ValueError``.
+    """
+    with open(path) as file:
+        parameters = json.load(file)
+    parameters.setdefault('terms', {})
+    parameters.setdefault('override_threshold', DEFAULT_OVERRIDE_THRESHOLD)
+    # Files from before the setting were all scored with the fuzzy speeds
+    parameters.setdefault('cruise', 'fuzzy')
+    if parameters['cruise'] != cruise:
+        raise ValueError("'{}' was tuned for CRUISE = '{}', the controller runs '{}'".format(
+            path, parameters['cruise'], cruise))
+    if parameters['terms']:
+        for key, value in (('rule_base', rule_base), ('inputs', inputs)):
+            if parameters.get(key) != value:
+                raise ValueError("'{}' was tuned for {} '{}', the controller runs '{}'".format(
+                    path, key, parameters.get(key), value))
+    return parameters
+
+
+def save_parameters(path, parameters):
+    write_json(path, parameters)
+
+
+def write_json(path, data):
+    """Write ``data`` to ``path`` through a temporary file, so readers never see half a file."""
+    staging = '{}.{}.tmp'.format(path, os.getpid())
+    with open(staging, 'w') as file:
+        json.dump(data, file, indent=2, default=_plain)
+        file.write('\n')
+    os.replace(staging, path)
+
+
+def _plain(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Cannot write {!r} to a parameter file".format(value))
+
+
+def apply_terms(variables, terms):
+    """Replace the membership functions of skfuzzy ``variables`` listed in ``terms``.
+
+    Call before the rules are built: skfuzzy replaces the ``Term`` object,
+    so rules made earlier keep the old one.
+    """
+    for variable in variables:
+        for label, (kind, params) in terms.get(variable.label, {}).items():
+            if label not in variable.terms:
+                raise ValueError("Unknown term '{}' of '{}', expected one of {}".format(
+                    label, variable.label, list(variable.terms)))
+            variable[label] = getattr(fuzz, kind)(variable.universe, params)
@@ -0,0 +1,130 @@
+"""Run the per-frame vision work on a worker thread.
+
+The camera controllers do ``robot.step`` -> image -> HSV -> blob search ->
+actuation strictly in series, so the vision time adds to every step.
+``VisionPipeline`` moves the search to a worker thread: the main thread
+hands over frame N+1 and immediately acts on the newest finished result
+(normally frame N) while the worker processes the new frame during the
+next ``robot.step``.  OpenCV releases the GIL inside its calls, so the two
+threads really overlap.
+
+The hand-over queue holds a single frame.  If the worker is still busy when
+a new frame arrives, the waiting frame is stale and is replaced, so the
+worker always starts on the newest image and the lag never grows past one
+frame plus the one being processed.
+
+With ``threaded=False`` the same object runs the function inline, which
+keeps a single code path in the controllers.
+"""
+
+import queue
+import threading
+import time
+
+
+class VisionPipeline:
+    def __init__(self, process, threaded=True):
+        self.process = process
+        self.threaded = threaded
+        self.result = None
+        self.result_frame = -1
+        self.frame = -1
+        self.dropped = 0
+        self.processed = 0
+        self.process_time = 0.0
+        self.submit_time = 0.0
+        self.depth_total = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=1)
+        self._worker = None
+        if threaded:
+            self._worker = threading.Thread(target=self._run, name='vision', daemon=True)
+            self._worker.start()
+
+    def submit(self, image):
+        """Queue ``image`` for processing and return the newest result.
+
+        The image is copied, since the camera buffers are reused on the next
+        step.  Returns None until the first frame has been processed.
+        """
+        start = time.perf_counter()
+        self.frame += 1
+        if not self.threaded:
+            self._process(self.frame, image)
+        else:
+            item = (self.frame, image.copy())
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait(item)
+
+        with self._lock:
+            result, result_frame = self.result, self.result_frame
+        if result_frame >= 0:
+            depth = self.frame - result_frame
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+        self.submit_time += time.perf_counter() - start
+        return result
+
+    def close(self):
+        """Stop the worker thread."""
+        if self._worker is not None:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def stats(self):
+        """Pipeline counters; times are per step, in milliseconds."""
+        steps = max(self.frame + 1, 1)
+        processed = max(self.processed, 1)
+        process_ms = 1000 * self.process_time / processed
+        submit_ms = 1000 * self.submit_time / steps
+        return {
+            'threaded': self.threaded,
+            'steps': self.frame + 1,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'mean_depth': self.depth_total / steps,
+            'max_depth': self.max_depth,
+            'process_ms': process_ms,
+            'main_thread_ms': submit_ms,
+            # Vision time the main thread no longer waits for
+            'saved_ms': max(process_ms - submit_ms, 0.0) if self.threaded else 0.0,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return ("vision pipeline ({}): {} steps, {} processed, {} dropped, depth {:.2f} mean / {} max, "
+                "{:.2f} ms vision, {:.2f} ms on the main thread, {:.2f} ms saved per step").format(
+                    'threaded' if stats['threaded'] else 'inline', stats['steps'], stats['processed'],
+                    stats['dropped'], stats['mean_depth'], stats['max_depth'], stats['process_ms'],
+                    stats['main_thread_ms'], stats['saved_ms'])
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._process(*item)
+
+    def _process(self, frame, image):
+        start = time.perf_counter()
+        result = self.process(image)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.result = result
+            self.result_frame = frame
+            self.processed += 1
+            self.process_time += elapsed
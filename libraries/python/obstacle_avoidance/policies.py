@@ -0,0 +1,105 @@
+"""The controllers' obstacle avoidance decisions, vectorized over robots.
+
+Each policy takes the ``(N, 8)`` raw ``ps0`` ... ``ps7`` values and returns
+``(N, 2)`` left and right wheel speeds in rad/s, for ``ArenaSimulator.run``.
+
+``threshold_turn``
+    H2, my_controller1 (no target), cobain1 and my_controller57 with their
+    default ``CRUISE = 'straight'`` (my_controller57 has no other): turn
+    left when any right sensor (ps0-ps3) reads above 100, turn right when
+    any left sensor (ps4-ps7) does, otherwise drive straight, at 3.14 rad/s.
+    The fuzzy speed is never used.
+
+``obstacle1``
+    Obstacle1: turn on the spot away from a reading above 80 on the three
+    front sensors of either side, half speed otherwise.
+
+``FuzzyDistancePolicy``
+    The fuzzy speed of those controllers, from the group minima (or ps7/ps0
+    like H2), through ``BatchMamdani``.  With ``override_threshold`` it is
+    H2, my_controller1 and cobain1 with ``CRUISE = 'fuzzy'``: the turns of
+    ``threshold_turn`` above the threshold, the fuzzy speed below it.  With
+    the membership functions as they are, the free-space reading (about 67)
+    maps to almost zero speed, so this policy barely moves until it is
+    tuned.
+
+``rowwise(decide)`` wraps a per-robot function ``decide(ps_values) ->
+(left, right)``, e.g. a controller's loop body, at Python speed.
+"""
+
+import numpy as np
+
+from .batch import BatchMamdani
+
+DISTANCE_SPEED = 3.14
+
+
+def _any_above(ps_values, columns, threshold):
+    # Column by column: numpy reductions over a short axis are slow
+    above = ps_values[:, columns[0]] > threshold
+    for column in columns[1:]:
+        above |= ps_values[:, column] > threshold
+    return above
+
+
+def threshold_turn(ps_values, threshold=100, speed=DISTANCE_SPEED):
+    right_near = _any_above(ps_values, (0, 1, 2, 3), threshold)
+    left_near = _any_above(ps_values, (4, 5, 6, 7), threshold)
+    speeds = np.full((len(ps_values), 2), speed)
+    speeds[left_near, 1] = -speed
+    speeds[right_near] = (-speed, speed)
+    return speeds
+
+
+def obstacle1(ps_values, threshold=80.0, max_speed=6.28):
+    right_obstacle = _any_above(ps_values, (0, 1, 2), threshold)
+    left_obstacle = _any_above(ps_values, (5, 6, 7), threshold)
+    speeds = np.full((len(ps_values), 2), 0.5 * max_speed)
+    speeds[right_obstacle, 0] = -0.5 * max_speed
+    speeds[left_obstacle] = (0.5 * max_speed, -0.5 * max_speed)
+    return speeds
+
+
+class FuzzyDistancePolicy:
+    """Fuzzy wheel speeds from a two-input distance ``ControlSystem``.
+
+    ``inputs`` is ``'groups'`` (minimum of ps4-ps7 and of ps0-ps3, like
+    my_controller57 and cobain1) or ``'front'`` (ps7 and ps0, like H2).
+    Readings outside the 0-100 universe give full speed ahead, as in the
+    controllers.  Outputs in [-1, 1] are scaled by ``speed``.
+    """
+
+    def __init__(self, control_system, inputs='groups', speed=DISTANCE_SPEED, override_threshold=None,
+                 defuzz='sampled'):
+        if inputs not in ('groups', 'front'):
+            raise ValueError("Unknown policy inputs '{}', expected one of {}".format(inputs, ('groups', 'front')))
+        self.engine = BatchMamdani(control_system, ('left_distance', 'right_distance'),
+                                   ('left_speed', 'right_speed'), defuzz=defuzz)
+        self.inputs = inputs
+        self.speed = speed
+        self.override_threshold = override_threshold
+
+    def __call__(self, ps_values):
+        if self.inputs == 'groups':
+            distances = np.stack([ps_values[:, 4:8].min(axis=1), ps_values[:, 0:4].min(axis=1)], axis=1)
+        else:
+            distances = ps_values[:, [7, 0]]
+        in_range = ((distances >= 0) & (distances <= 100)).all(axis=1)
+        speeds = np.ones((len(ps_values), 2))
+        if in_range.any():
+            fuzzy = self.engine.compute(distances[in_range])
+            # No rule fired (NaN): keep going straight rather than stop
+            speeds[in_range] = np.where(np.isnan(fuzzy), 1.0, fuzzy)
+        speeds *= self.speed
+        if self.override_threshold is not None:
+            override = threshold_turn(ps_values, self.override_threshold, self.speed)
+            near = (ps_values > self.override_threshold).any(axis=1)
+            speeds[near] = override[near]
+        return speeds
+
+
+def rowwise(decide):
+    """Policy calling ``decide(ps_values_of_one_robot) -> (left, right)`` per robot."""
+    def policy(ps_values):
+        return np.array([decide(row) for row in ps_values.tolist()], dtype=float).reshape(-1, 2)
+    return policy
@@ -0,0 +1,156 @@
+"""Per-stage timing of the control loop.
+
+A controller calls ``start_step()`` right after ``robot.step()`` returns,
+``mark(stage)`` at the end of each stage (the time since the previous mark
+is charged to that stage) and ``end_step()`` before the next
+``robot.step()``.  ``StageProfiler`` keeps, per stage, a histogram over
+fixed log-spaced bins plus count, total, min and max, so memory does not
+grow with the run length.  A step whose controller time exceeds the basic
+time step is counted as an overrun; the last ``keep_overruns`` of them are
+kept with their stage breakdown.
+
+When profiling is off the controllers hold ``NULL_PROFILER`` instead, whose
+methods do nothing, so the cost is one method call per mark.
+
+``dump(path)`` writes the summary as JSON and returns it as text.
+"""
+
+import bisect
+import collections
+import itertools
+import json
+import time
+
+import numpy as np
+
+# Histogram bin edges in seconds: 1 us to 10 s, 10 bins per decade.  Kept as
+# a list, bisect on it is several times cheaper than np.searchsorted per call
+BIN_EDGES = np.logspace(-6, 1, 71).tolist()
+
+
+class StageStats:
+    def __init__(self):
+        self.counts = [0] * (len(BIN_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BIN_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the ``q``-th percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        index = bisect.bisect_left(list(itertools.accumulate(self.counts)), q / 100 * self.count)
+        if index >= len(BIN_EDGES):
+            return self.max
+        return min(BIN_EDGES[index], self.max)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': 1000 * self.total / max(self.count, 1),
+            'min_ms': 1000 * self.min if self.count else 0.0,
+            'max_ms': 1000 * self.max,
+            'p50_ms': 1000 * self.percentile(50),
+            'p95_ms': 1000 * self.percentile(95),
+            'p99_ms': 1000 * self.percentile(99),
+            'total_s': self.total,
+        }
+
+
+class StageProfiler:
+    def __init__(self, time_step=None, keep_overruns=100):
+        # Budget per step in seconds, from the basic time step in ms
+        self.budget = time_step / 1000.0 if time_step else None
+        self.stages = collections.OrderedDict()
+        self.step = StageStats()
+        self.steps = 0
+        self.overrun_count = 0
+        self.overruns = collections.deque(maxlen=keep_overruns)
+        self._current = {}
+        self._step_start = 0.0
+        self._last = 0.0
+
+    def start_step(self):
+        self._step_start = self._last = time.perf_counter()
+        self._current = {}
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.add(elapsed)
+        self._current[stage] = self._current.get(stage, 0.0) + elapsed
+
+    def end_step(self):
+        total = time.perf_counter() - self._step_start
+        self.step.add(total)
+        if self.budget is not None and total > self.budget:
+            self.overrun_count += 1
+            self.overruns.append({
+                'step': self.steps,
+                'total_ms': 1000 * total,
+                'stages_ms': {stage: 1000 * seconds for stage, seconds in self._current.items()},
+            })
+        self.steps += 1
+
+    def summary(self):
+        return {
+            'steps': self.steps,
+            'budget_ms': 1000 * self.budget if self.budget is not None else None,
+            'overrun_count': self.overrun_count,
+            'step': self.step.summary(),
+            'stages': {stage: stats.summary() for stage, stats in self.stages.items()},
+            'recent_overruns': list(self.overruns),
+        }
+
+    def report(self):
+        """Summary as a text table."""
+        summary = self.summary()
+        lines = ["{:<12} {:>7} {:>9} {:>9} {:>9} {:>9}".format('stage', 'count', 'mean ms', 'p95 ms', 'max ms',
+                                                                 'share')]
+        step_total = max(self.step.total, 1e-12)
+        for stage, stats in list(self.stages.items()) + [('step', self.step)]:
+            row = stats.summary()
+            lines.append("{:<12} {:>7} {:9.3f} {:9.3f} {:9.3f} {:8.1%}".format(
+                stage, row['count'], row['mean_ms'], row['p95_ms'], row['max_ms'], stats.total / step_total))
+        if summary['budget_ms'] is not None:
+            lines.append("{} of {} steps exceeded the {:g} ms time step".format(
+                self.overrun_count, self.steps, summary['budget_ms']))
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.summary(), file, indent=2)
+        return self.report()
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off."""
+
+    def start_step(self):
+        pass
+
+    def mark(self, stage):
+        pass
+
+    def end_step(self):
+        pass
+
+    def dump(self, path):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
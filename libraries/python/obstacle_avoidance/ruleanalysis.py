@@ -0,0 +1,341 @@
+"""Static analysis and pruning of compiled rule bases.
+
+The hand-written rule bases carry work whose result nobody reads.
+``Obstacle_Avoidance_FLC`` defuzzifies a ``target_direction`` the loop
+never uses.  Its ``rule4`` / ``rule5`` share the antecedent ``SI far & Sf
+near & Sr far`` and write opposite speeds, and ``rule3`` / ``rule6``
+collide the same way.  No rule covers all three sensors near, and no
+rule fires for a reading of 0 or of 100 and above, where both its terms
+are 0.  Such defects are invisible in a single ``compute()``.
+
+``RuleAnalysis`` reads a ``RuleMatrix`` and the sampled membership
+functions of its input terms, and reports:
+
+* ``unused_outputs``: outputs outside ``consumed``,
+* ``dead_rules``: rules whose firing strength is 0 over the whole input
+  space, because two of their terms (or a term and a complement) are never
+  non-zero together,
+* ``idle_rules``: live rules that only write unused outputs,
+* ``duplicates``: groups of rules with the same antecedent, with the
+  outputs they write different terms of (a conflict) or ``[]``,
+* ``unread_terms`` / ``empty_terms``: input terms no rule reads, or whose
+  membership is 0 over the whole universe,
+* ``unwritten_terms``: terms of consumed outputs no live rule writes,
+* ``uncovered``: regions of the input space where no rule writes some
+  consumed output.  skfuzzy raises there, ``BatchMamdani`` returns NaN.
+
+Everything is decided on the intervals where each term is non-zero, as in
+``activerules``: inputs are clipped to the universe and fuzzified by linear
+interpolation, so a term is non-zero strictly between the samples around
+its non-zero samples.  Each universe is cut into pieces, the ends of those
+intervals and the open spans between them, and inside a piece every term
+is either non-zero everywhere or 0 everywhere.  ``uncovered`` walks the
+product of the pieces input by input and stops as soon as every consumed
+output is known to be covered or not.  The walk stays short for the
+controllers' rule bases, but it grows with the product of the piece
+counts for a full grid over many inputs.
+
+``pruned()`` is the rule base compiled for execution: only the consumed
+outputs, without dead and idle rules, rules with the same antecedent merged
+into one that writes all their terms, and only the input terms the
+remaining rules read.  A dropped rule only ever added a zero cut, and a
+merged rule writes each term with the largest weight its rules had, so
+the cuts equal those of the whole matrix bit for bit.  ``BatchMamdani``
+runs the pruned matrix unless ``prune_rules=False``.
+"""
+
+import numpy as np
+
+from .rulematrix import RuleMatrix, _columns
+
+
+def live_intervals(universe, values):
+    """Open intervals where ``np.interp`` of the sampled ``values`` is non-zero.
+
+    Unbounded where the values are non-zero at the edge of the universe,
+    since inputs are clipped to it.
+    """
+    live = np.flatnonzero(np.asarray(values) > 0)
+    intervals = []
+    for run in np.split(live, np.flatnonzero(np.diff(live) > 1) + 1):
+        if not len(run):
+            continue
+        first, last = run[0], run[-1]
+        low = -np.inf if first == 0 else float(universe[first - 1])
+        high = np.inf if last == len(universe) - 1 else float(universe[last + 1])
+        intervals.append((low, high))
+    return intervals
+
+
+def _join(first, second):
+    """Span covering ``first`` followed directly by ``second``, None if they do not meet."""
+    if first is None or second is None:
+        return None
+    low, high, low_closed, high_closed = first
+    start, end, start_closed, end_closed = second
+    if high != start or high_closed == start_closed:
+        return None
+    return (low, end, low_closed, end_closed)
+
+
+def _live_in(intervals, piece):
+    low, high = piece
+    if low == high:
+        return any(a < low < b for a, b in intervals)
+    return any(a < high and b > low for a, b in intervals)
+
+
+class RuleAnalysis:
+    """Defects of a compiled ``matrix``, see the module docstring.
+
+    ``terms`` gives ``(input, universe, mf)`` for every input term in
+    ``matrix.input_terms`` order, as for ``ActiveRuleIndex``.
+    ``consumed`` lists the outputs the caller reads, all of them by
+    default.
+    """
+
+    def __init__(self, matrix, terms, consumed=None):
+        if len(terms) != len(matrix.input_terms):
+            raise ValueError("Expected {} input terms, got {}".format(len(matrix.input_terms), len(terms)))
+        consumed = list(matrix.outputs) if consumed is None else list(consumed)
+        for label in consumed:
+            if label not in matrix.outputs:
+                raise ValueError("Unknown output '{}', expected one of {}".format(label, list(matrix.outputs)))
+        self.matrix = matrix
+        self.consumed = [label for label in matrix.outputs if label in consumed]
+        self.unused_outputs = [label for label in matrix.outputs if label not in consumed]
+        rules = range(matrix.rule_count)
+        or_rules = [c == 'max' for c in matrix.connectives]
+
+        # Pieces of every universe and the rules each piece leaves possible
+        read = {(column, negated) for antecedent in matrix.antecedents for column, negated in antecedent}
+        self.pieces = []
+        self._domains = []
+        self._and_masks = []
+        self._or_masks = []
+        self.empty_terms = []
+        live_everywhere = sum(1 << r for r in rules if not or_rules[r])
+        for label in matrix.inputs:
+            columns = [c for c, (variable, _) in enumerate(matrix.input_terms) if variable == label]
+            if not columns:
+                self.pieces.append([None])
+                self._domains.append(None)
+                self._and_masks.append([live_everywhere])
+                self._or_masks.append([0])
+                continue
+            universe = np.asarray(terms[columns[0]][1], dtype=np.float64)
+            low, high = float(universe[0]), float(universe[-1])
+            live = {}
+            for column in columns:
+                mf = np.asarray(terms[column][2], dtype=np.float64)
+                live[column, False] = live_intervals(universe, mf)
+                if (column, True) in read:
+                    live[column, True] = live_intervals(universe, 1. - mf)
+            edges = sorted({e for intervals in live.values() for interval in intervals for e in interval
+                            if low < e < high} | {low, high})
+            pieces = []
+            for k, e in enumerate(edges):
+                pieces.append((e, e))
+                if k + 1 < len(edges):
+                    pieces.append((e, edges[k + 1]))
+            lives = {key: [_live_in(intervals, piece) for piece in pieces] for key, intervals in live.items()}
+            self.empty_terms += [matrix.input_terms[c] for c in columns if not any(lives[c, False])]
+            and_masks, or_masks = [], []
+            for p in range(len(pieces)):
+                and_mask = or_mask = 0
+                for r, antecedent in enumerate(matrix.antecedents):
+                    here = [lives[key][p] for key in antecedent if key[0] in columns]
+                    if or_rules[r]:
+                        or_mask |= any(here) << r
+                    else:
+                        and_mask |= all(here) << r
+                and_masks.append(and_mask)
+                or_masks.append(or_mask)
+            self.pieces.append(pieces)
+            self._domains.append((low, high, True, True))
+            self._and_masks.append(and_masks)
+            self._or_masks.append(or_masks)
+
+        # Rules that fire nowhere, and live rules with no consumed consequent
+        dead = 0
+        for r in rules:
+            if or_rules[r]:
+                if not any(mask >> r & 1 for masks in self._or_masks for mask in masks):
+                    dead |= 1 << r
+            elif not all(any(mask >> r & 1 for mask in masks) for masks in self._and_masks):
+                dead |= 1 << r
+        self.dead_rules = [r for r in rules if dead >> r & 1]
+        consumed_columns = {c for c, (label, _) in enumerate(matrix.output_terms) if label in self.consumed}
+        self.idle_rules = [r for r in rules if not dead >> r & 1
+                           and not any(c in consumed_columns for c, _ in matrix.consequents[r])]
+
+        groups = {}
+        for r in rules:
+            groups.setdefault((matrix.connectives[r], frozenset(matrix.antecedents[r])), []).append(r)
+        self.duplicates = []
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            written = {}
+            for r in group:
+                for column, _ in matrix.consequents[r]:
+                    label, term = matrix.output_terms[column]
+                    written.setdefault(label, set()).add(term)
+            self.duplicates.append((tuple(group), [label for label, terms in written.items() if len(terms) > 1]))
+
+        self.unread_terms = [matrix.input_terms[c] for c in range(len(matrix.input_terms))
+                             if not any((c, negated) in read for negated in (False, True))]
+        self._active = [r for r in rules if not dead >> r & 1 and r not in self.idle_rules]
+        writes = {c for r in self._active for c, _ in matrix.consequents[r]}
+        self.unwritten_terms = [matrix.output_terms[c] for c in sorted(consumed_columns) if c not in writes]
+
+        self._or_rules = sum(1 << r for r in self._active if or_rules[r])
+        self._writers = [sum(1 << r for r in self._active
+                             if any(matrix.output_terms[c][0] == label for c, _ in matrix.consequents[r]))
+                         for label in self.consumed]
+        # AND rules whose inputs all come before position k
+        positions = {label: k for k, label in enumerate(matrix.inputs)}
+        last = [max(positions[matrix.input_terms[c][0]] for c, _ in antecedent) for antecedent in matrix.antecedents]
+        self._settled = [sum(1 << r for r in self._active if not or_rules[r] and last[r] < k)
+                         for k in range(len(matrix.inputs) + 1)]
+        self._uncovered = None
+
+    @property
+    def uncovered(self):
+        """``[(region, outputs)]``: a region per input (see ``describe``) and the consumed outputs no rule writes there."""
+        if self._uncovered is None:
+            self._uncovered = []
+            active = sum(1 << r for r in self._active)
+            self._walk(0, active, 0, ())
+            self._uncovered = self._compact(self._uncovered)
+        return self._uncovered
+
+    def _walk(self, k, and_mask, or_hit, region):
+        count = len(self.matrix.inputs)
+        certain = (and_mask & self._settled[k]) | or_hit
+        possible = and_mask | (or_hit if k == count else self._or_rules)
+        if all(writers & certain or not writers & possible for writers in self._writers):
+            outputs = [label for label, writers in zip(self.consumed, self._writers) if not writers & possible]
+            if outputs:
+                self._uncovered.append((region + (None,) * (count - k), outputs))
+            return
+        pieces = self.pieces[k]
+        and_masks, or_masks = self._and_masks[k], self._or_masks[k]
+        start = 0
+        while start < len(pieces):
+            # Consecutive pieces that leave the same rules possible share a subtree
+            end = start + 1
+            while end < len(pieces) and and_masks[end] == and_masks[start] and or_masks[end] == or_masks[start]:
+                end += 1
+            if pieces[start] is None or (start == 0 and end == len(pieces)):
+                span = None
+            else:
+                (low, first_high), (last_low, high) = pieces[start], pieces[end - 1]
+                span = (low, high, low == first_high, last_low == high)
+            self._walk(k + 1, and_mask & and_masks[start], or_hit | (or_masks[start] & self._or_rules),
+                       region + (span,))
+            start = end
+
+    def _compact(self, regions):
+        """Join regions with the same outputs that differ in one contiguous span, until none do."""
+        regions = list(regions)
+        joined = True
+        while joined:
+            joined = False
+            for i in range(len(regions)):
+                for j in range(i + 1, len(regions)):
+                    (a, outputs), (b, other) = regions[i], regions[j]
+                    differ = [k for k in range(len(a)) if a[k] != b[k]]
+                    if outputs != other or len(differ) != 1:
+                        continue
+                    k = differ[0]
+                    span = _join(a[k], b[k]) or _join(b[k], a[k])
+                    if span is None:
+                        continue
+                    if span == self._domains[k]:
+                        span = None
+                    regions[i] = (a[:k] + (span,) + a[k + 1:], outputs)
+                    del regions[j]
+                    joined = True
+                    break
+                if joined:
+                    break
+        return regions
+
+    def describe(self, region):
+        """``region`` as text, e.g. ``'0 < SI <= 25, Sf = 100'``."""
+        parts = []
+        for label, span in zip(self.matrix.inputs, region):
+            if span is None:
+                continue
+            low, high, low_closed, high_closed = span
+            if low == high:
+                parts.append("{} = {:g}".format(label, low))
+            else:
+                parts.append("{:g} {} {} {} {:g}".format(low, '<=' if low_closed else '<', label,
+                                                         '<=' if high_closed else '<', high))
+        return ', '.join(parts) or 'everywhere'
+
+    def pruned(self, layout=None):
+        """The rule base compiled for execution, see the module docstring."""
+        matrix = self.matrix
+        outputs = {label: terms for label, terms in matrix.outputs.items() if label in self.consumed}
+        output_column = _columns(outputs)
+        merged = {}
+        for r in self._active:
+            connective, antecedent = matrix.connectives[r], matrix.antecedents[r]
+            # Only min and max are exact in any order
+            key = (connective, tuple(antecedent) if connective == 'prod' else frozenset(antecedent))
+            rule = merged.setdefault(key, (connective, antecedent, {}))
+            for column, weight in matrix.consequents[r]:
+                label, term = matrix.output_terms[column]
+                if label in outputs:
+                    new = output_column[label, term]
+                    rule[2][new] = max(weight, rule[2].get(new, weight))
+        read = sorted({column for _, antecedent, _ in merged.values() for column, _ in antecedent})
+        inputs = {label: [] for label in matrix.inputs}
+        for column in read:
+            label, term = matrix.input_terms[column]
+            inputs[label].append(term)
+        input_column = _columns(inputs)
+        renumber = {column: input_column[matrix.input_terms[column]] for column in read}
+        rules = list(merged.values())
+        return RuleMatrix(inputs, outputs, [[(renumber[c], negated) for c, negated in antecedent]
+                                            for _, antecedent, _ in rules],
+                          [connective for connective, _, _ in rules],
+                          [list(writes.items()) for _, _, writes in rules], layout=layout or matrix.layout)
+
+    def report(self):
+        """The findings as text, rules numbered from 1 like the controllers' ``rule1`` ..."""
+        matrix = self.matrix
+
+        def rules(indices):
+            return ', '.join('rule{}'.format(r + 1) for r in indices) or '-'
+
+        def terms(keys):
+            return ', '.join('{}[{}]'.format(label, term) for label, term in keys) or '-'
+
+        lines = [
+            "{} rules over {} -> {}".format(matrix.rule_count, list(matrix.inputs), self.consumed),
+            "unused outputs:  {}".format(', '.join(self.unused_outputs) or '-'),
+            "dead rules:      {}".format(rules(self.dead_rules)),
+            "idle rules:      {}".format(rules(self.idle_rules)),
+        ]
+        for group, outputs in self.duplicates:
+            if outputs:
+                lines.append("conflict:        {} share an antecedent and disagree on {}".format(
+                    rules(group), ', '.join(outputs)))
+            else:
+                lines.append("duplicate:       {} share an antecedent".format(rules(group)))
+        lines += [
+            "unread terms:    {}".format(terms(self.unread_terms)),
+            "empty terms:     {}".format(terms(self.empty_terms)),
+            "unwritten terms: {}".format(terms(self.unwritten_terms)),
+        ]
+        for region, outputs in self.uncovered:
+            lines.append("uncovered:       {} ({})".format(self.describe(region), ', '.join(outputs)))
+        pruned = self.pruned()
+        lines.append("compiled for execution: {} rules, {} of {} input terms, {} of {} output terms".format(
+            pruned.rule_count, len(pruned.input_terms), len(matrix.input_terms), len(pruned.output_terms),
+            len(matrix.output_terms)))
+        return '\n'.join(lines)
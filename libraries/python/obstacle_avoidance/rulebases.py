@@ -0,0 +1,287 @@
+"""Offline copies of the controllers' fuzzy rule bases.
+
+The controllers build their ``ControlSystem`` next to the ``Robot`` instance,
+so they cannot be imported outside Webots.  The functions here rebuild the
+same antecedents, consequents and rules with plain skfuzzy so rule bases can
+be evaluated, swept or re-scored offline.  Each ``RULE_BASES`` entry is
+named after its controller directory, ``SHARED_RULE_BASES`` names the
+controllers that build the same system as another entry.
+``tools/check_rulebases.py`` runs the controllers through the replay
+stand-in and fails when a copy's ``definition_hash`` differs from the
+system its controller builds.
+"""
+
+import numpy as np
+import skfuzzy as fuzz
+from skfuzzy import control as ctrl
+
+
+_SPEED_L = {
+    'lambatL': ('trapmf', [-1, -1, -0.5, 0]),
+    'sedangL': ('trapmf', [-0.5, 0, 0, 0.5]),
+    'cepatL': ('trapmf', [0, 0.5, 1, 1]),
+}
+_SPEED_R = {
+    'lambatR': ('trapmf', [-1, -1, -0.5, 0]),
+    'sedangR': ('trapmf', [-0.5, 0, 0, 0.5]),
+    'cepatR': ('trapmf', [0, 0.5, 1, 1]),
+}
+_DISTANCE_L = {
+    'dekatL': ('trapmf', [0, 0, 25, 50]),
+    'sedenganL': ('trapmf', [25, 35, 65, 75]),
+    'jauhL': ('trapmf', [50, 75, 100, 100]),
+}
+_DISTANCE_R = {
+    'dekatR': ('trapmf', [0, 0, 25, 50]),
+    'sedenganR': ('trapmf', [25, 35, 65, 75]),
+    'jauhR': ('trapmf', [50, 75, 100, 100]),
+}
+_FLC_SPEED = {
+    'Neg': ('trimf', [-100, -100, 0]),
+    'Z': ('trimf', [-50, 0, 50]),
+    'Pos': ('trimf', [0, 100, 100]),
+}
+_HHH1_SPEED = {
+    'n_med': ('trimf', [-6.28, -6.28, -3.14]),
+    'n_slow': ('trimf', [-3.14, 0, 0]),
+    'slow': ('trimf', [0, 0, 3.14]),
+    'medium': ('trimf', [0, 3.14, 3.14]),
+    'fast': ('trimf', [3.14, 6.28, 6.28]),
+}
+
+# Output term breakpoints, {rule base: {consequent: {term: (mf, params)}}};
+# pass them as ``shapes`` to ``BatchMamdani(defuzz='analytic')``
+OUTPUT_SHAPES = {
+    'H2': {'left_speed': _SPEED_L, 'right_speed': _SPEED_R},
+    'my_controller1': {'left_speed': _SPEED_L, 'right_speed': _SPEED_R},
+    'Obstacle_Avoidance_FLC': {
+        'target_direction': {
+            'Neg': ('trimf', [-1, -1, 0]),
+            'Z': ('trimf', [-0.5, 0, 0.5]),
+            'Pos': ('trimf', [0, 1, 1]),
+        },
+        'left_speed': _FLC_SPEED,
+        'right_speed': _FLC_SPEED,
+    },
+    'HHH1': {'left_speed': _HHH1_SPEED, 'right_speed': _HHH1_SPEED},
+    'my_controller2': {'left_speed': _SPEED_L, 'right_speed': _SPEED_R},
+    'my_controller123': {
+        'left_speed': {
+            'lambatL': ('trimf', [-1, -1, 0]),
+            'sedangL': ('trimf', [-0.5, 0, 0.5]),
+            'cepatL': ('trimf', [0, 1, 1]),
+        },
+        'right_speed': {
+            'lambatR': ('trimf', [-1, -1, 0]),
+            'sedangR': ('trimf', [-0.5, 0, 0.5]),
+            'cepatR': ('trimf', [0, 1, 1]),
+        },
+    },
+}
+
+
+def _add_terms(variable, terms):
+    for label, (kind, params) in terms.items():
+        variable[label] = getattr(fuzz, kind)(variable.universe, params)
+
+
+def _distance_variables(terms, shapes):
+    # Antecedents and consequents of the distance controllers, ``terms`` replacing membership functions
+    left_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'left_distance')
+    right_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'right_distance')
+    left_speed = ctrl.Consequent(np.arange(-1, 1.01, 0.01), 'left_speed')
+    right_speed = ctrl.Consequent(np.arange(-1, 1.01, 0.01), 'right_speed')
+
+    for variable, defaults in ((left_distance, _DISTANCE_L), (right_distance, _DISTANCE_R),
+                               (left_speed, shapes['left_speed']), (right_speed, shapes['right_speed'])):
+        _add_terms(variable, dict(defaults, **terms.get(variable.label, {})))
+    return left_distance, right_distance, left_speed, right_speed
+
+
+def h2_system(terms=None):
+    """``FuzzyController.initFuzzySystem`` in ``controllers/H2/H2.py``.
+
+    ``terms`` replaces membership functions, ``{variable: {term: (mf,
+    params)}}`` as in a tuned parameter file (see ``obstacle_avoidance.tuning``).
+    """
+    left_distance, right_distance, left_speed, right_speed = _distance_variables(terms or {}, OUTPUT_SHAPES['H2'])
+
+    rules = [
+        ctrl.Rule(left_distance['dekatL'] & right_distance['dekatR'], [left_speed['lambatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['dekatL'] & right_distance['sedenganR'], [left_speed['sedangL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['dekatL'] & right_distance['jauhR'], [left_speed['cepatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['sedenganL'] & right_distance['dekatR'], [left_speed['lambatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['sedenganL'] & right_distance['sedenganR'], [left_speed['lambatL'], right_speed['cepatR']]),
+        ctrl.Rule(left_distance['sedenganL'] & right_distance['jauhR'], [left_speed['sedangL'], right_speed['sedangR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['dekatR'], [left_speed['lambatL'], right_speed['cepatR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['sedenganR'], [left_speed['cepatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['jauhR'], [left_speed['cepatL'], right_speed['cepatR']]),
+    ]
+    return ctrl.ControlSystem(rules)
+
+
+def my_controller1_system(terms=None):
+    """``FuzzyController.buildFuzzySystem`` in ``controllers/my_controller1``, also built by cobain1 and
+    my_controller57.
+
+    H2's membership functions with other rules.  ``terms`` as for ``h2_system``.
+    """
+    left_distance, right_distance, left_speed, right_speed = _distance_variables(
+        terms or {}, OUTPUT_SHAPES['my_controller1'])
+
+    rules = [
+        ctrl.Rule(left_distance['dekatL'] & right_distance['dekatR'], [left_speed['lambatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['sedenganL'] & right_distance['dekatR'], [left_speed['sedangL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['dekatR'], [left_speed['cepatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['dekatL'] & right_distance['sedenganR'], [left_speed['lambatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['dekatL'] & right_distance['jauhR'], [left_speed['lambatL'], right_speed['cepatR']]),
+        ctrl.Rule(left_distance['sedenganL'] & right_distance['sedenganR'], [left_speed['sedangL'], right_speed['sedangR']]),
+        ctrl.Rule(left_distance['sedenganL'] & right_distance['jauhR'], [left_speed['lambatL'], right_speed['cepatR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['sedenganR'], [left_speed['cepatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['jauhR'], [left_speed['cepatL'], right_speed['cepatR']]),
+    ]
+    return ctrl.ControlSystem(rules)
+
+
+def obstacle_avoidance_flc_system():
+    """Module level system in ``controllers/Obstacle_Avoidance_FLC``."""
+    SI = ctrl.Antecedent(np.arange(0, 101, 1), 'SI')
+    Sf = ctrl.Antecedent(np.arange(0, 101, 1), 'Sf')
+    Sr = ctrl.Antecedent(np.arange(0, 101, 1), 'Sr')
+
+    target_direction = ctrl.Consequent(np.arange(-1, 1.01, 0.01), 'target_direction')
+    left_speed = ctrl.Consequent(np.arange(-80, 101, 1), 'left_speed')
+    right_speed = ctrl.Consequent(np.arange(-80, 101, 1), 'right_speed')
+
+    for variable in (SI, Sf, Sr):
+        variable['near'] = fuzz.trimf(variable.universe, [0, 25, 50])
+        variable['far'] = fuzz.trimf(variable.universe, [25, 50, 100])
+
+    for variable in (target_direction, left_speed, right_speed):
+        _add_terms(variable, OUTPUT_SHAPES['Obstacle_Avoidance_FLC'][variable.label])
+
+    rules = [
+        ctrl.Rule(SI['far'] & Sf['far'] & Sr['near'], [target_direction['Neg'], left_speed['Neg'], right_speed['Pos']]),
+        ctrl.Rule(SI['far'] & Sf['far'] & Sr['far'], [target_direction['Z'], left_speed['Z'], right_speed['Z']]),
+        ctrl.Rule(SI['near'] & Sf['far'] & Sr['far'], [target_direction['Pos'], left_speed['Pos'], right_speed['Neg']]),
+        ctrl.Rule(SI['far'] & Sf['near'] & Sr['far'], [target_direction['Neg'], left_speed['Neg'], right_speed['Pos']]),
+        ctrl.Rule(SI['far'] & Sf['near'] & Sr['far'], [target_direction['Pos'], left_speed['Pos'], right_speed['Neg']]),
+        ctrl.Rule(SI['near'] & Sf['far'] & Sr['far'], [target_direction['Z'], left_speed['Pos'], right_speed['Pos']]),
+        ctrl.Rule(SI['near'] & Sf['far'] & Sr['near'], [target_direction['Z'], left_speed['Pos'], right_speed['Pos']]),
+        ctrl.Rule(SI['near'] & Sf['near'] & Sr['far'], [target_direction['Z'], left_speed['Pos'], right_speed['Neg']]),
+        ctrl.Rule(SI['far'] & Sf['near'] & Sr['near'], [target_direction['Z'], left_speed['Neg'], right_speed['Pos']]),
+    ]
+    return ctrl.ControlSystem(rules)
+
+
+def hhh1_system():
+    """System built inside ``run_robot`` in ``controllers/HHH1/HHH1.py``."""
+    error = ctrl.Antecedent(np.arange(-376, 377, 1), 'error')
+    delta_error = ctrl.Antecedent(np.arange(-376, 376, 1), 'delta_error')
+    left_speed = ctrl.Consequent(np.arange(-6.28, 6.28, 1), 'left_speed')
+    right_speed = ctrl.Consequent(np.arange(-6.28, 6.28, 1), 'right_speed')
+
+    error['negative'] = fuzz.trapmf(error.universe, [-376, -376, -120, 0])
+    error['zero'] = fuzz.trimf(error.universe, [-50, 0, 50])
+    error['positive'] = fuzz.trapmf(error.universe, [0, 120, 376, 376])
+
+    delta_error['negative'] = fuzz.trapmf(delta_error.universe, [-376, -376, -120, 0])
+    delta_error['zero'] = fuzz.trimf(delta_error.universe, [-70, 0, 70])
+    delta_error['positive'] = fuzz.trapmf(delta_error.universe, [0, 120, 376, 376])
+
+    for variable in (left_speed, right_speed):
+        _add_terms(variable, OUTPUT_SHAPES['HHH1'][variable.label])
+
+    rules = [
+        ctrl.Rule(error['negative'] & delta_error['negative'], (left_speed['fast'], right_speed['n_med'])),
+        ctrl.Rule(error['negative'] & delta_error['zero'], (left_speed['fast'], right_speed['n_slow'])),
+        ctrl.Rule(error['negative'] & delta_error['positive'], (left_speed['fast'], right_speed['slow'])),
+        ctrl.Rule(error['zero'] & delta_error['negative'], (left_speed['fast'], right_speed['medium'])),
+        ctrl.Rule(error['zero'] & delta_error['zero'], (left_speed['fast'], right_speed['fast'])),
+        ctrl.Rule(error['zero'] & delta_error['positive'], (left_speed['medium'], right_speed['fast'])),
+        ctrl.Rule(error['positive'] & delta_error['negative'], (left_speed['slow'], right_speed['fast'])),
+        ctrl.Rule(error['positive'] & delta_error['zero'], (left_speed['n_slow'], right_speed['fast'])),
+        ctrl.Rule(error['positive'] & delta_error['positive'], (left_speed['n_med'], right_speed['fast'])),
+    ]
+    return ctrl.ControlSystem(rules)
+
+
+def my_controller2_system():
+    """``FuzzyController.__init__`` in ``controllers/my_controller2``."""
+    delta_error = ctrl.Antecedent(np.arange(-100, 101, 1), 'delta_error')
+    delta_speed = ctrl.Antecedent(np.arange(-3.14, 3.15, 0.01), 'delta_speed')
+    left_speed = ctrl.Consequent(np.arange(-1, 1.01, 0.01), 'left_speed')
+    right_speed = ctrl.Consequent(np.arange(-1, 1.01, 0.01), 'right_speed')
+
+    delta_error['negative'] = fuzz.trapmf(delta_error.universe, [-100, -100, -50, 0])
+    delta_error['zero'] = fuzz.trapmf(delta_error.universe, [-50, 0, 0, 50])
+    delta_error['positive'] = fuzz.trapmf(delta_error.universe, [0, 50, 100, 100])
+
+    delta_speed['negative'] = fuzz.trapmf(delta_speed.universe, [-3.14, -3.14, -1.57, 0])
+    delta_speed['zero'] = fuzz.trapmf(delta_speed.universe, [-1.57, 0, 0, 1.57])
+    delta_speed['positive'] = fuzz.trapmf(delta_speed.universe, [0, 1.57, 3.14, 3.14])
+
+    _add_terms(left_speed, OUTPUT_SHAPES['my_controller2']['left_speed'])
+    _add_terms(right_speed, OUTPUT_SHAPES['my_controller2']['right_speed'])
+
+    rules = [
+        ctrl.Rule(delta_error['negative'] & delta_speed['negative'], [left_speed['lambatL'], right_speed['cepatR']]),
+        ctrl.Rule(delta_error['negative'] & delta_speed['zero'], [left_speed['lambatL'], right_speed['sedangR']]),
+        ctrl.Rule(delta_error['negative'] & delta_speed['positive'], [left_speed['lambatL'], right_speed['lambatR']]),
+        ctrl.Rule(delta_error['zero'] & delta_speed['negative'], [left_speed['sedangL'], right_speed['cepatR']]),
+        ctrl.Rule(delta_error['zero'] & delta_speed['zero'], [left_speed['sedangL'], right_speed['sedangR']]),
+        ctrl.Rule(delta_error['zero'] & delta_speed['positive'], [left_speed['sedangL'], right_speed['lambatR']]),
+        ctrl.Rule(delta_error['positive'] & delta_speed['negative'], [left_speed['cepatL'], right_speed['cepatR']]),
+        ctrl.Rule(delta_error['positive'] & delta_speed['zero'], [left_speed['cepatL'], right_speed['sedangR']]),
+        ctrl.Rule(delta_error['positive'] & delta_speed['positive'], [left_speed['cepatL'], right_speed['lambatR']]),
+    ]
+    return ctrl.ControlSystem(rules)
+
+
+def my_controller123_system():
+    """Module level system in ``controllers/my_controller123``."""
+    left_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'left_distance')
+    right_distance = ctrl.Antecedent(np.arange(0, 101, 1), 'right_distance')
+    left_speed = ctrl.Consequent(np.arange(-1, 1.01, 0.01), 'left_speed')
+    right_speed = ctrl.Consequent(np.arange(-1, 1.01, 0.01), 'right_speed')
+
+    left_distance['dekatL'] = fuzz.trimf(left_distance.universe, [0, 0, 50])
+    left_distance['jauhL'] = fuzz.trimf(left_distance.universe, [0, 50, 100])
+    right_distance['dekatR'] = fuzz.trimf(right_distance.universe, [0, 0, 50])
+    right_distance['jauhR'] = fuzz.trimf(right_distance.universe, [0, 50, 100])
+
+    _add_terms(left_speed, OUTPUT_SHAPES['my_controller123']['left_speed'])
+    _add_terms(right_speed, OUTPUT_SHAPES['my_controller123']['right_speed'])
+
+    rules = [
+        ctrl.Rule(left_distance['dekatL'] & right_distance['dekatR'], [left_speed['lambatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['dekatR'], [left_speed['cepatL'], right_speed['lambatR']]),
+        ctrl.Rule(left_distance['dekatL'] & right_distance['jauhR'], [left_speed['lambatL'], right_speed['cepatR']]),
+        ctrl.Rule(left_distance['jauhL'] & right_distance['jauhR'], [left_speed['cepatL'], right_speed['cepatR']]),
+    ]
+    return ctrl.ControlSystem(rules)
+
+
+# name: (builder, input labels, output labels) in the column order the
+# controllers feed and read them
+RULE_BASES = {
+    'H2': (h2_system, ('left_distance', 'right_distance'), ('left_speed', 'right_speed')),
+    'my_controller1': (my_controller1_system, ('left_distance', 'right_distance'), ('left_speed', 'right_speed')),
+    'Obstacle_Avoidance_FLC': (obstacle_avoidance_flc_system, ('SI', 'Sf', 'Sr'),
+                               ('target_direction', 'left_speed', 'right_speed')),
+    'HHH1': (hhh1_system, ('error', 'delta_error'), ('left_speed', 'right_speed')),
+    'my_controller2': (my_controller2_system, ('delta_error', 'delta_speed'), ('left_speed', 'right_speed')),
+    'my_controller123': (my_controller123_system, ('left_distance', 'right_distance'), ('left_speed', 'right_speed')),
+}
+
+# Controllers that build the same system as the rule base of another one
+SHARED_RULE_BASES = {
+    'cobain1': 'my_controller1',
+    'my_controller57': 'my_controller1',
+}
+
+# Outputs the controllers act on, for the rule bases that compute more
+# (see obstacle_avoidance.ruleanalysis)
+CONSUMED_OUTPUTS = {
+    'Obstacle_Avoidance_FLC': ('left_speed', 'right_speed'),
+}
@@ -0,0 +1,375 @@
+"""Rule bases compiled to index arrays.
+
+skfuzzy evaluates a rule by walking its antecedent tree (``Term`` and
+``TermAggregate`` nodes) and the consequent list, one Python call per node,
+for every ``compute()``.  A rule base whose antecedents are flat
+conjunctions or disjunctions is just a few tables:
+
+* the membership columns each rule reads, with a flag for ``~term``,
+* the connective that combines them (``'min'`` or ``'prod'`` for AND,
+  ``'max'`` for OR),
+* the output term each rule writes, with its weight.
+
+``RuleMatrix`` holds those tables and evaluates a whole batch with gathers
+and reductions.  Arrays are term-major, one row per term or rule and one
+column per sample, so every gather copies whole contiguous rows.  The
+memberships go in as ``(n_input_terms, N)``, the rows ordered by input and
+then by term (``input_terms``).  When some rule needs them, they are
+extended with the complements and with constant 0 and 1 rows, so a negated
+term is an ordinary row and a rule shorter than the widest rule is padded
+with the neutral element of its connective.  The firing strengths come out
+as ``(n_rules, N)``.  The output cuts, the maximum over the rules writing
+a term of firing times weight, come out as ``(n_output_terms, N)``.
+
+Two layouts compute the same numbers:
+
+* ``'dense'``: one ``(n_rules, width, N)`` gather reduced over the middle
+  axis, and an ``(n_rules, n_output_terms, N)`` product for the cuts.
+* ``'sparse'``: the first antecedent row of every rule, reduced with the
+  second row of the rules that have one, and so on, so the whole reduction
+  is one ufunc call per position.  The cuts reduce each term's writers the
+  same way.  It does no work for the rule/term combinations a rule base
+  leaves empty, which matters once there are more than a handful of terms.
+  (``np.minimum.reduceat`` over rows is an order of magnitude slower than
+  these whole-row calls.)
+
+``RuleMatrix.from_rules`` compiles skfuzzy ``Rule`` objects.
+``RuleMatrix.from_table`` compiles a tabular spec, one row per rule::
+
+    RuleMatrix.from_table(
+        {'left_distance': ['dekatL', 'sedenganL', 'jauhL'], 'right_distance': [...]},
+        {'left_speed': ['lambatL', 'sedangL', 'cepatL'], 'right_speed': [...]},
+        [(('dekatL', 'dekatR'), ('lambatL', 'lambatR')), ...])
+
+In a table, an antecedent cell is a term label, ``'~label'`` for its
+complement or ``None`` for "any".  A consequent cell is a term label, a
+``(label, weight)`` pair or ``None``.
+
+The results match skfuzzy's ``and_func`` / ``or_func`` and ``fmax``
+accumulation bit for bit.  ``BatchMamdani`` uses this module for its
+firing strengths and cuts.
+"""
+
+import numpy as np
+
+from .runtime import lazy_import
+
+fuzzy_term = lazy_import('skfuzzy.control.term')
+fuzzy_variables = lazy_import('skfuzzy.control.antecedent_consequent')
+
+LAYOUTS = ('dense', 'sparse')
+# Connective of a rule: reduction over its antecedent columns, and the
+# column a shorter rule is padded with (its neutral element)
+CONNECTIVES = {
+    'min': (np.minimum, 'one'),
+    'prod': (np.multiply, 'one'),
+    'max': (np.maximum, 'zero'),
+}
+_AND_FUNCS = {np.fmin: 'min', np.minimum: 'min', np.multiply: 'prod'}
+_OR_FUNCS = {np.fmax: 'max', np.maximum: 'max'}
+
+
+class RuleMatrix:
+    """Compiled rule base over ``inputs`` and ``outputs``, ``{label: [term labels]}`` in column order.
+
+    ``antecedents`` lists, for every rule, its ``(input term column,
+    negated)`` pairs.  ``connectives`` gives one key of ``CONNECTIVES`` per
+    rule.  ``consequents`` lists, for every rule, its ``(output term column,
+    weight)`` pairs.
+    """
+
+    def __init__(self, inputs, outputs, antecedents, connectives, consequents, layout='sparse'):
+        if layout not in LAYOUTS:
+            raise ValueError("Unknown layout '{}', expected one of {}".format(layout, LAYOUTS))
+        for connective in connectives:
+            if connective not in CONNECTIVES:
+                raise ValueError("Unknown connective '{}', expected one of {}".format(
+                    connective, list(CONNECTIVES)))
+        if not len(antecedents) == len(connectives) == len(consequents):
+            raise ValueError("Expected one antecedent list, connective and consequent list per rule")
+        if any(not terms for terms in antecedents):
+            raise ValueError("Every rule needs at least one antecedent term")
+        self.inputs = {label: list(terms) for label, terms in inputs.items()}
+        self.outputs = {label: list(terms) for label, terms in outputs.items()}
+        self.input_terms = [(label, term) for label, terms in self.inputs.items() for term in terms]
+        self.output_terms = [(label, term) for label, terms in self.outputs.items() for term in terms]
+        self.antecedents = [[(int(column), bool(negated)) for column, negated in terms] for terms in antecedents]
+        self.connectives = list(connectives)
+        self.consequents = [[(int(column), float(weight)) for column, weight in terms] for terms in consequents]
+        self.layout = layout
+
+        # Extended membership rows: terms, complements, 0, 1
+        width = len(self.input_terms)
+        neutral = {'zero': 2 * width, 'one': 2 * width + 1}
+        rows = [[column + width * negated for column, negated in terms] for terms in self.antecedents]
+
+        # Dense: (rules, widest) gather table, padded per connective
+        widest = max((len(row) for row in rows), default=1)
+        self.gather = np.empty((len(rows), widest), dtype=np.intp)
+        for r, row in enumerate(rows):
+            pad = neutral[CONNECTIVES[self.connectives[r]][1]]
+            self.gather[r] = row + [pad] * (widest - len(row))
+
+        # Only build the complements and constants when some rule reads them
+        read = self.gather if layout == 'dense' else rows
+        self._extends = any(column >= width for row in read for column in row)
+
+        # Sparse: per connective, the first term of every rule, then the
+        # k-th term of the rules that have one
+        self._groups = []
+        for connective in sorted(set(self.connectives)):
+            rules = np.array([r for r, c in enumerate(self.connectives) if c == connective], dtype=np.intp)
+            self._groups.append((CONNECTIVES[connective][0], rules) + _by_position([rows[r] for r in rules]))
+
+        # Consequents: dense (rules, output terms) weights, and per written
+        # term its (rule, weight) writers, by position like the antecedents
+        self.weights = np.zeros((len(rows), len(self.output_terms)))
+        writers = [[] for _ in self.output_terms]
+        for r, terms in enumerate(self.consequents):
+            for column, weight in terms:
+                self.weights[r, column] = weight
+                writers[column].append((r, weight))
+        self.written = np.array([bool(w) for w in writers], dtype=bool)
+        self._written_terms = np.flatnonzero(self.written)
+        written = [writers[t] for t in self._written_terms]
+        self._writers = _by_position([[r for r, _ in w] for w in written])
+        self._writer_weights = _by_position([[weight for _, weight in w] for w in written], dtype=np.float64)
+        self._unit_weights = all(weight == 1 for w in written for _, weight in w)
+
+    @property
+    def rule_count(self):
+        return len(self.connectives)
+
+    @classmethod
+    def from_rules(cls, rules, inputs=None, outputs=None, layout='sparse'):
+        """Compile skfuzzy ``rules``.
+
+        ``inputs`` / ``outputs`` are the variable labels in column order, by
+        default in order of first use.  Consequents of other outputs are
+        left out.  Raises ``ValueError`` for antecedents that mix AND and OR,
+        negate a group, or use ``and_func`` / ``or_func`` / accumulation
+        functions other than min, product and max.
+        """
+        rules = list(rules)
+        flat = [_flatten(rule) for rule in rules]
+        variables = {}
+        for terms, _ in flat:
+            for term, _ in terms:
+                variables.setdefault(term.parent.label, term.parent)
+        if inputs is None:
+            inputs = list(variables)
+        consequent_variables = {}
+        for rule in rules:
+            for weighted in rule.consequent:
+                consequent_variables.setdefault(weighted.term.parent.label, weighted.term.parent)
+        if outputs is None:
+            outputs = list(consequent_variables)
+        for label in outputs:
+            variable = consequent_variables.get(label)
+            if variable is not None and variable.accumulation_method not in (
+                    np.fmax, np.maximum, fuzzy_variables.accumulation_max):
+                raise ValueError("Only max accumulation compiles, '{}' uses {!r}".format(
+                    label, variable.accumulation_method))
+
+        missing = set(variables) - set(inputs)
+        if missing:
+            raise ValueError("Rules read {} which are not among the inputs {}".format(sorted(missing), list(inputs)))
+        input_terms = {label: list(variables[label].terms) if label in variables else [] for label in inputs}
+        output_terms = {label: list(consequent_variables[label].terms) if label in consequent_variables else []
+                        for label in outputs}
+        input_column = _columns(input_terms)
+        output_column = _columns(output_terms)
+
+        antecedents = [[(input_column[term.parent.label, term.label], negated) for term, negated in terms]
+                       for terms, _ in flat]
+        consequents = [[(output_column[weighted.term.parent.label, weighted.term.label], float(weighted.weight))
+                        for weighted in rule.consequent if weighted.term.parent.label in output_terms]
+                       for rule in rules]
+        return cls(input_terms, output_terms, antecedents, [connective for _, connective in flat], consequents,
+                   layout=layout)
+
+    @classmethod
+    def from_table(cls, inputs, outputs, rows, connective='min', layout='sparse'):
+        """Compile a tabular rule spec, see the module docstring."""
+        input_column = _columns(inputs)
+        output_column = _columns(outputs)
+        antecedents, consequents = [], []
+        for n, (antecedent, consequent) in enumerate(rows):
+            if len(antecedent) != len(inputs) or len(consequent) != len(outputs):
+                raise ValueError("Rule row {} has {} antecedent and {} consequent cells, expected {} and {}".format(
+                    n, len(antecedent), len(consequent), len(inputs), len(outputs)))
+            terms = []
+            for label, cell in zip(inputs, antecedent):
+                if cell is None:
+                    continue
+                negated = cell.startswith('~')
+                terms.append((_cell_column(input_column, label, cell.lstrip('~')), negated))
+            antecedents.append(terms)
+            writes = []
+            for label, cell in zip(outputs, consequent):
+                if cell is None:
+                    continue
+                term, weight = (cell, 1.0) if isinstance(cell, str) else cell
+                writes.append((_cell_column(output_column, label, term), float(weight)))
+            consequents.append(writes)
+        return cls(inputs, outputs, antecedents, [connective] * len(antecedents), consequents, layout=layout)
+
+    def _extended(self, memberships):
+        memberships = np.asarray(memberships, dtype=np.float64)
+        if memberships.ndim == 1:
+            memberships = memberships[:, None]
+        if memberships.shape[0] != len(self.input_terms):
+            raise ValueError("Expected {} membership rows, got {}".format(len(self.input_terms), memberships.shape[0]))
+        if not self._extends:
+            return memberships
+        width, count = memberships.shape
+        extended = np.empty((2 * width + 2, count))
+        extended[:width] = memberships
+        np.subtract(1., memberships, out=extended[width:2 * width])
+        extended[-2] = 0.
+        extended[-1] = 1.
+        return extended
+
+    def firing_strengths(self, memberships):
+        """Firing strength ``(n_rules, N)`` of every rule for ``memberships`` ``(n_input_terms, N)``."""
+        extended = self._extended(memberships)
+        if self.layout == 'dense':
+            gathered = extended[self.gather]
+            if len(self._groups) == 1:
+                return self._groups[0][0].reduce(gathered, axis=1)
+            firing = np.empty((self.rule_count, extended.shape[1]))
+            for reduce, rules, _, _ in self._groups:
+                firing[rules] = reduce.reduce(gathered[rules], axis=1)
+            return firing
+        if len(self._groups) == 1:
+            reduce, _, first, steps = self._groups[0]
+            return _reduce_by_position(reduce, extended, first, steps)
+        firing = np.empty((self.rule_count, extended.shape[1]))
+        for reduce, rules, first, steps in self._groups:
+            firing[rules] = _reduce_by_position(reduce, extended, first, steps)
+        return firing
+
+    def cuts(self, firing):
+        """Cut level ``(n_output_terms, N)`` of every output term; 0 where ``written`` is False."""
+        if self.layout == 'dense':
+            return (firing[:, None] * self.weights[:, :, None]).max(axis=0, initial=0.)
+        cuts = np.zeros((len(self.output_terms), firing.shape[1]))
+        if not len(self._written_terms):
+            return cuts
+        if self._unit_weights:
+            cuts[self._written_terms] = _reduce_by_position(np.maximum, firing, *self._writers)
+            return cuts
+        (first, steps), (first_weight, weight_steps) = self._writers, self._writer_weights
+        value = firing[first] * first_weight[:, None]
+        for (members, writers), (_, weights) in zip(steps, weight_steps):
+            candidate = firing[writers] * weights[:, None]
+            if members is None:
+                np.maximum(value, candidate, out=value)
+            else:
+                value[members] = np.maximum(value[members], candidate)
+        cuts[self._written_terms] = value
+        return cuts
+
+    def evaluate(self, memberships):
+        """``cuts(firing_strengths(memberships))``."""
+        return self.cuts(self.firing_strengths(memberships))
+
+    def rows(self):
+        """The rules as ``from_table`` rows.
+
+        Raises ``ValueError`` for a rule that reads one input or writes one
+        output twice, which a row cannot express.
+        """
+        rows = []
+        for r, (antecedent, consequent) in enumerate(zip(self.antecedents, self.consequents)):
+            cells = dict.fromkeys(self.inputs)
+            for column, negated in antecedent:
+                label, term = self.input_terms[column]
+                if cells[label] is not None:
+                    raise ValueError("Rule {} reads '{}' twice and has no table row".format(r, label))
+                cells[label] = '~' + term if negated else term
+            writes = dict.fromkeys(self.outputs)
+            for column, weight in consequent:
+                label, term = self.output_terms[column]
+                if writes[label] is not None:
+                    raise ValueError("Rule {} writes '{}' twice and has no table row".format(r, label))
+                writes[label] = term if weight == 1 else (term, weight)
+            rows.append((tuple(cells.values()), tuple(writes.values())))
+        return rows
+
+    def with_layout(self, layout):
+        """The same rule base compiled for ``layout``."""
+        return RuleMatrix(self.inputs, self.outputs, self.antecedents, self.connectives, self.consequents,
+                          layout=layout)
+
+
+def _by_position(lists, dtype=np.intp):
+    """``(first, steps)`` of non-empty ``lists``: the first items, then per
+    position k > 0 the indices of the lists longer than k (None for all) and
+    their k-th items."""
+    first = np.array([items[0] for items in lists], dtype=dtype)
+    steps = []
+    for k in range(1, max((len(items) for items in lists), default=0)):
+        members = [n for n, items in enumerate(lists) if len(items) > k]
+        items = np.array([lists[n][k] for n in members], dtype=dtype)
+        steps.append((None if len(members) == len(lists) else np.array(members, dtype=np.intp), items))
+    return first, steps
+
+
+def _reduce_by_position(reduce, rows, first, steps):
+    """``reduce`` over the ``rows`` each list of ``_by_position`` names, position by position."""
+    value = rows[first]
+    for members, items in steps:
+        if members is None:
+            reduce(value, rows[items], out=value)
+        else:
+            value[members] = reduce(value[members], rows[items])
+    return value
+
+
+def _columns(variables):
+    return {(label, term): column for column, (label, term) in
+            enumerate((label, term) for label, terms in variables.items() for term in terms)}
+
+
+def _cell_column(columns, label, term):
+    if (label, term) not in columns:
+        raise ValueError("Unknown term '{}' of '{}', expected one of {}".format(
+            term, label, [t for (v, t) in columns if v == label]))
+    return columns[label, term]
+
+
+def _flatten(rule):
+    """``([(term, negated), ...], connective)`` of a flat AND or OR antecedent."""
+    kinds = set()
+    terms = []
+
+    def walk(node):
+        if isinstance(node, fuzzy_term.Term):
+            terms.append((node, False))
+        elif isinstance(node, fuzzy_term.TermAggregate):
+            if node.kind == 'not':
+                if not isinstance(node.term1, fuzzy_term.Term):
+                    raise ValueError("Rule '{}' negates a group, only single terms can be negated".format(rule.label))
+                terms.append((node.term1, True))
+            else:
+                kinds.add(node.kind)
+                walk(node.term1)
+                walk(node.term2)
+        else:
+            raise ValueError("Unsupported antecedent {!r} in rule '{}'".format(node, rule.label))
+
+    walk(rule.antecedent)
+    if len(kinds) > 1:
+        raise ValueError("Rule '{}' mixes AND and OR, only flat conjunctions or disjunctions compile".format(
+            rule.label))
+    if kinds == {'or'}:
+        if rule.or_func not in _OR_FUNCS:
+            raise ValueError("Rule '{}' uses or_func {!r}, expected np.fmax".format(rule.label, rule.or_func))
+        return terms, _OR_FUNCS[rule.or_func]
+    if rule.and_func is fuzzy_variables.accumulation_mult:
+        return terms, 'prod'
+    if rule.and_func not in _AND_FUNCS:
+        raise ValueError("Rule '{}' uses and_func {!r}, expected np.fmin or np.multiply".format(
+            rule.label, rule.and_func))
+    return terms, _AND_FUNCS[rule.and_func]
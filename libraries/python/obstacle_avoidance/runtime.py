@@ -0,0 +1,45 @@
+"""Deferred imports for the controllers and the shared package.
+
+Webots starts a fresh interpreter on every world reload, and importing
+``skfuzzy`` (which pulls in ``scipy``) takes about half a second, ``cv2``
+about a tenth.  A controller that never builds a skfuzzy system or never
+opens a camera window should not pay for them before its first step.
+
+``lazy_import(name)`` returns a stand-in for the module that imports it on
+the first attribute access::
+
+    cv2 = lazy_import('cv2')        # nothing imported yet
+    cv2.imshow(window, image)       # imported here
+
+The package's own optional paths use it (``DisplaySink`` in ``'none'`` mode,
+the camera and blob tracker until the first frame, the rule graph walk of
+``BatchMamdani``), and ``obstacle_avoidance`` itself only imports
+``BatchMamdani`` / ``FuzzyLookupTable`` when they are first used.  The
+controllers take skfuzzy and cv2 through it too: skfuzzy is only imported
+to build the fuzzy system, which a warm ``engines.build_engine`` skips.
+``tools/bench_startup.py`` measures the time to the first ``robot.step()``.
+"""
+
+import importlib
+
+
+class LazyModule:
+    """Module proxy that imports ``name`` on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        # Only reached for attributes the proxy itself does not have
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = 'imported' if self._module is not None else 'not imported'
+        return "<lazy module '{}' ({})>".format(self._name, state)
+
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,99 @@
+"""Run the parts of a control loop at different rates.
+
+Everything in the controllers ran once per ``robot.step()``: the sensors,
+the camera search, fuzzy inference, telemetry and several ``print`` calls.
+``StepScheduler`` lets each of them be registered as a task with its own
+period, counted in basic time steps, so the reflexes still run every step
+while vision can run every second or third step and console output once a
+second.
+
+Ordering is deterministic: the tasks due in a step run in the order they
+were added, and a task with period ``every`` runs on the steps where
+``(step - offset) % every == 0``.  Offsets spread tasks with the same
+period over different steps instead of stacking them on one.
+
+Every task call is timed.  ``load()`` reports, per task, the mean and
+maximum time per call and the share of the step budget (basic time step
+times number of steps) the task used, so a task that is too expensive to
+run every step shows up directly.
+"""
+
+import time
+
+
+class Task:
+    def __init__(self, name, function, every, offset):
+        self.name = name
+        self.function = function
+        self.every = every
+        self.offset = offset
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class StepScheduler:
+    """Tasks run by ``run_step()``, once per ``robot.step()``.
+
+    ``time_step`` is the basic time step in ms, used to convert periods
+    given in ms and to compute the load.
+    """
+
+    def __init__(self, time_step):
+        self.time_step = time_step
+        self.tasks = []
+        self.steps = 0
+
+    def add(self, name, function, every=1, period=None, offset=0):
+        """Run ``function()`` every ``every`` steps, or every ``period`` ms.
+
+        A period is rounded to the nearest whole number of steps (at least
+        one).  Returns the ``Task``.
+        """
+        if any(task.name == name for task in self.tasks):
+            raise ValueError("Task '{}' is already scheduled".format(name))
+        if period is not None:
+            every = max(1, int(round(period / self.time_step)))
+        if every < 1:
+            raise ValueError("Task '{}' must run at least every step, got every={}".format(name, every))
+        task = Task(name, function, int(every), int(offset) % int(every))
+        self.tasks.append(task)
+        return task
+
+    def run_step(self):
+        step = self.steps
+        for task in self.tasks:
+            if (step - task.offset) % task.every:
+                continue
+            start = time.perf_counter()
+            task.function()
+            elapsed = time.perf_counter() - start
+            task.calls += 1
+            task.total += elapsed
+            if elapsed > task.max:
+                task.max = elapsed
+        self.steps += 1
+
+    def load(self):
+        budget = self.steps * self.time_step / 1000.0
+        return {
+            task.name: {
+                'every': task.every,
+                'period_ms': task.every * self.time_step,
+                'calls': task.calls,
+                'mean_ms': 1000 * task.total / max(task.calls, 1),
+                'max_ms': 1000 * task.max,
+                'load': task.total / budget if budget else 0.0,
+            }
+            for task in self.tasks
+        }
+
+    def report(self):
+        """Load per task as a text table."""
+        lines = ["{:<12} {:>7} {:>7} {:>9} {:>9} {:>7}".format('task', 'every', 'calls', 'mean ms', 'max ms',
+                                                               'load')]
+        for name, row in self.load().items():
+            lines.append("{:<12} {:>7} {:>7} {:9.3f} {:9.3f} {:6.1%}".format(
+                name, row['every'], row['calls'], row['mean_ms'], row['max_ms'], row['load']))
+        lines.append("{} steps of {:g} ms".format(self.steps, self.time_step))
+        return '\n'.join(lines)
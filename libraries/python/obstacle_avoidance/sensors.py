@@ -0,0 +1,136 @@
+"""Distance sensor readings and their named groups, read once per step.
+
+The controllers read their sensors with ``[sensor.getValue() for sensor in
+self.ps]`` and then reduce slices of that list with ``min(ps_values[4],
+ps_values[5], ...)``, with the indices written out at every use.
+``SensorBank`` owns the devices, reads them into ``values`` (a list, one
+entry per device in the given order) and reduces named groups of indices
+with ``min(group)`` / ``max(group)``, so behaviours checked from separate
+callbacks (see ``obstacle_avoidance.behaviours``) share one read.
+
+Everything stays in plain lists: for five to eight values numpy's per-call
+overhead costs more than the reductions.  A group is picked with an
+``operator.itemgetter`` built once.  Still, a read plus three group
+reductions takes about 1.5 us, against 1.1 us for the list comprehension
+and hand-written ``min()`` / ``max()`` calls, the cost of the method calls.
+my_controller1 and cobain1 use the bank, whose behaviours read the group
+minima from several callbacks.  H2, my_controller57 and Obstacle1 check
+each group once per step and keep the plain list; HHH1 only reads the
+sensors its branches reach.
+
+``update()`` skips the devices when less than their sampling period has
+passed since the last read (Webots returns the same value until the sensor
+is sampled again).  That check only runs for devices sampled less often
+than every basic time step; at the basic step, as the controllers enable
+them, every step has a new sample.
+
+Two layouts are predefined: the e-puck ring ``ps0`` ... ``ps7`` and the five
+named infrared sensors of the HHH1 robot.
+"""
+
+from operator import itemgetter
+
+
+EPUCK_SENSORS = tuple('ps{}'.format(i) for i in range(8))
+# ps0-ps3 face front-right to back-right, ps4-ps7 back-left to front-left
+EPUCK_GROUPS = {
+    'right': (0, 1, 2, 3),
+    'left': (4, 5, 6, 7),
+    'front': (7, 0),
+}
+
+HHH1_SENSORS = ('left infrared sensor', 'front left infrared sensor', 'front infrared sensor',
+                'front right infrared sensor', 'right infrared sensor')
+HHH1_GROUPS = {
+    'left': (0, 1),
+    'front': (1, 2, 3),
+    'right': (3, 4),
+}
+
+
+class SensorBank:
+    """Devices ``names`` of ``robot``, read into ``values`` by ``update()``.
+
+    ``sampling_period`` (ms) enables the devices; by default they are
+    expected to be enabled already.  ``groups`` maps a name to a tuple of
+    indices into ``names``.  ``values`` is a new list after every read.
+    """
+
+    def __init__(self, robot, names, groups=None, sampling_period=None):
+        self.robot = robot
+        self.names = tuple(names)
+        self.devices = [robot.getDevice(name) for name in self.names]
+        self._getters = [device.getValue for device in self.devices]
+        self._period = None
+        self._slow = None
+        if sampling_period is not None:
+            self.enable(sampling_period)
+
+        self.values = [0.0] * len(self.names)
+        self.reads = 0
+        self.skipped = 0
+        self._next_read = None
+
+        self._members = {}
+        self._pick = {}
+        for group, members in (groups or {}).items():
+            members = tuple(members)
+            if not members:
+                raise ValueError("Sensor group '{}' is empty".format(group))
+            for member in members:
+                if not 0 <= member < len(self.names):
+                    raise ValueError("Sensor group '{}' refers to index {}, expected 0 to {}".format(
+                        group, member, len(self.names) - 1))
+            self._members[group] = members
+            # itemgetter of a single index returns the value, not a tuple
+            self._pick[group] = itemgetter(*members) if len(members) > 1 else itemgetter(slice(members[0],
+                                                                                              members[0] + 1))
+
+    def enable(self, sampling_period):
+        for device in self.devices:
+            device.enable(sampling_period)
+        self._period = None
+        self._slow = None
+        self._next_read = None
+
+    def period(self):
+        """Shortest sampling period of the devices in seconds, 0 when unknown."""
+        if self._period is None:
+            periods = [device.getSamplingPeriod() for device in self.devices]
+            periods = [period for period in periods if period > 0]
+            self._period = min(periods) / 1000.0 if periods else 0.0
+        return self._period
+
+    def update(self):
+        """Read the devices if they have been sampled since the last read.
+
+        Returns True when they were read.
+        """
+        if self._slow is None:
+            self._slow = self.period() * 1000.0 > self.robot.getBasicTimeStep()
+        if self._slow:
+            now = self.robot.getTime()
+            if self._next_read is not None and now < self._next_read:
+                self.skipped += 1
+                return False
+            # Half a millisecond of slack against rounding in the simulated time
+            self._next_read = now + self.period() - 0.0005
+        self.values = [getter() for getter in self._getters]
+        self.reads += 1
+        return True
+
+    def group(self, name):
+        """Values of group ``name`` as a tuple."""
+        return tuple(self._pick[name](self.values))
+
+    def min(self, group):
+        return min(self._pick[group](self.values))
+
+    def max(self, group):
+        return max(self._pick[group](self.values))
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __len__(self):
+        return len(self.values)
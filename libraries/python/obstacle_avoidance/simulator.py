@@ -0,0 +1,228 @@
+"""Headless kinematic simulator of N e-pucks in the obstacle arena.
+
+Webots runs one e-puck at about real time, too slow for tuning over
+thousands of episodes.  ``ArenaSimulator`` steps N independent e-pucks
+(they do not see or hit each other) through the ``Arena`` of
+``worlds/OBSTACLE ARENA.wbt`` with every quantity an array over robots:
+
+* differential drive kinematics: wheel speeds in rad/s, wheel radius
+  ``WHEEL_RADIUS``, axle ``AXLE_LENGTH``, integrated over the basic time
+  step at the midpoint heading,
+* the eight ``ps`` infrared sensors as single rays from their mounting
+  points on the body, converted to raw values through the e-puck lookup
+  table (``PS_LOOKUP``, linear interpolation, the last value beyond 7 cm),
+  optionally with its relative gaussian noise,
+* collisions: a move that would make the body disk touch a box or the
+  arena wall is cancelled and counted.  There is no sliding or pushing.
+
+A policy maps the ``(N, 8)`` sensor values to ``(N, 2)`` wheel speeds; see
+``obstacle_avoidance.policies`` for the controllers' decision functions.
+
+    sim = ArenaSimulator(Arena.from_wbt(), n=1000, seed=0)
+    stats = sim.run(policies.threshold_turn, steps=500)
+
+Most of the cost is the sensors.  Rays are only cast for robots within
+``PS_REACH`` of a box or the wall, and only against those boxes
+(``Arena.near_pairs``).  The boxes near each robot are looked up once per
+step and serve both the collision test and the next ``sense()``.  On one
+core a batch step of 10 000 robots with ``threshold_turn`` takes 6 to 9 ms
+(1 100 to 1 700 robot-steps per ms), against 1/32 robot-steps per ms for
+one e-puck in Webots; a fuzzy policy costs far more than the simulator
+(``tools/bench_simulator.py``).
+
+The e-puck dimensions, sensor poses and lookup table are those of the
+R2023b ``E-puck.proto``; the camera and the ground sensors are not modelled.
+"""
+
+import numpy as np
+
+from .arena import Arena, pair_minimum
+
+WHEEL_RADIUS = 0.0205
+AXLE_LENGTH = 0.052
+BODY_RADIUS = 0.037
+MAX_SPEED = 6.28
+
+# ps0 ... ps7: mounting point (x forward, y left) and ray direction in the robot frame
+PS_POSES = np.array([
+    (0.030, -0.010, -0.30),
+    (0.022, -0.025, -0.80),
+    (0.000, -0.031, -1.57),
+    (-0.030, -0.015, -2.64),
+    (-0.030, 0.015, 2.64),
+    (0.000, 0.031, 1.57),
+    (0.022, 0.025, 0.80),
+    (0.030, 0.010, 0.30),
+])
+# distance (m), raw value, relative noise
+PS_LOOKUP = np.array([
+    (0.000, 4095.00, 0.002),
+    (0.005, 2133.33, 0.003),
+    (0.010, 1465.73, 0.007),
+    (0.015, 601.46, 0.0406),
+    (0.020, 383.84, 0.01472),
+    (0.030, 234.93, 0.0241),
+    (0.040, 158.03, 0.0287),
+    (0.050, 120.00, 0.04225),
+    (0.060, 104.09, 0.03065),
+    (0.070, 67.19, 0.04897),
+])
+PS_RANGE = PS_LOOKUP[-1, 0]
+PS_FREE = PS_LOOKUP[-1, 1]
+# Farthest a sensor ray can see from the robot centre, with some margin
+PS_REACH = 0.035 + PS_RANGE + 0.005
+
+
+class ArenaSimulator:
+    """``n`` e-pucks in ``arena``, stepped together.
+
+    ``pose`` is the ``(n, 3)`` array of ``x, y, heading``; set it through
+    ``reset()``.  ``time_step`` is the control period in ms, like the
+    controllers' ``TIME_STEP``.  Geometry is computed in ``dtype``; float32
+    halves the memory traffic and is ample for a 2 m arena.
+    """
+
+    def __init__(self, arena=None, n=1, time_step=32, seed=None, noise=False, dtype=np.float32):
+        self.arena = arena if arena is not None else Arena.from_wbt()
+        self.n = int(n)
+        self.dt = time_step / 1000.0
+        self.noise = noise
+        self.dtype = np.dtype(dtype)
+        self.rng = np.random.default_rng(seed)
+        # Sensor mounting points and ray directions (as cos / sin) in dtype
+        self._ps = tuple(column.astype(self.dtype) for column in
+                         (PS_POSES[:, 0], PS_POSES[:, 1], np.cos(PS_POSES[:, 2]), np.sin(PS_POSES[:, 2])))
+        self.pose = np.zeros((self.n, 3), dtype=self.dtype)
+        self.collisions = np.zeros(self.n, dtype=np.int64)
+        self.distance = np.zeros(self.n)
+        self.steps = 0
+        self._pairs = None
+        self.reset()
+
+    def random_poses(self, count):
+        """``count`` collision-free poses, uniform over the free floor."""
+        poses = np.empty((0, 3))
+        limit = self.arena.radius - BODY_RADIUS
+        while len(poses) < count:
+            candidates = self.rng.uniform(-limit, limit, size=(2 * (count - len(poses)) + 16, 2))
+            free = ~self.arena.disk_collides(candidates, BODY_RADIUS)
+            candidates = candidates[free]
+            headings = self.rng.uniform(-np.pi, np.pi, size=(len(candidates), 1))
+            poses = np.vstack([poses, np.hstack([candidates, headings])])
+        return poses[:count]
+
+    def reset(self, pose=None):
+        """Start every robot at ``pose`` ((3,) or (n, 3)), or at random free poses."""
+        if pose is None:
+            self.pose = self.random_poses(self.n).astype(self.dtype)
+        else:
+            self.pose = np.broadcast_to(np.asarray(pose, dtype=self.dtype), (self.n, 3)).copy()
+        self.collisions[:] = 0
+        self.distance[:] = 0.0
+        self.steps = 0
+        self._pairs = None
+
+    def sensor_rays(self, robots=None):
+        """Origins and unit directions of the 8 sensor rays of ``robots`` (all by default).
+
+        Both have shape ``(len(robots) * 8, 2)``, robot-major.
+        """
+        pose = self.pose if robots is None else self.pose[robots]
+        mount_x, mount_y, ray_cos, ray_sin = self._ps
+        cos, sin = np.cos(pose[:, 2:3]), np.sin(pose[:, 2:3])
+        origins = np.empty((len(pose), 8, 2), dtype=self.dtype)
+        origins[..., 0] = pose[:, 0:1] + mount_x * cos - mount_y * sin
+        origins[..., 1] = pose[:, 1:2] + mount_x * sin + mount_y * cos
+        # Rotate the ray directions instead of taking 16 more cos / sin per robot
+        directions = np.empty((len(pose), 8, 2), dtype=self.dtype)
+        directions[..., 0] = ray_cos * cos - ray_sin * sin
+        directions[..., 1] = ray_cos * sin + ray_sin * cos
+        return origins.reshape(-1, 2), directions.reshape(-1, 2)
+
+    def sense(self):
+        """Raw ``ps0`` ... ``ps7`` values, shape ``(n, 8)``.
+
+        Rays are only cast for the robots within ``PS_REACH`` of a box or
+        the arena wall, and only against those boxes; the others read the
+        free-space value ``PS_FREE``.
+        """
+        centres = self.pose[:, :2]
+        distance = np.full((self.n, 8), PS_RANGE, dtype=self.dtype)
+        robots, boxes, _ = self._near_pairs()
+        if len(robots):
+            origins, directions = self.sensor_rays(robots)
+            hits = self.arena.ray_box_distance(origins, directions, np.repeat(boxes, 8))
+            # A robot near two boxes keeps the nearer hit of each ray
+            pair_minimum(distance, robots, hits.reshape(-1, 8))
+        robots = np.nonzero(self.arena.wall_gaps(centres) < PS_REACH)[0]
+        if len(robots):
+            origins, directions = self.sensor_rays(robots)
+            hits = self.arena.ray_wall_distance(origins, directions).reshape(-1, 8)
+            distance[robots] = np.minimum(distance[robots], hits)
+
+        if self.noise:
+            values = np.interp(distance, PS_LOOKUP[:, 0], PS_LOOKUP[:, 1])
+            sigma = np.interp(distance, PS_LOOKUP[:, 0], PS_LOOKUP[:, 2])
+            return values * (1.0 + sigma * self.rng.standard_normal(values.shape))
+        values = np.full((self.n, 8), PS_FREE)
+        near = distance < PS_RANGE
+        values[near] = np.interp(distance[near], PS_LOOKUP[:, 0], PS_LOOKUP[:, 1])
+        return values
+
+    def _near_pairs(self):
+        """``Arena.near_pairs`` of the current poses within ``PS_REACH``, kept from the last step."""
+        if self._pairs is None:
+            self._pairs = self.arena.near_pairs(self.pose[:, :2], PS_REACH)
+        return self._pairs
+
+    def step(self, speeds):
+        """Apply wheel speeds ``(n, 2)`` (rad/s, left then right) for one time step.
+
+        Returns the mask of robots whose move was cancelled by a collision.
+        """
+        speeds = np.clip(np.asarray(speeds, dtype=self.dtype), -MAX_SPEED, MAX_SPEED)
+        left, right = speeds[:, 0], speeds[:, 1]
+        linear = WHEEL_RADIUS * (left + right) / 2
+        angular = WHEEL_RADIUS * (right - left) / AXLE_LENGTH
+
+        heading = self.pose[:, 2]
+        middle = heading + angular * self.dt / 2
+        moved = np.empty_like(self.pose)
+        moved[:, 0] = self.pose[:, 0] + linear * self.dt * np.cos(middle)
+        moved[:, 1] = self.pose[:, 1] + linear * self.dt * np.sin(middle)
+        moved[:, 2] = (heading + angular * self.dt + np.pi) % (2 * np.pi) - np.pi
+
+        # One lookup serves the collision test and the next sense()
+        robots, boxes, gaps = self.arena.near_pairs(moved[:, :2], PS_REACH)
+        blocked = self.arena.wall_gaps(moved[:, :2]) < BODY_RADIUS
+        blocked[robots[gaps < BODY_RADIUS]] = True
+        if blocked.any():
+            moved[blocked] = self.pose[blocked]
+            old_robots, old_boxes, old_gaps = self._near_pairs()
+            keep = ~blocked[robots]
+            restore = blocked[old_robots]
+            robots = np.concatenate([robots[keep], old_robots[restore]])
+            order = np.argsort(robots, kind='stable')
+            robots = robots[order]
+            boxes = np.concatenate([boxes[keep], old_boxes[restore]])[order]
+            gaps = np.concatenate([gaps[keep], old_gaps[restore]])[order]
+        self.pose = moved
+        self._pairs = (robots, boxes, gaps)
+        self.collisions += blocked
+        self.distance += np.where(blocked, 0.0, np.abs(linear) * self.dt)
+        self.steps += 1
+        return blocked
+
+    def run(self, policy, steps):
+        """Drive every robot with ``policy(ps_values) -> speeds`` for ``steps`` steps.
+
+        Returns per-robot ``collisions`` (blocked steps), ``distance``
+        travelled (m) and the final ``pose``.
+        """
+        for _ in range(steps):
+            self.step(policy(self.sense()))
+        return {
+            'collisions': self.collisions.copy(),
+            'distance': self.distance.copy(),
+            'pose': self.pose.copy(),
+        }
@@ -0,0 +1,146 @@
+"""Uniform grid index over oriented boxes in the plane.
+
+Testing every ray or disk against every box costs ``K * M`` for ``K``
+queries and ``M`` boxes.  ``BoxGrid`` buckets the boxes by the grid cells
+their bounding rectangle overlaps, so a query only meets the boxes in the
+cells its own bounding rectangle overlaps.  For short queries (sensor rays,
+robot bodies) that is a handful of cells whatever the number of boxes, and
+the exact tests run on the candidate pairs only.
+
+Everything is batched: ``pairs(lower, upper)`` takes ``(K, 2)`` rectangle
+corners and returns two index arrays ``(queries, boxes)``, sorted by query,
+with each pair once.  A box spanning several cells that the query also
+spans is only reported from the first of those cells (the lowest shared
+column and row), so no sort or ``unique`` is needed.  Queries beyond the
+grid are clamped to its border cells, which only adds candidates.
+
+Short queries, spanning at most ``MAX_BLOCK_SPAN`` cells per axis, take a
+faster path: for each cell the grid keeps the deduplicated boxes of the
+``span x span`` block of cells starting there, padded into one table, so
+the candidates of a whole batch are one gather and one ``nonzero``.  The
+table for a span is built on first use.
+
+The cell size defaults to about two cells per box over the bounds, and no
+smaller than ``MIN_CELL_SIZE``, so the buckets stay short in dense arenas
+without making long walls span hundreds of cells.
+"""
+
+import math
+
+import numpy as np
+
+MIN_CELL_SIZE = 0.05
+MAX_BLOCK_SPAN = 4
+# Largest cells * boxes occupancy matrix built for a block table
+MAX_BLOCK_CELLS = 1 << 26
+
+
+def box_bounds(boxes):
+    """Axis-aligned ``lower`` and ``upper`` corners ``(M, 2)`` of oriented boxes ``(M, 5)``."""
+    cos, sin = np.abs(np.cos(boxes[:, 4])), np.abs(np.sin(boxes[:, 4]))
+    extent_x = cos * boxes[:, 2] + sin * boxes[:, 3]
+    extent_y = sin * boxes[:, 2] + cos * boxes[:, 3]
+    extent = np.stack([extent_x, extent_y], axis=1)
+    return boxes[:, :2] - extent, boxes[:, :2] + extent
+
+
+class BoxGrid:
+    """Grid of ``cell_size`` over ``bounds`` (``((x0, y0), (x1, y1))``), indexing ``boxes``."""
+
+    def __init__(self, boxes, bounds, cell_size=None):
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 5)
+        (x0, y0), (x1, y1) = bounds
+        if cell_size is None:
+            area = (x1 - x0) * (y1 - y0)
+            cell_size = max(MIN_CELL_SIZE, math.sqrt(area / max(2 * len(boxes), 1)))
+        self.cell_size = float(cell_size)
+        self.origin = np.array([x0, y0])
+        self.shape = (max(1, int(math.ceil((x1 - x0) / self.cell_size))),
+                      max(1, int(math.ceil((y1 - y0) / self.cell_size))))
+
+        lower, upper = box_bounds(boxes)
+        self._box_low = self._cells(lower)
+        box_high = self._cells(upper)
+        span = box_high - self._box_low + 1
+        counts = span[:, 0] * span[:, 1]
+        owner = np.repeat(np.arange(len(boxes)), counts)
+        cells = self._cell_ids(self._box_low, span, counts, owner)
+        # Bucket the boxes by cell: CSR ``starts`` / ``members``
+        order = np.argsort(cells, kind='stable')
+        self.members = owner[order]
+        self.counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]])
+        self._cell_members = (cells[order], self.members)
+        self._blocks = {}
+
+    def _cells(self, points):
+        """Cell column and row of ``points`` (K, 2), clamped to the grid."""
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.intp)
+        np.clip(cells[:, 0], 0, self.shape[0] - 1, out=cells[:, 0])
+        np.clip(cells[:, 1], 0, self.shape[1] - 1, out=cells[:, 1])
+        return cells
+
+    def _cell_ids(self, low, span, counts, owner):
+        """Flat ids of the ``span`` cells from ``low`` of every rectangle, rectangle by rectangle."""
+        offset = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        column = low[owner, 0] + offset % span[owner, 0]
+        row = low[owner, 1] + offset // span[owner, 0]
+        return row * self.shape[0] + column
+
+    def _block_table(self, span):
+        """``(cells, width)`` table of the boxes in each ``span x span`` block, padded with -1."""
+        if span not in self._blocks:
+            columns, rows = self.shape
+            box_count = len(self._box_low)
+            if columns * rows * box_count > MAX_BLOCK_CELLS:
+                self._blocks[span] = None
+                return None
+            cells, members = self._cell_members
+            occupied = np.zeros((rows, columns, box_count), dtype=bool)
+            occupied[cells // columns, cells % columns, members] = True
+            block = occupied.copy()
+            for row in range(span):
+                for column in range(span):
+                    block[:rows - row, :columns - column] |= occupied[row:, column:]
+            block = block.reshape(rows * columns, box_count)
+            counts = block.sum(axis=1)
+            table = np.full((len(block), max(int(counts.max(initial=0)), 1)), -1, dtype=np.intp)
+            owner, boxes = np.nonzero(block)
+            table[owner, np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)] = boxes
+            self._blocks[span] = table
+        return self._blocks[span]
+
+    def pairs(self, lower, upper):
+        """``(queries, boxes)`` whose bucket rectangles meet the query rectangles ``lower``-``upper``."""
+        low = self._cells(np.asarray(lower, dtype=float))
+        span = self._cells(np.asarray(upper, dtype=float)) - low + 1
+        widest = int(span.max(initial=1))
+        table = self._block_table(widest) if widest <= MAX_BLOCK_SPAN else None
+        if table is not None:
+            candidates = table[low[:, 1] * self.shape[0] + low[:, 0]]
+            query, slot = np.nonzero(candidates >= 0)
+            return query, candidates[query, slot]
+
+        counts = span[:, 0] * span[:, 1]
+        query = np.repeat(np.arange(len(low)), counts)
+        cells = self._cell_ids(low, span, counts, query)
+
+        found = self.counts[cells]
+        query = np.repeat(query, found)
+        cell = np.repeat(cells, found)
+        slot = np.arange(len(query)) - np.repeat(np.cumsum(found) - found, found) + np.repeat(self.starts[cells], found)
+        boxes = self.members[slot]
+
+        # Keep a pair only in the first cell shared by the box and the query
+        first_column = np.maximum(low[query, 0], self._box_low[boxes, 0])
+        first_row = np.maximum(low[query, 1], self._box_low[boxes, 1])
+        keep = cell == first_row * self.shape[0] + first_column
+        return query[keep], boxes[keep]
+
+    def segment_pairs(self, starts, ends):
+        """Candidate ``(segments, boxes)`` for segments ``starts`` -> ``ends`` (K, 2)."""
+        return self.pairs(np.minimum(starts, ends), np.maximum(starts, ends))
+
+    def disk_pairs(self, centres, radius):
+        """Candidate ``(disks, boxes)`` for disks of ``radius`` at ``centres`` (K, 2)."""
+        return self.pairs(centres - radius, centres + radius)
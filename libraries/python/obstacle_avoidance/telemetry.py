@@ -0,0 +1,118 @@
+"""Bounded-memory telemetry recording for the controllers.
+
+The controllers appended one list per step to ``self.data`` and wrote the
+whole list to ``robot_performance_data.csv`` in ``save_data()``, so memory
+grew with the run length and a crash lost the run.  ``TelemetryRecorder``
+keeps a fixed ring of ``chunks`` preallocated ``chunk_rows x columns``
+float64 blocks.  ``append()`` writes one row into the current block; a full
+block is handed to a background thread that appends it to a columnar
+spool file (see ``obstacle_avoidance.columnar``), and recording continues
+in the next free block.  Memory is therefore constant, at most one block is lost on a crash,
+and the main thread only ever pays for a row copy.  If the writer falls
+behind by the whole ring, ``append()`` waits for a free block; that wait is
+reported as ``stall_time``.
+
+``load()`` maps the spool as a ``ColumnarFile`` and ``export_csv()``
+rewrites it in the column layout of the old ``save_data()`` files, then
+deletes it.  A spool is only left behind by a run that never exported, as
+what it recorded before the crash.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .columnar import ColumnarFile, ColumnarWriter, columnar_to_csv
+
+# Column layout of the robot_performance_data.csv files
+PERFORMANCE_COLUMNS = ("Left Distance", "Right Distance", "Left Speed", "Right Speed")
+
+
+class TelemetryRecorder:
+    def __init__(self, columns, path, chunk_rows=256, chunks=4):
+        if chunks < 2:
+            raise ValueError("the ring needs at least two chunks")
+        self.columns = tuple(columns)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.flushed_chunks = 0
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+        self.stall_time = 0.0
+        self._ring = np.zeros((chunks, chunk_rows, len(self.columns)))
+        self._chunk = 0
+        self._row = 0
+        self._free = queue.Queue()
+        for chunk in range(1, chunks):
+            self._free.put(chunk)
+        self._full = queue.Queue()
+        self._store = ColumnarWriter(path, self.columns, chunk_rows)
+        self._writer = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._writer.start()
+
+    def append(self, row):
+        """Record one row of ``len(columns)`` numbers."""
+        self._ring[self._chunk, self._row] = row
+        self._row += 1
+        self.rows += 1
+        if self._row == self.chunk_rows:
+            self._full.put((self._chunk, self._row))
+            start = time.perf_counter()
+            self._chunk = self._free.get()
+            self.stall_time += time.perf_counter() - start
+            self._row = 0
+
+    def close(self):
+        """Flush the partial chunk and stop the writer thread."""
+        if self._writer is None:
+            return
+        if self._row:
+            self._full.put((self._chunk, self._row))
+        self._full.put(None)
+        self._writer.join()
+        self._writer = None
+        self._store.close()
+
+    def load(self):
+        """The rows flushed so far, as a ``ColumnarFile``."""
+        return ColumnarFile(self.path)
+
+    def export_csv(self, filename, keep_spool=False):
+        """Close the recorder and write the spool as a CSV with the column names as header.
+
+        The spool is deleted afterwards unless ``keep_spool`` is set.
+        """
+        self.close()
+        columnar_to_csv(self.path, filename)
+        if not keep_spool:
+            os.remove(self.path)
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'flushed_chunks': self.flushed_chunks,
+            'flush_ms': 1000 * self.flush_time,
+            'mean_flush_ms': 1000 * self.flush_time / max(self.flushed_chunks, 1),
+            'max_flush_ms': 1000 * self.max_flush_time,
+            'stall_ms': 1000 * self.stall_time,
+            'ring_bytes': self._ring.nbytes,
+        }
+
+    def _run(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            chunk, rows = item
+            start = time.perf_counter()
+            self._store.write_chunk(self._ring[chunk, :rows])
+            elapsed = time.perf_counter() - start
+            self.flush_time += elapsed
+            self.max_flush_time = max(self.max_flush_time, elapsed)
+            self.flushed_chunks += 1
+            self._free.put(chunk)
+
@@ -0,0 +1,334 @@
+"""Tune the distance controllers' override threshold and membership functions in the batched simulator.
+
+The breakpoints of H2's ``initMembershipFunctions`` (shared by
+my_controller1, cobain1 and my_controller57) and the override threshold of
+100 were picked by hand.  ``tune`` searches them with CMA-ES for one of the
+two control laws the controllers run (``cruise``, their ``CRUISE``):
+
+* ``'straight'``, the default of every controller: turn away from a reading
+  above the threshold, drive straight otherwise (``policies.threshold_turn``).
+  The fuzzy speeds are never used, so only the threshold is tuned.
+* ``'fuzzy'``: the same turns, and the fuzzy speeds below the threshold
+  (``policies.FuzzyDistancePolicy``).  The membership functions are tuned
+  along with the threshold, for the rule base of the ``inputs``
+  (``INPUT_RULE_BASES``): H2's rules on ps7 / ps0 (``'front'``) or
+  my_controller1's, which cobain1 shares, on the group minima
+  (``'groups'``).
+
+The pieces:
+
+* ``ParameterSpace`` lists the free breakpoints.  Left and right terms share
+  one set (the controllers are symmetric); breakpoints on a universe bound
+  (the shoulders of ``dekat`` / ``jauh`` and ``lambat`` / ``cepat``) stay
+  there.  The optimizer works in the unit cube, ``decode`` clips, maps to
+  the real ranges and sorts each term's breakpoints so every candidate is a
+  valid membership function.
+* ``evaluate`` runs headless episodes of ``ArenaSimulator`` with the
+  candidate's control law and scores them on progress (distance travelled
+  over the distance at full speed), collisions (share of blocked
+  robot-steps) and smoothness (mean change of the wheel commands per step).
+  Every candidate meets the same episodes (same seeds), so scores are
+  comparable across generations.
+* Candidates of a generation are evaluated on a ``ProcessPoolExecutor``,
+  one process per core by default.
+* After every generation the optimizer state, its random state and the
+  best candidate so far are written to a JSON checkpoint; ``tune`` resumes
+  from it and continues with the same sequence of samples.
+
+The result is written with ``parameters.save_parameters`` and loaded by the
+controllers through their ``FUZZY_PARAMS`` setting, which refuses a file
+tuned for another ``CRUISE``, rule base or inputs.
+"""
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from .arena import Arena
+from .parameters import DEFAULT_OVERRIDE_THRESHOLD, write_json
+from .policies import FuzzyDistancePolicy, threshold_turn
+from .rulebases import RULE_BASES
+from .simulator import WHEEL_RADIUS, ArenaSimulator
+
+# (left variable, left term, right variable, right term, mf, hand-picked breakpoints, universe bounds)
+H2_TERMS = (
+    ('left_distance', 'dekatL', 'right_distance', 'dekatR', 'trapmf', (0, 0, 25, 50), (0, 100)),
+    ('left_distance', 'sedenganL', 'right_distance', 'sedenganR', 'trapmf', (25, 35, 65, 75), (0, 100)),
+    ('left_distance', 'jauhL', 'right_distance', 'jauhR', 'trapmf', (50, 75, 100, 100), (0, 100)),
+    ('left_speed', 'lambatL', 'right_speed', 'lambatR', 'trapmf', (-1, -1, -0.5, 0), (-1, 1)),
+    ('left_speed', 'sedangL', 'right_speed', 'sedangR', 'trapmf', (-0.5, 0, 0, 0.5), (-1, 1)),
+    ('left_speed', 'cepatL', 'right_speed', 'cepatR', 'trapmf', (0, 0.5, 1, 1), (-1, 1)),
+)
+THRESHOLD_RANGE = (60.0, 400.0)
+CRUISES = ('straight', 'fuzzy')
+# Rule base of the controllers that feed the fuzzy system these inputs
+INPUT_RULE_BASES = {'front': 'H2', 'groups': 'my_controller1'}
+
+# Score = progress - COLLISION_WEIGHT * collisions - SMOOTHNESS_WEIGHT * jerk
+COLLISION_WEIGHT = 5.0
+SMOOTHNESS_WEIGHT = 0.2
+
+
+class ParameterSpace:
+    """Free breakpoints of ``terms`` (rows like ``H2_TERMS``, none for the ``'straight'`` cruise) plus the
+    override threshold."""
+
+    def __init__(self, terms=H2_TERMS, threshold_range=THRESHOLD_RANGE):
+        self.terms = tuple(terms)
+        self.threshold_range = threshold_range
+        names, low, high, initial = [], [], [], []
+        self._slots = []
+        for left_variable, left_term, _, right_term, _, defaults, (lower, upper) in self.terms:
+            slots = []
+            for index, value in enumerate(defaults):
+                if value in (lower, upper):
+                    continue
+                slots.append(index)
+                names.append('{}/{}[{}]'.format(left_term, right_term, index))
+                low.append(lower)
+                high.append(upper)
+                initial.append(value)
+            self._slots.append(slots)
+        if threshold_range is not None:
+            names.append('override_threshold')
+            low.append(threshold_range[0])
+            high.append(threshold_range[1])
+            initial.append(DEFAULT_OVERRIDE_THRESHOLD)
+        if not names:
+            raise ValueError("Nothing to tune, pass terms or a threshold range")
+        self.names = names
+        self.low = np.array(low, dtype=float)
+        self.high = np.array(high, dtype=float)
+        self.initial = np.array(initial, dtype=float)
+
+    def __len__(self):
+        return len(self.names)
+
+    def normalize(self, values):
+        return (np.asarray(values, dtype=float) - self.low) / (self.high - self.low)
+
+    def decode(self, unit):
+        """Parameter dict (``terms``, ``override_threshold``) of a point of the unit cube."""
+        values = self.low + np.clip(unit, 0.0, 1.0) * (self.high - self.low)
+        terms = {}
+        position = 0
+        for (left_variable, left_term, right_variable, right_term, kind, defaults, _), slots in zip(
+                self.terms, self._slots):
+            params = list(defaults)
+            for index in slots:
+                params[index] = float(values[position])
+                position += 1
+            # Sorted breakpoints keep the shape valid whatever the optimizer proposes
+            params = sorted(params)
+            terms.setdefault(left_variable, {})[left_term] = [kind, params]
+            terms.setdefault(right_variable, {})[right_term] = [kind, params]
+        threshold = float(values[position]) if self.threshold_range is not None else DEFAULT_OVERRIDE_THRESHOLD
+        return {'terms': terms, 'override_threshold': threshold}
+
+
+class CMAES:
+    """Covariance matrix adaptation evolution strategy, minimizing.
+
+    The textbook (mu / mu_w, lambda) variant with rank-one and rank-mu
+    updates and cumulative step-size adaptation.
+    """
+
+    def __init__(self, mean, sigma, population=None, seed=None):
+        self.mean = np.array(mean, dtype=float)
+        n = len(self.mean)
+        self.sigma = float(sigma)
+        self.population = int(population or 4 + int(3 * math.log(n)))
+        mu = self.population // 2
+        weights = math.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1.0 / np.sum(self.weights ** 2)
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0.0, math.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+        self.generation = 0
+        self.rng = np.random.default_rng(seed)
+        self._steps = None
+
+    def ask(self):
+        """``population`` candidate points, shape ``(population, n)``."""
+        eigenvalues, basis = np.linalg.eigh(self.C)
+        scale = np.sqrt(np.maximum(eigenvalues, 1e-20))
+        self._eigen = (basis, scale)
+        normal = self.rng.standard_normal((self.population, len(self.mean)))
+        self._steps = (normal * scale) @ basis.T
+        return self.mean + self.sigma * self._steps
+
+    def tell(self, costs):
+        """Update from the ``costs`` of the points of the last ``ask()``."""
+        n = len(self.mean)
+        order = np.argsort(costs, kind='stable')
+        selected = self._steps[order[:len(self.weights)]]
+        step = self.weights @ selected
+        self.mean = self.mean + self.sigma * step
+
+        basis, scale = self._eigen
+        whitened = basis @ ((basis.T @ step) / scale)
+        self.ps = (1 - self.cs) * self.ps + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * whitened
+        norm = np.linalg.norm(self.ps) / math.sqrt(1 - (1 - self.cs) ** (2 * (self.generation + 1)))
+        stalled = norm / self.chi_n >= 1.4 + 2 / (n + 1)
+        self.pc = (1 - self.cc) * self.pc
+        if not stalled:
+            self.pc += math.sqrt(self.cc * (2 - self.cc) * self.mueff) * step
+        rank_mu = (selected * self.weights[:, None]).T @ selected
+        self.C = ((1 - self.c1 - self.cmu) * self.C + self.c1 * np.outer(self.pc, self.pc) + self.cmu * rank_mu
+                  + (self.c1 * self.cc * (2 - self.cc) * self.C if stalled else 0.0))
+        self.C = (self.C + self.C.T) / 2
+        self.sigma *= math.exp((self.cs / self.damps) * (np.linalg.norm(self.ps) / self.chi_n - 1))
+        self.generation += 1
+        self._steps = None
+
+    def state(self):
+        return {
+            'mean': self.mean.tolist(), 'sigma': self.sigma, 'population': self.population,
+            'pc': self.pc.tolist(), 'ps': self.ps.tolist(), 'C': self.C.tolist(),
+            'generation': self.generation, 'rng': self.rng.bit_generator.state,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        optimizer = cls(state['mean'], state['sigma'], state['population'])
+        optimizer.pc = np.array(state['pc'])
+        optimizer.ps = np.array(state['ps'])
+        optimizer.C = np.array(state['C'])
+        optimizer.generation = state['generation']
+        optimizer.rng.bit_generator.state = state['rng']
+        return optimizer
+
+
+# Arenas already read by this worker process, by world path
+_ARENAS = {}
+
+
+def _arena(world):
+    if world not in _ARENAS:
+        _ARENAS[world] = Arena.from_wbt(world) if world else Arena.from_wbt()
+    return _ARENAS[world]
+
+
+def evaluate(parameters, config):
+    """Score of ``parameters`` over the episodes described by ``config``.
+
+    ``config`` keys: ``robots``, ``steps``, ``episodes``, ``seed``,
+    ``cruise`` (one of ``CRUISES``), ``inputs`` (``'groups'`` or
+    ``'front'``, for the ``'fuzzy'`` cruise), ``speed``, ``time_step``,
+    ``world`` (None for the project's), ``collision_weight``,
+    ``smoothness_weight``.  Returns the metrics and ``score`` (higher is
+    better).
+    """
+    threshold = parameters['override_threshold']
+    if config['cruise'] == 'straight':
+        def policy(ps_values):
+            return threshold_turn(ps_values, threshold, config['speed'])
+    else:
+        builder = RULE_BASES[INPUT_RULE_BASES[config['inputs']]][0]
+        policy = FuzzyDistancePolicy(builder(parameters['terms']), inputs=config['inputs'], speed=config['speed'],
+                                     override_threshold=threshold)
+    arena = _arena(config['world'])
+    progress = collisions = jerk = 0.0
+    for episode in range(config['episodes']):
+        sim = ArenaSimulator(arena, n=config['robots'], time_step=config['time_step'],
+                             seed=config['seed'] + episode)
+        previous = None
+        changes = 0.0
+        for _ in range(config['steps']):
+            speeds = policy(sim.sense())
+            sim.step(speeds)
+            if previous is not None:
+                changes += np.abs(speeds - previous).sum(axis=1).mean()
+            previous = speeds
+        full_speed = config['speed'] * WHEEL_RADIUS * sim.dt * config['steps']
+        progress += sim.distance.mean() / full_speed
+        collisions += sim.collisions.sum() / (config['robots'] * config['steps'])
+        # Per step, relative to reversing both wheels at full speed
+        jerk += changes / max(config['steps'] - 1, 1) / (4 * config['speed'])
+    progress, collisions, jerk = (value / config['episodes'] for value in (progress, collisions, jerk))
+    score = progress - config['collision_weight'] * collisions - config['smoothness_weight'] * jerk
+    return {'score': float(score), 'progress': float(progress), 'collisions': float(collisions), 'jerk': float(jerk)}
+
+
+def default_config(**overrides):
+    config = {
+        'robots': 64, 'steps': 300, 'episodes': 2, 'seed': 0, 'cruise': 'straight', 'inputs': 'groups',
+        'speed': 3.14, 'time_step': 32, 'world': None,
+        'collision_weight': COLLISION_WEIGHT, 'smoothness_weight': SMOOTHNESS_WEIGHT,
+    }
+    unknown = set(overrides) - set(config)
+    if unknown:
+        raise ValueError("Unknown tuning settings {}, expected some of {}".format(sorted(unknown), sorted(config)))
+    config.update(overrides)
+    if config['cruise'] not in CRUISES:
+        raise ValueError("Unknown cruise '{}', expected one of {}".format(config['cruise'], list(CRUISES)))
+    if config['inputs'] not in INPUT_RULE_BASES:
+        raise ValueError("Unknown inputs '{}', expected one of {}".format(config['inputs'], list(INPUT_RULE_BASES)))
+    return config
+
+
+def _load_checkpoint(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def tune(space, config, generations, population=None, sigma=0.2, workers=None, checkpoint=None, seed=0,
+         log=print):
+    """Run CMA-ES up to ``generations`` and return the best result.
+
+    The result is a dict of the best ``parameters``, their metrics
+    (``score``), the ``baseline`` metrics of the hand-picked parameters and
+    the ``generation`` reached.  With ``checkpoint`` the state is saved
+    there after every generation and, if the file exists, loaded first;
+    its ``config`` must match.
+    """
+    if checkpoint is not None and os.path.exists(checkpoint):
+        state = _load_checkpoint(checkpoint)
+        if state['config'] != config or state['names'] != space.names:
+            raise ValueError("Checkpoint '{}' was written with other settings, remove it or pass the same "
+                             "settings".format(checkpoint))
+        optimizer = CMAES.from_state(state['optimizer'])
+        best, baseline, history = state['best'], state['baseline'], state['history']
+        log("resumed from {} at generation {}".format(checkpoint, optimizer.generation))
+    else:
+        optimizer = CMAES(space.normalize(space.initial), sigma, population, seed)
+        best = baseline = None
+        history = []
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        if baseline is None:
+            initial = space.decode(space.normalize(space.initial))
+            baseline = evaluate(initial, config)
+            best = {'parameters': initial, 'score': baseline, 'generation': 0}
+            log("baseline score {score:.4f} (progress {progress:.3f}, collisions {collisions:.4f}, "
+                "jerk {jerk:.3f})".format(**baseline))
+        while optimizer.generation < generations:
+            candidates = [space.decode(point) for point in optimizer.ask()]
+            results = list(pool.map(evaluate, candidates, repeat(config)))
+            optimizer.tell([-result['score'] for result in results])
+            top = int(np.argmax([result['score'] for result in results]))
+            if results[top]['score'] > best['score']['score']:
+                best = {'parameters': candidates[top], 'score': results[top], 'generation': optimizer.generation}
+            history.append({'generation': optimizer.generation, 'best': results[top]['score'],
+                            'mean': float(np.mean([result['score'] for result in results])),
+                            'sigma': optimizer.sigma})
+            log("generation {:3d}  best {:.4f}  mean {:.4f}  sigma {:.3f}  overall {:.4f}".format(
+                optimizer.generation, history[-1]['best'], history[-1]['mean'], optimizer.sigma,
+                best['score']['score']))
+            if checkpoint is not None:
+                write_json(checkpoint, {
+                    'config': config, 'names': space.names, 'optimizer': optimizer.state(),
+                    'best': best, 'baseline': baseline, 'history': history,
+                })
+    return dict(best, baseline=baseline, generation=optimizer.generation, history=history)
@@ -0,0 +1,191 @@
+"""Colour blob tracking shared by the camera controllers.
+
+H2, HHH1 and my_controller1 each ran the same steps inline every frame:
+``cvtColor`` to HSV, ``inRange`` on blue, ``findContours(RETR_TREE)``, a
+Python loop over ``contourArea`` and ``moments`` of the winner, with the
+``lower_blue`` / ``upper_blue`` arrays rebuilt on every step.
+
+``ColorBlobTracker`` keeps the bounds and the mask buffer between frames and
+offers two cheaper ways to find the largest blob:
+
+``'components'``
+    ``connectedComponentsWithStats`` labels the mask once and returns area,
+    bounding box and centroid of every blob; the largest is an ``argmax``.
+    Labels are 16-bit whenever the frame is small enough, which is what
+    makes this path cheap.  Area is a pixel count and the centroid is the
+    mean pixel position.
+
+``'contours'``
+    ``findContours(RETR_EXTERNAL)`` (the largest contour is always an outer
+    one, so the hierarchy of ``RETR_TREE`` was wasted) and the area
+    selection done inside ``max(..., key=cv2.contourArea)``.  A vectorized
+    shoelace over the concatenated contours measured slower than that for
+    the few dozen contours a frame holds.  Area and centroid are the polygon
+    ones, identical to the previous inline code.
+
+``WindowedBlobTracker`` adds a ``track()`` step for targets that move a few
+pixels per frame: it searches a window around the last bounding box, widens
+it geometrically when the target is lost and falls back to a periodic
+full-frame search for re-acquisition.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .runtime import lazy_import
+
+# Only imported once the first frame is searched
+cv2 = lazy_import('cv2')
+
+# Blue target used by the H2 / HHH1 controllers, in OpenCV HSV
+LOWER_BLUE = np.array([110, 50, 50])
+UPPER_BLUE = np.array([130, 255, 255])
+
+TRACKER_METHODS = ('components', 'contours')
+
+# x, y: integer centroid (truncated like the old moments code)
+# area: blob area in pixels, bbox: (left, top, width, height)
+Blob = namedtuple('Blob', ['x', 'y', 'area', 'bbox'])
+
+
+class ColorBlobTracker:
+    def __init__(self, lower=LOWER_BLUE, upper=UPPER_BLUE, method='components', min_area=0):
+        if method not in TRACKER_METHODS:
+            raise ValueError("Unknown tracker method '{}', expected one of {}".format(method, TRACKER_METHODS))
+        self.lower = np.asarray(lower, dtype=np.uint8)
+        self.upper = np.asarray(upper, dtype=np.uint8)
+        self.method = method
+        self.min_area = min_area
+        self.mask = None
+
+    def segment(self, hsv_image):
+        """Binary mask of the pixels inside the colour range."""
+        if self.mask is None or self.mask.shape != hsv_image.shape[:2]:
+            self.mask = np.zeros(hsv_image.shape[:2], dtype=np.uint8)
+        cv2.inRange(hsv_image, self.lower, self.upper, dst=self.mask)
+        return self.mask
+
+    def find(self, hsv_image):
+        """Largest blob in ``hsv_image`` as a ``Blob``, or None."""
+        return self.search(self.segment(hsv_image))
+
+    def search(self, mask):
+        """Largest blob of a mask from ``segment()``, or None."""
+        if self.method == 'components':
+            return self._largest_component(mask)
+        return self._largest_contour(mask)
+
+    def _largest_component(self, mask):
+        label_type = cv2.CV_16U if mask.size < 65536 else cv2.CV_32S
+        count, _, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+            mask, 8, label_type, cv2.CCL_DEFAULT)
+        if count < 2:
+            return None
+        # Label 0 is the background
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        best = int(np.argmax(areas))
+        area = int(areas[best])
+        if area <= self.min_area:
+            return None
+        left, top, width, height = (int(v) for v in stats[best + 1, :4])
+        cx, cy = centroids[best + 1]
+        return Blob(int(cx), int(cy), area, (left, top, width, height))
+
+    def _largest_contour(self, mask):
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+
+        largest = max(contours, key=cv2.contourArea)
+        area = float(cv2.contourArea(largest))
+        if area <= self.min_area:
+            return None
+        M = cv2.moments(largest)
+        if M["m00"] == 0:
+            return None
+        return Blob(int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"]), area,
+                    tuple(int(v) for v in cv2.boundingRect(largest)))
+
+
+class WindowedBlobTracker(ColorBlobTracker):
+    """Follow a blob by searching a window around its last position.
+
+    ``track()`` takes the BGR frame and converts only the searched window
+    to HSV, so while the target is held both the colour conversion and the
+    segmentation run on a few percent of the image.  The window is the
+    last bounding box grown by ``margin`` pixels on every side.  When the
+    blob is not found there, or it touches a window edge that is not an
+    image edge (it may be cut off), the margin is multiplied by ``growth``
+    and the search repeated, up to the whole frame.  A full-frame search
+    also runs every ``reacquire_interval`` frames, so a larger blob that
+    appears elsewhere takes over at most that many frames later.
+
+    ``find()`` is still available and always searches the whole HSV image.
+    """
+
+    def __init__(self, lower=LOWER_BLUE, upper=UPPER_BLUE, method='components', min_area=0,
+                 margin=16, growth=2.0, reacquire_interval=30):
+        super().__init__(lower, upper, method, min_area)
+        if growth <= 1:
+            raise ValueError("growth must be greater than 1")
+        self.margin = margin
+        self.growth = growth
+        self.reacquire_interval = reacquire_interval
+        self.blob = None
+        self.window = None
+        self.hsv = None
+        self.frames_since_full = 0
+        self.full_searches = 0
+        self.window_searches = 0
+
+    def reset(self):
+        """Forget the current target; the next frame is searched in full."""
+        self.blob = None
+        self.window = None
+
+    def track(self, bgr_image):
+        """Largest blob near the previous one, as a full-frame ``Blob``, or None."""
+        height, width = bgr_image.shape[:2]
+        self.frames_since_full += 1
+        if self.blob is None or self.frames_since_full >= self.reacquire_interval:
+            return self._full_search(bgr_image)
+
+        left, top, box_width, box_height = self.blob.bbox
+        margin = self.margin
+        while True:
+            x0 = max(0, int(left - margin))
+            y0 = max(0, int(top - margin))
+            x1 = min(width, int(left + box_width + margin))
+            y1 = min(height, int(top + box_height + margin))
+            if x0 == 0 and y0 == 0 and x1 == width and y1 == height:
+                return self._full_search(bgr_image)
+
+            self.window_searches += 1
+            hsv = cv2.cvtColor(bgr_image[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+            blob = self.search(cv2.inRange(hsv, self.lower, self.upper))
+            if blob is not None and not self._clipped(blob, x0, y0, x1, y1, width, height):
+                bx, by, bw, bh = blob.bbox
+                self.blob = Blob(blob.x + x0, blob.y + y0, blob.area, (bx + x0, by + y0, bw, bh))
+                self.window = (x0, y0, x1, y1)
+                return self.blob
+            margin *= self.growth
+
+    def _full_search(self, bgr_image):
+        if self.hsv is None or self.hsv.shape != bgr_image.shape:
+            self.hsv = np.zeros_like(bgr_image)
+        cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV, dst=self.hsv)
+        self.full_searches += 1
+        self.frames_since_full = 0
+        self.blob = self.find(self.hsv)
+        self.window = None
+        return self.blob
+
+    @staticmethod
+    def _clipped(blob, x0, y0, x1, y1, width, height):
+        # A blob touching a window edge that is not also an image edge may
+        # continue outside the window
+        left, top, box_width, box_height = blob.bbox
+        return ((left == 0 and x0 > 0) or (top == 0 and y0 > 0)
+                or (x0 + left + box_width == x1 and x1 < width)
+                or (y0 + top + box_height == y1 and y1 < height))
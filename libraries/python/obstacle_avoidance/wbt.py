@@ -0,0 +1,266 @@
+"""Reader for Webots ``.wbt`` world files.
+
+A world file is a list of VRML-like nodes::
+
+    DEF NAME Type {
+      field value
+      children [ Node { ... } ... ]
+    }
+
+``parse`` turns the text into a tree of ``Node`` objects.  Field values are
+kept as plain Python values: a number or string for a single-valued field, a
+tuple for a vector (``translation 0.1 0.2 0``), a ``Node`` for an SFNode
+field, a flat list for a bracketed MF field (its nodes, or all its numbers
+or strings), ``None`` for ``NULL``.  ``DEF`` names are recorded and ``USE``
+resolves to the same ``Node``.  ``EXTERNPROTO`` declarations and ``hidden`` fields (the solver
+state Webots saves) are skipped.  PROTO instances are not expanded: a
+``Wall`` is a ``Node`` of type ``'Wall'`` with the fields the file sets.
+
+``static_boxes`` extracts the static obstacles as oriented boxes in the
+floor plane: ``Wall`` and ``Obstacle`` PROTO instances (with the PROTO
+default size for a missing ``size``) and ``Solid`` nodes without physics
+whose bounding object is made of ``Box`` nodes.  Translations and rotations
+of enclosing ``Transform`` / ``Pose`` / ``Solid`` nodes are composed; only
+the rotation about the vertical axis is kept.
+"""
+
+import math
+import re
+
+import numpy as np
+
+# Default size of the obstacle PROTOs the project uses, for instances that
+# do not set ``size``
+PROTO_SIZES = {
+    'Wall': (1.0, 0.2, 2.4),
+    # curriculum Obstacle.proto: a 5 cm cube
+    'Obstacle': (0.05, 0.05, 0.05),
+}
+# Nodes whose ``children`` are placed in their own frame
+GROUPING_NODES = ('Transform', 'Pose', 'Solid', 'Group')
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|#[^\n]*|[{}\[\]]|[^\s{}\[\]",#]+')
+
+
+class Node:
+    """A ``Type { ... }`` node; ``fields`` maps field names to values."""
+
+    def __init__(self, type, fields=None, def_name=None):
+        self.type = type
+        self.fields = fields if fields is not None else {}
+        self.def_name = def_name
+
+    def get(self, name, default=None):
+        return self.fields.get(name, default)
+
+    def nodes(self):
+        """Nodes held directly by this node's fields, in file order."""
+        for value in self.fields.values():
+            if isinstance(value, Node):
+                yield value
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        yield item
+
+    def __repr__(self):
+        return 'Node({!r}, {})'.format(self.type, sorted(self.fields))
+
+
+def _tokens(text):
+    for match in _TOKEN.finditer(text):
+        token = match.group(0)
+        if not token.startswith('#'):
+            yield token
+
+
+def _scalar(token):
+    if token.startswith('"'):
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+    if token == 'TRUE':
+        return True
+    if token == 'FALSE':
+        return False
+    return float(token)
+
+
+def _is_scalar(token):
+    if token.startswith('"') or token in ('TRUE', 'FALSE'):
+        return True
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = list(_tokens(text))
+        self.position = 0
+        self.defs = {}
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError("Unexpected end of world file")
+        self.position += 1
+        return token
+
+    def expect(self, token):
+        found = self.next()
+        if found != token:
+            raise ValueError("Expected '{}' in world file, found '{}' (token {})".format(
+                token, found, self.position - 1))
+
+    def world(self):
+        nodes = []
+        while self.peek() is not None:
+            if self.peek() in ('EXTERNPROTO', 'IMPORTABLE'):
+                # [IMPORTABLE] EXTERNPROTO "url"
+                while self.next() != 'EXTERNPROTO':
+                    pass
+                self.next()
+                continue
+            nodes.append(self.node())
+        return nodes
+
+    def node(self):
+        token = self.next()
+        if token == 'USE':
+            name = self.next()
+            if name not in self.defs:
+                raise ValueError("USE of undefined node '{}'".format(name))
+            return self.defs[name]
+        def_name = None
+        if token == 'DEF':
+            def_name = self.next()
+            token = self.next()
+        node = Node(token, def_name=def_name)
+        if def_name is not None:
+            self.defs[def_name] = node
+        self.expect('{')
+        while self.peek() != '}':
+            name = self.next()
+            if name == 'hidden':
+                self.next()
+                self.value()
+                continue
+            node.fields[name] = self.value()
+        self.expect('}')
+        return node
+
+    def value(self):
+        token = self.peek()
+        if token == 'NULL':
+            self.next()
+            return None
+        if token == '[':
+            self.next()
+            items = []
+            while self.peek() != ']':
+                if _is_scalar(self.peek()):
+                    items.append(_scalar(self.next()))
+                else:
+                    items.append(self.node())
+            self.next()
+            return items
+        if token is not None and not _is_scalar(token):
+            return self.node()
+        return self.scalars()
+
+    def scalars(self):
+        values = []
+        while self.peek() is not None and _is_scalar(self.peek()):
+            values.append(_scalar(self.next()))
+        if not values:
+            raise ValueError("Expected a field value in world file, found '{}' (token {})".format(
+                self.peek(), self.position))
+        return values[0] if len(values) == 1 else tuple(values)
+
+
+def parse(text):
+    """Top-level nodes of the world file ``text``."""
+    return _Parser(text).world()
+
+
+def read(path):
+    with open(path, encoding='utf-8') as file:
+        return parse(file.read())
+
+
+def find(nodes, type):
+    """Every node of ``type`` in the trees ``nodes``, depth first."""
+    for node in nodes:
+        if node.type == type:
+            yield node
+        yield from find(node.nodes(), type)
+
+
+def _yaw(rotation):
+    """Heading of the rotated x axis for an axis-angle ``rotation``."""
+    x, y, z, angle = rotation
+    norm = math.sqrt(x * x + y * y + z * z) or 1.0
+    x, y, z = x / norm, y / norm, z / norm
+    cos, sin = math.cos(angle), math.sin(angle)
+    # First column of the rotation matrix (Rodrigues)
+    r00 = cos + x * x * (1 - cos)
+    r10 = y * x * (1 - cos) + z * sin
+    return math.atan2(r10, r00)
+
+
+def _compose(frame, node):
+    """``frame`` (x, y, yaw) followed by the translation and rotation of ``node``."""
+    x, y, yaw = frame
+    translation = node.get('translation', (0.0, 0.0, 0.0))
+    rotation = node.get('rotation', (0.0, 0.0, 1.0, 0.0))
+    cos, sin = math.cos(yaw), math.sin(yaw)
+    return (x + translation[0] * cos - translation[1] * sin,
+            y + translation[0] * sin + translation[1] * cos,
+            yaw + _yaw(rotation))
+
+
+def _bounding_boxes(shape, frame):
+    """``(x, y, half_x, half_y, yaw)`` of the ``Box`` nodes of a bounding object."""
+    if shape is None:
+        return
+    if isinstance(shape, list):
+        for item in shape:
+            if isinstance(item, Node):
+                yield from _bounding_boxes(item, frame)
+        return
+    if shape.type == 'Box':
+        size = shape.get('size', (2.0, 2.0, 2.0))
+        yield (frame[0], frame[1], size[0] / 2, size[1] / 2, frame[2])
+    elif shape.type == 'Shape':
+        yield from _bounding_boxes(shape.get('geometry'), frame)
+    elif shape.type in GROUPING_NODES:
+        yield from _bounding_boxes(shape.get('children', []), _compose(frame, shape))
+
+
+def _static_boxes(nodes, frame, boxes, names):
+    for node in nodes:
+        if node.type in PROTO_SIZES:
+            pose = _compose(frame, node)
+            size = node.get('size', PROTO_SIZES[node.type])
+            boxes.append((pose[0], pose[1], size[0] / 2, size[1] / 2, pose[2]))
+            names.append(node.get('name', node.type.lower()))
+        elif node.type in GROUPING_NODES:
+            pose = _compose(frame, node)
+            if node.type == 'Solid' and node.get('physics') is None:
+                for box in _bounding_boxes(node.get('boundingObject'), pose):
+                    boxes.append(box)
+                    names.append(node.get('name', 'solid'))
+            _static_boxes(node.get('children', []), pose, boxes, names)
+
+
+def static_boxes(nodes):
+    """Oriented boxes ``(M, 5)`` (x, y, half_x, half_y, yaw) of the static obstacles, and their names."""
+    boxes = []
+    names = []
+    _static_boxes(nodes, (0.0, 0.0, 0.0), boxes, names)
+    return np.array(boxes, dtype=float).reshape(-1, 5), names
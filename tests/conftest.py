@@ -0,0 +1,53 @@
+"""Shared fixtures: the rule bases of ``obstacle_avoidance.rulebases`` and samples over them."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.rulebases import RULE_BASES  # noqa: E402
+
+
+@pytest.fixture(scope='session', params=sorted(RULE_BASES))
+def rule_base(request):
+    """``(name, control_system, inputs, outputs)`` of every rule base."""
+    builder, inputs, outputs = RULE_BASES[request.param]
+    return request.param, builder(), inputs, outputs
+
+
+@pytest.fixture(scope='session')
+def terms(rule_base):
+    """``(input, universe, mf)`` of every input term, keyed by ``(label, term)``."""
+    _, control_system, inputs, _ = rule_base
+    antecedents = {a.label: a for a in control_system.antecedents}
+    return {(label, term): (i, antecedents[label].universe, antecedents[label][term].mf)
+            for i, label in enumerate(inputs) for term in antecedents[label].terms}
+
+
+@pytest.fixture(scope='session')
+def samples(rule_base):
+    """Random inputs over and beyond each universe, plus every corner of the universes' term edges.
+
+    The edges are where a term starts or stops being non-zero, where the
+    rule bases have their kinks and gaps.
+    """
+    _, control_system, inputs, _ = rule_base
+    antecedents = {a.label: a for a in control_system.antecedents}
+    rng = np.random.default_rng(0)
+    columns, edges = [], []
+    for label in inputs:
+        universe = antecedents[label].universe
+        low, high = float(universe[0]), float(universe[-1])
+        margin = 0.1 * (high - low)
+        columns.append(rng.uniform(low - margin, high + margin, 200))
+        points = {low, high}
+        for term in antecedents[label].terms.values():
+            live = np.flatnonzero(term.mf > 0)
+            if len(live):
+                points |= {float(universe[max(live[0] - 1, 0)]), float(universe[min(live[-1] + 1, len(universe) - 1)])}
+        edges.append(sorted(points))
+    grid = np.stack(np.meshgrid(*edges, indexing='ij'), -1).reshape(-1, len(inputs))
+    return np.vstack([np.column_stack(columns), grid])
@@ -0,0 +1,23 @@
+import numpy as np
+
+from obstacle_avoidance.activerules import ActiveRuleEngine
+from obstacle_avoidance.batch import BatchMamdani
+
+
+def test_matches_batch(rule_base, samples):
+    _, control_system, inputs, outputs = rule_base
+    engine = BatchMamdani(control_system, inputs, outputs)
+    active = ActiveRuleEngine(engine)
+    result = np.array([active.compute(*sample) for sample in samples.tolist()])
+    np.testing.assert_array_equal(result, engine.compute(samples))
+
+
+def test_candidates_cover_firing_rules(rule_base, samples):
+    _, control_system, inputs, outputs = rule_base
+    active = ActiveRuleEngine(control_system, inputs, outputs)
+    engine = active.engine
+    firing = engine.matrix.firing_strengths(np.array([engine.fuzzify(samples)[key]
+                                                      for key in engine.matrix.input_terms]))
+    for n, sample in enumerate(samples.tolist()):
+        fired = set(np.flatnonzero(firing[:, n]).tolist())
+        assert fired <= set(active.index.candidates(sample)), sample
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from obstacle_avoidance.batch import BatchMamdani
+
+# skfuzzy's own aggregation passes np.maximum a third positional argument
+pytestmark = pytest.mark.filterwarnings('ignore:Passing more than 2 positional arguments:DeprecationWarning')
+
+
+def test_matches_skfuzzy(rule_base, samples):
+    _, control_system, inputs, outputs = rule_base
+    engine = BatchMamdani(control_system, inputs, outputs)
+    errors = engine.compare_with_skfuzzy(samples)
+    assert max(errors) < 1e-9, dict(zip(outputs, errors))
+
+
+def test_from_arrays_matches(rule_base, samples):
+    _, control_system, inputs, outputs = rule_base
+    engine = BatchMamdani(control_system, inputs, outputs)
+    restored = BatchMamdani.from_arrays(engine.arrays())
+    np.testing.assert_array_equal(restored.compute(samples), engine.compute(samples))
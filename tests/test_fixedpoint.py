@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from obstacle_avoidance.batch import BatchMamdani
+from obstacle_avoidance.fixedpoint import INPUT_CODES, FixedPointMamdani, FixedPointSurface
+from obstacle_avoidance.rulebases import CONSUMED_OUTPUTS
+
+
+@pytest.fixture(scope='module')
+def mamdani(rule_base):
+    name, control_system, inputs, outputs = rule_base
+    return FixedPointMamdani(BatchMamdani(control_system, inputs, CONSUMED_OUTPUTS.get(name, outputs)))
+
+
+def test_compute_many_matches_compute_codes(mamdani):
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, INPUT_CODES, size=(500, len(mamdani.inputs)))
+    codes[:2] = [[0] * len(mamdani.inputs), [INPUT_CODES - 1] * len(mamdani.inputs)]
+    result, covered = mamdani.compute_many(codes)
+    for row, code in enumerate(codes.tolist()):
+        expected = mamdani.compute_codes(*code)
+        assert covered[row] == (None not in expected), code
+        assert result[row].tolist() == [0 if value is None else value for value in expected], code
+
+
+def test_surface_compute_many_matches_compute_codes(rule_base):
+    _, control_system, inputs, outputs = rule_base
+    if len(inputs) != 2:
+        with pytest.raises(ValueError):
+            FixedPointSurface(control_system, inputs, outputs)
+        return
+    surface = FixedPointSurface(control_system, inputs, outputs)
+    codes = np.random.default_rng(0).integers(0, INPUT_CODES, size=(500, 2))
+    expected = [list(surface.compute_codes(*code)) for code in codes.tolist()]
+    assert surface.compute_many(codes).tolist() == expected
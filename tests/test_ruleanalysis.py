@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from obstacle_avoidance.batch import BatchMamdani
+from obstacle_avoidance.ruleanalysis import RuleAnalysis
+from obstacle_avoidance.rulebases import CONSUMED_OUTPUTS
+from obstacle_avoidance.rulematrix import RuleMatrix
+
+
+def analysis(rule_base, terms):
+    name, control_system, inputs, outputs = rule_base
+    matrix = RuleMatrix.from_rules(control_system.rules, inputs, outputs)
+    return RuleAnalysis(matrix, [terms[key] for key in matrix.input_terms], CONSUMED_OUTPUTS.get(name))
+
+
+def rows(engine, samples, matrix):
+    memberships = engine.fuzzify(samples)
+    return np.array([memberships[key] for key in matrix.input_terms])
+
+
+def test_pruned_cuts_match(rule_base, terms, samples):
+    _, control_system, inputs, outputs = rule_base
+    full = analysis(rule_base, terms)
+    pruned = full.pruned()
+    engine = BatchMamdani(control_system, inputs, outputs, compile_rules=False)
+    cuts = full.matrix.evaluate(rows(engine, samples, full.matrix))
+    pruned_cuts = pruned.evaluate(rows(engine, samples, pruned))
+    assert list(pruned.outputs) == full.consumed
+    for column, key in enumerate(pruned.output_terms):
+        np.testing.assert_array_equal(pruned_cuts[column], cuts[full.matrix.output_terms.index(key)], str(key))
+
+
+@pytest.mark.parametrize('rule_base', ['Obstacle_Avoidance_FLC'], indirect=True)
+def test_pruned_drops_flc_dead_weight(rule_base, terms):
+    full = analysis(rule_base, terms)
+    assert full.unused_outputs == ['target_direction']
+    assert [group for group, _ in full.duplicates] == [(2, 5), (3, 4)]
+    assert full.pruned().rule_count == full.matrix.rule_count - 2
+
+
+def test_uncovered_regions_are_uncovered(rule_base, terms, samples):
+    _, control_system, inputs, outputs = rule_base
+    full = analysis(rule_base, terms)
+    engine = BatchMamdani(control_system, inputs, full.consumed)
+    undefined = np.isnan(engine.compute(samples)).any(axis=1)
+    assert undefined.any() == bool(full.uncovered)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from obstacle_avoidance.batch import BatchMamdani
+from obstacle_avoidance.rulematrix import LAYOUTS, RuleMatrix
+
+
+@pytest.mark.parametrize('layout', LAYOUTS)
+def test_matches_rule_graph(rule_base, samples, layout):
+    _, control_system, inputs, outputs = rule_base
+    graph = BatchMamdani(control_system, inputs, outputs, compile_rules=False)
+    matrix = RuleMatrix.from_rules(control_system.rules, inputs, outputs, layout=layout)
+    memberships = graph.fuzzify(samples)
+    rows = np.array([memberships[key] for key in matrix.input_terms])
+
+    firing = graph.firing_strengths(samples)
+    np.testing.assert_array_equal(matrix.firing_strengths(rows), firing.T)
+
+    expected = np.zeros((len(matrix.output_terms), len(samples)))
+    for r, rule in enumerate(graph.rules):
+        for weighted in rule.consequent:
+            key = (weighted.term.parent.label, weighted.term.label)
+            if key in matrix.output_terms:
+                column = matrix.output_terms.index(key)
+                expected[column] = np.fmax(expected[column], firing[:, r] * weighted.weight)
+    np.testing.assert_array_equal(matrix.evaluate(rows), expected)
+
+
+def test_table_round_trip(rule_base):
+    _, control_system, inputs, outputs = rule_base
+    matrix = RuleMatrix.from_rules(control_system.rules, inputs, outputs)
+    table = RuleMatrix.from_table(matrix.inputs, matrix.outputs, matrix.rows())
+    assert table.rows() == matrix.rows()
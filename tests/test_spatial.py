@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from obstacle_avoidance.spatial import MAX_BLOCK_SPAN, BoxGrid, box_bounds
+
+BOUNDS = ((-1.0, -1.0), (1.0, 1.0))
+
+
+def random_boxes(rng, count):
+    centres = rng.uniform(-1.1, 1.1, (count, 2))
+    sizes = rng.uniform(0.005, 0.2, (count, 2))
+    angles = rng.uniform(-np.pi, np.pi, (count, 1))
+    return np.hstack([centres, sizes, angles])
+
+
+def cells(grid, points):
+    shape = np.array(grid.shape)
+    return np.clip(np.floor((points - grid.origin) / grid.cell_size), 0, shape - 1)
+
+
+def meeting(low, high, box_low, box_high):
+    """Set of ``(query, box)`` whose ranges ``low``-``high`` and ``box_low``-``box_high`` meet on both axes."""
+    meet = ((low[:, None] <= box_high[None]) & (box_low[None] <= high[:, None])).all(axis=2)
+    return set(zip(*map(np.ndarray.tolist, np.nonzero(meet))))
+
+
+@pytest.mark.parametrize('reach', [0.01, 0.1, 0.6])
+@pytest.mark.parametrize('count', [0, 1, 40, 300])
+def test_pairs_match_brute_force(count, reach):
+    rng = np.random.default_rng(count)
+    boxes = random_boxes(rng, count)
+    grid = BoxGrid(boxes, BOUNDS)
+    centres = rng.uniform(-1.3, 1.3, (200, 2))
+    lower, upper = centres - reach, centres + reach
+
+    queries, found = grid.pairs(lower, upper)
+    pairs = list(zip(queries.tolist(), found.tolist()))
+    assert len(pairs) == len(set(pairs))
+    assert (np.diff(queries) >= 0).all()
+
+    box_lower, box_upper = box_bounds(boxes)
+    box_low, box_high = cells(grid, box_lower), cells(grid, box_upper)
+    low, high = cells(grid, lower), cells(grid, upper)
+    exact = meeting(low, high, box_low, box_high)
+    widest = int((high - low).max(initial=0)) + 1
+    if widest <= MAX_BLOCK_SPAN:
+        # Short queries read the whole widest x widest block from their first cell
+        block = np.minimum(low + widest - 1, np.array(grid.shape) - 1)
+        assert exact <= set(pairs) <= meeting(low, block, box_low, box_high)
+    else:
+        assert set(pairs) == exact
+    # Never misses a box whose bounding rectangle meets the query
+    assert meeting(lower, upper, box_lower, box_upper) <= exact
+
+
+def test_segment_and_disk_pairs():
+    rng = np.random.default_rng(1)
+    grid = BoxGrid(random_boxes(rng, 100), BOUNDS)
+    starts = rng.uniform(-1, 1, (50, 2))
+    ends = starts + rng.uniform(-0.3, 0.3, (50, 2))
+    np.testing.assert_array_equal(grid.segment_pairs(starts, ends),
+                                  grid.pairs(np.minimum(starts, ends), np.maximum(starts, ends)))
+    np.testing.assert_array_equal(grid.disk_pairs(starts, 0.1), grid.pairs(starts - 0.1, starts + 0.1))
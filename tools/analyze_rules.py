@@ -0,0 +1,138 @@
+"""Static analysis of the controllers' fuzzy rule bases.
+
+For every rule base in ``rulebases.RULE_BASES`` this prints the
+``RuleAnalysis`` report (see ``obstacle_avoidance.ruleanalysis``): unused
+outputs, dead and idle rules, duplicate and conflicting antecedents,
+unread, empty and unwritten terms, and the input regions where no rule
+writes an output.  The consumed outputs are those of
+``rulebases.CONSUMED_OUTPUTS``, or all of them.
+
+It then checks that pruning changes nothing: ``BatchMamdani.compute`` of
+the pruned rule base, for all the outputs and for the consumed ones, must
+equal the unpruned one exactly (NaN where no rule fires included).  The
+samples are random, plus every combination of the universe ends and term
+support edges of each input and the points just either side of them, where
+a dropped rule would first show.  The run exits with status 1 on any
+difference.
+
+Last it times one ``ActiveRuleEngine.compute`` per sample over all the
+outputs and every rule, against the rule base compiled for execution (the
+consumed outputs of the pruned rule base), and checks the consumed outputs
+agree exactly too.
+
+``--check`` also exits with status 1 when a rule base has dead or idle
+rules, conflicts, or uncovered regions.
+
+    python tools/analyze_rules.py Obstacle_Avoidance_FLC --samples 2000
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.activerules import ActiveRuleEngine, term_support  # noqa: E402
+from obstacle_avoidance.batch import BatchMamdani  # noqa: E402
+from obstacle_avoidance.ruleanalysis import RuleAnalysis  # noqa: E402
+from obstacle_avoidance.rulebases import CONSUMED_OUTPUTS, RULE_BASES  # noqa: E402
+
+
+def step_time(engine, samples):
+    # The first pass fills the memoized candidate lists
+    [engine.compute(*row) for row in samples.tolist()]
+    start = time.perf_counter()
+    results = [engine.compute(*row) for row in samples.tolist()]
+    return (time.perf_counter() - start) / len(samples), np.array(results)
+
+
+def edge_samples(engine):
+    """All combinations of the universe ends and term support edges of each input, and their neighbours."""
+    axes = []
+    for i, universe in enumerate(engine._universes):
+        points = {float(universe[0]), float(universe[-1])}
+        for j, mf in engine._rule_terms:
+            if j == i:
+                points.update(edge for edge in term_support(universe, mf) if np.isfinite(edge))
+        offset = np.diff(universe).min() / 2
+        axes.append(sorted({point + delta for point in points for delta in (-offset, 0., offset)}))
+    return np.array(list(itertools.product(*axes)))
+
+
+def pruning_mismatches(system, inputs, outputs, consumed, samples):
+    """Outputs where the pruned ``BatchMamdani.compute`` differs from the unpruned one on ``samples``."""
+    reference = BatchMamdani(system, inputs, outputs, prune_rules=False).compute(samples)
+    mismatches = []
+    for labels in sorted({tuple(outputs), tuple(consumed)}):
+        result = BatchMamdani(system, inputs, labels).compute(samples)
+        for k, label in enumerate(labels):
+            expected = reference[:, outputs.index(label)]
+            differs = ~((result[:, k] == expected) | (np.isnan(result[:, k]) & np.isnan(expected)))
+            if differs.any():
+                mismatches.append("{} (computing {}) at {} samples, e.g. {}".format(
+                    label, ', '.join(labels), differs.sum(), samples[np.argmax(differs)].tolist()))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rule_bases', nargs='*', default=list(RULE_BASES), help="default: all")
+    parser.add_argument('--samples', type=int, default=2000, help="single-sample calls timed")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', action='store_true', help="fail on dead rules, conflicts or uncovered regions")
+    args = parser.parse_args()
+    for name in args.rule_bases:
+        if name not in RULE_BASES:
+            parser.error("unknown rule base '{}', expected one of {}".format(name, list(RULE_BASES)))
+
+    rng = np.random.default_rng(args.seed)
+    defects = []
+    mismatches = []
+    for name in args.rule_bases:
+        builder, inputs, outputs = RULE_BASES[name]
+        consumed = CONSUMED_OUTPUTS.get(name, outputs)
+        system = builder()
+        engine = BatchMamdani(system, inputs, outputs, prune_rules=False)
+        terms = [(i, engine._universes[i], mf) for i, mf in engine._rule_terms]
+        analysis = RuleAnalysis(engine.rule_matrix, terms, consumed)
+        print("== {}".format(name))
+        print(analysis.report())
+        if (analysis.dead_rules or analysis.idle_rules or analysis.uncovered
+                or any(outputs for _, outputs in analysis.duplicates)):
+            defects.append(name)
+
+        low = [u[0] for u in engine._universes]
+        high = [u[-1] for u in engine._universes]
+        samples = rng.uniform(low, high, size=(args.samples, len(inputs)))
+        edges = edge_samples(engine)
+        problems = pruning_mismatches(system, inputs, outputs, consumed, np.vstack([samples, edges]))
+        for problem in problems:
+            print("pruned rule base differs: {}".format(problem))
+        if problems:
+            mismatches.append(name)
+        else:
+            print("pruned rule base matches on {} random and {} edge samples".format(len(samples), len(edges)))
+
+        everything = ActiveRuleEngine(system, inputs, outputs, prune_rules=False)
+        executed = ActiveRuleEngine(system, inputs, consumed)
+        before, reference = step_time(everything, samples)
+        after, result = step_time(executed, samples)
+        columns = [outputs.index(label) for label in consumed]
+        if not np.array_equal(result, reference[:, columns], equal_nan=True):
+            print("pruned rule base differs: ActiveRuleEngine.compute")
+            if name not in mismatches:
+                mismatches.append(name)
+        print("compute(): {:.1f}us all outputs, every rule; {:.1f}us compiled for execution ({:.1f}x)\n".format(
+            1e6 * before, 1e6 * after, before / after))
+
+    if mismatches:
+        raise SystemExit("pruning changes the outputs of {}".format(', '.join(mismatches)))
+    if args.check and defects:
+        raise SystemExit("defects in {}".format(', '.join(defects)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Offline batch evaluation of the controllers' fuzzy rule bases.
+
+Re-score a recorded CSV with one of the rule bases:
+
+    python tools/batch_inference.py H2 --csv controllers/H2/robot_performance_data.csv \
+        --columns "Left Distance" "Right Distance" --out rescored.csv
+
+Benchmark the vectorized engine against the per-sample ``compute()`` loop:
+
+    python tools/batch_inference.py H2 --bench 100000
+
+``--defuzz analytic`` switches to the closed-form centroid computed from the
+output set breakpoints in ``rulebases.OUTPUT_SHAPES``.
+
+The benchmark times the skfuzzy loop on ``--loop-samples`` rows and scales it
+to the full batch, since running 1e5 samples through ``compute()`` takes
+minutes.  The same rows are used to report the maximum difference.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.batch import BatchMamdani  # noqa: E402
+from obstacle_avoidance.columnar import ColumnarFile  # noqa: E402
+from obstacle_avoidance.rulebases import OUTPUT_SHAPES, RULE_BASES  # noqa: E402
+
+
+def random_inputs(engine, count, seed=0):
+    rng = np.random.default_rng(seed)
+    low = [u[0] for u in engine._universes]
+    high = [u[-1] for u in engine._universes]
+    return rng.uniform(low, high, size=(count, len(engine.inputs)))
+
+
+def rescore(engine, path, columns, out_path):
+    if path.endswith('.col'):
+        table = ColumnarFile(path)
+        header = list(table.columns)
+        rows = table.to_array().tolist()
+        samples = table.to_array(columns)
+    else:
+        with open(path, newline='') as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            rows = list(reader)
+        index = [header.index(name) for name in columns]
+        samples = np.array([[float(row[i]) for i in index] for row in rows])
+
+    start = time.perf_counter()
+    outputs = engine.compute(samples)
+    elapsed = time.perf_counter() - start
+
+    with open(out_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header + list(engine.outputs))
+        for row, values in zip(rows, outputs):
+            writer.writerow(row + list(values))
+    print("Re-scored {} rows in {:.3f} s -> {}".format(len(rows), elapsed, out_path))
+
+
+def bench(engine, count, loop_samples):
+    from skfuzzy.control import ControlSystemSimulation
+
+    samples = random_inputs(engine, count)
+    start = time.perf_counter()
+    engine.compute(samples)
+    batch_time = time.perf_counter() - start
+
+    subset = samples[:loop_samples]
+    sim = ControlSystemSimulation(engine.control_system, cache=False)
+    start = time.perf_counter()
+    for row in subset:
+        for label, value in zip(engine.inputs, row):
+            sim.input[label] = value
+        sim.compute()
+    loop_time = (time.perf_counter() - start) * count / len(subset)
+
+    print("N = {}".format(count))
+    print("batch engine      : {:.3f} s ({:.0f} samples/s)".format(batch_time, count / batch_time))
+    print("compute() loop    : {:.3f} s (scaled from {} samples)".format(loop_time, len(subset)))
+    print("speedup           : {:.0f}x".format(loop_time / batch_time))
+    for label, error in zip(engine.outputs, engine.compare_with_skfuzzy(subset)):
+        print("max |diff| vs skfuzzy {:<13}: {:.3g}".format(label, error))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rulebase', choices=sorted(RULE_BASES))
+    parser.add_argument('--csv', help="CSV (or columnar .col) file to re-score")
+    parser.add_argument('--columns', nargs='+', help="CSV columns holding the inputs, in rule base order")
+    parser.add_argument('--out', default='rescored.csv')
+    parser.add_argument('--bench', type=int, metavar='N', help="benchmark on N random samples")
+    parser.add_argument('--loop-samples', type=int, default=500)
+    parser.add_argument('--defuzz', choices=('sampled', 'analytic'), default='sampled')
+    args = parser.parse_args()
+
+    builder, inputs, outputs = RULE_BASES[args.rulebase]
+    engine = BatchMamdani(builder(), inputs, outputs, defuzz=args.defuzz,
+                          shapes=OUTPUT_SHAPES.get(args.rulebase))
+
+    if args.csv:
+        rescore(engine, args.csv, args.columns or list(inputs), args.out)
+    if args.bench:
+        bench(engine, args.bench, args.loop_samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Per-step rule evaluation over the candidate rules against all the rules.
+
+For the controllers' rule bases (``rulebases.RULE_BASES``) and for
+synthetic full-grid rule bases over 2 to 8 inputs (H2's three distance
+trapezoids on every input, ``3 ** inputs`` rules), this reports the mean
+number of candidate rules per sample and the time per sample of:
+
+* ``all``: fuzzify every term and evaluate every rule of the compiled
+  ``RuleMatrix`` (dense layout, the fastest for one sample),
+* ``active``: ``ActiveRuleIndex.cuts``, only the candidates and the terms
+  they read.
+
+Both give the same cuts, which is checked.  For the controllers' rule bases
+it also times one full step with ``ActiveRuleEngine.compute``, against
+skfuzzy's ``ControlSystemSimulation.compute``.
+
+    python tools/bench_active_rules.py --samples 2000 --inputs 2 4 6 8
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+import skfuzzy as fuzz  # noqa: E402
+
+from obstacle_avoidance.activerules import ActiveRuleEngine, ActiveRuleIndex  # noqa: E402
+from obstacle_avoidance.rulebases import RULE_BASES  # noqa: E402
+from obstacle_avoidance.rulematrix import RuleMatrix  # noqa: E402
+
+DISTANCE_TERMS = {'dekat': [0, 0, 25, 50], 'sedengan': [25, 35, 65, 75], 'jauh': [50, 75, 100, 100]}
+SPEED_TERMS = ('lambat', 'sedang', 'cepat')
+
+
+def grid_rule_base(count, seed):
+    """``(matrix, terms)`` of a full-grid rule base over ``count`` distance inputs."""
+    rng = np.random.default_rng(seed)
+    universe = np.arange(0, 101, 1)
+    inputs = {'ps{}'.format(i): list(DISTANCE_TERMS) for i in range(count)}
+    outputs = {'left_speed': list(SPEED_TERMS), 'right_speed': list(SPEED_TERMS)}
+    rows = [(cells, tuple(rng.choice(SPEED_TERMS, size=2))) for cells in itertools.product(DISTANCE_TERMS, repeat=count)]
+    matrix = RuleMatrix.from_table(inputs, outputs, rows, layout='dense')
+    terms = [(n, universe, fuzz.trapmf(universe, DISTANCE_TERMS[term]))
+             for n, label in enumerate(inputs) for term in inputs[label]]
+    return matrix, terms
+
+
+def full_cuts(matrix, terms):
+    """Cuts of one sample from every term and every rule."""
+    def run(sample):
+        memberships = np.empty((len(terms), 1))
+        for row, (i, universe, mf) in enumerate(terms):
+            memberships[row] = np.interp(min(max(sample[i], universe[0]), universe[-1]), universe, mf)
+        return matrix.evaluate(memberships)[:, 0]
+    return run
+
+
+def per_sample(function, samples):
+    start = time.perf_counter()
+    results = [function(sample) for sample in samples]
+    return (time.perf_counter() - start) / len(samples), results
+
+
+def compare(name, matrix, terms, samples):
+    index = ActiveRuleIndex(matrix, terms)
+    candidates = np.mean([len(index.candidates(sample)) for sample in samples])
+    full, expected = per_sample(full_cuts(matrix, terms), samples)
+    active, got = per_sample(index.cuts, samples)
+    if not np.array_equal(np.array(expected), np.array(got)):
+        raise SystemExit("{}: the candidate cuts differ from the full evaluation".format(name))
+    print("{:<23} {:>6} {:>11.1f} {:11.1f}us {:11.1f}us {:8.1f}x".format(
+        name, matrix.rule_count, candidates, 1e6 * full, 1e6 * active, full / active))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--inputs', type=int, nargs='+', default=[2, 4, 6, 8], help="synthetic rule base sizes")
+    parser.add_argument('--steps', type=int, default=100, help="samples for the full-step comparison")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print("{:<23} {:>6} {:>11} {:>13} {:>13} {:>9}".format('', 'rules', 'candidates', 'all', 'active', 'speedup'))
+    engines = {}
+    for name, (builder, inputs, outputs) in RULE_BASES.items():
+        engine = ActiveRuleEngine(builder(), inputs, outputs)
+        universes = engine.engine._universes
+        samples = rng.uniform([u[0] for u in universes], [u[-1] for u in universes],
+                              size=(args.samples, len(inputs))).tolist()
+        terms = [(i, universes[i], mf) for i, mf in engine.engine._matrix_terms]
+        compare(name, engine.index.matrix.with_layout('dense'), terms, samples)
+        engines[name] = (engine, samples)
+    for count in args.inputs:
+        matrix, terms = grid_rule_base(count, args.seed)
+        samples = rng.uniform(0, 100, size=(args.samples, count)).tolist()
+        compare("grid, {} inputs".format(count), matrix, terms, samples)
+
+    from skfuzzy.control import ControlSystemSimulation
+
+    print()
+    print("{:<23} {:>13} {:>13}".format('full step', 'skfuzzy', 'active'))
+    for name, (engine, samples) in engines.items():
+        sim = ControlSystemSimulation(engine.engine.control_system)
+
+        def skfuzzy_step(sample):
+            for label, value in zip(engine.inputs, sample):
+                sim.input[label] = value
+            sim.compute()
+
+        reference, _ = per_sample(skfuzzy_step, samples[:args.steps])
+        active, _ = per_sample(lambda sample: engine.compute(*sample), samples[:args.steps])
+        print("{:<23} {:11.1f}us {:11.1f}us".format(name, 1e6 * reference, 1e6 * active))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Per-frame cost of the CustomCamera acquisition modes.
+
+Feeds ``CustomCamera`` from a stand-in camera that returns what Webots
+returns: a nested ``[x][y][rgb]`` list from ``getImageArray()`` and a BGRA
+``bytes`` object from ``getImage()``.  Both are prepared up front, so only
+the controller side of ``getImage()`` + ``getHSV()`` is measured.
+
+    python tools/bench_camera.py --size 220 --frames 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.camera import CAMERA_MODES, CustomCamera  # noqa: E402
+
+
+class RecordedCamera:
+    def __init__(self, size, frames, seed=0):
+        rng = np.random.default_rng(seed)
+        self.size = size
+        bgra = [rng.integers(0, 256, (size, size, 4), dtype=np.uint8) for _ in range(frames)]
+        self.raw = [frame.tobytes() for frame in bgra]
+        self.arrays = [frame[:, :, 2::-1].transpose(1, 0, 2).tolist() for frame in bgra]
+        self.index = 0
+
+    def getWidth(self):
+        return self.size
+
+    def getHeight(self):
+        return self.size
+
+    def next(self):
+        self.index = (self.index + 1) % len(self.raw)
+
+    def getImage(self):
+        return self.raw[self.index]
+
+    def getImageArray(self):
+        return self.arrays[self.index]
+
+
+def bench(mode, source, frames):
+    camera = CustomCamera(source, mode=mode)
+    start = time.perf_counter()
+    for _ in range(frames):
+        source.next()
+        camera.getImage()
+        camera.getHSV()
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=220)
+    parser.add_argument('--frames', type=int, default=200)
+    args = parser.parse_args()
+
+    source = RecordedCamera(args.size, 8)
+    results = {mode: bench(mode, source, args.frames) for mode in CAMERA_MODES}
+    for mode, seconds in results.items():
+        print("{:<7} {:8.1f} us/frame".format(mode, seconds * 1e6))
+    print("speedup {:8.1f}x".format(results['array'] / results['buffer']))
+
+
+if __name__ == "__main__":
+    main()
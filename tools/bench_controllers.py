@@ -0,0 +1,220 @@
+"""Step latency of the controllers, run offline through the replay harness.
+
+Each controller script runs unmodified against the recorded sensor stream
+and synthetic camera frames (see ``tools/replay/replay.py``).  The stand-in
+robot timestamps every ``robot.step()`` call, so the latency of a step is
+the time the controller spent between two calls.  Fuzzy inference
+(``ControlSystemSimulation.compute``, ``FuzzyLookupTable.compute``,
+``ActiveRuleEngine.compute``) and vision (the OpenCV calls,
+``CustomCamera`` and the blob trackers) are timed by wrapping those
+functions; nested calls are only counted once.
+
+    python tools/bench_controllers.py --steps 300 --out bench_controllers.json
+    python tools/bench_controllers.py H2 HHH1 --compare bench_controllers.json
+
+The first ``--warmup`` steps (LUT build, first frame, lazy imports) are left
+out of every number.  Results are written as JSON keyed by controller.
+The camera frames are converted to the ``getImage()`` / ``getImageArray()``
+representations before the run, so only the controller side is measured.
+"""
+
+import argparse
+import collections
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, 'replay'))
+
+import replay  # noqa: E402  (sets up the library and stand-in paths)
+import controller  # noqa: E402
+
+CONTROLLERS = ('H2', 'my_controller1', 'cobain1', 'HHH1', 'Obstacle_Avoidance_FLC', 'Obstacle1', 'my_controller123')
+CAMERA_CONTROLLERS = ('H2', 'my_controller1', 'cobain1', 'HHH1')
+DEFAULT_SENSORS = os.path.join(replay.ROOT, 'controllers', 'H2', 'robot_performance_data.csv')
+
+VISION_CV2 = ('cvtColor', 'inRange', 'findContours', 'contourArea', 'moments', 'boundingRect',
+              'connectedComponentsWithStats', 'connectedComponentsWithStatsWithAlgorithm', 'countNonZero',
+              'circle', 'line', 'resize', 'imshow', 'waitKey')
+
+
+class CategoryTimer:
+    """Accumulates wall time per category over wrapped functions."""
+
+    def __init__(self):
+        self.total = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+        self._depth = collections.defaultdict(int)
+        self._patched = []
+
+    def wrap(self, owner, name, category):
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            if self._depth[category]:
+                return original(*args, **kwargs)
+            self._depth[category] += 1
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.total[category] += time.perf_counter() - start
+                self.calls[category] += 1
+                self._depth[category] -= 1
+
+        setattr(owner, name, timed)
+        self._patched.append((owner, name, original))
+
+    def reset(self):
+        self.total.clear()
+        self.calls.clear()
+
+    def restore(self):
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched = []
+
+
+class TimedSession(controller.ReplaySession):
+    """Replay session that records the controller time between steps."""
+
+    def __init__(self, timer, warmup, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timer = timer
+        self.warmup = warmup
+        self.latencies = []
+        self._returned = None
+
+    def advance(self, duration):
+        now = time.perf_counter()
+        if self._returned is not None and self.index > self.warmup:
+            self.latencies.append(now - self._returned)
+        if self.index == self.warmup:
+            self.timer.reset()
+        result = super().advance(duration)
+        self._returned = time.perf_counter()
+        return result
+
+
+def instrument(timer):
+    import cv2
+    from skfuzzy.control import ControlSystemSimulation
+
+    from obstacle_avoidance.activerules import ActiveRuleEngine
+    from obstacle_avoidance.camera import CustomCamera
+    from obstacle_avoidance.display import DisplaySink
+    from obstacle_avoidance.lut import FuzzyLookupTable
+    from obstacle_avoidance.vision import ColorBlobTracker, WindowedBlobTracker
+
+    timer.wrap(ControlSystemSimulation, 'compute', 'fuzzy')
+    timer.wrap(FuzzyLookupTable, 'compute', 'fuzzy')
+    timer.wrap(ActiveRuleEngine, 'compute', 'fuzzy')
+    for name in VISION_CV2:
+        if hasattr(cv2, name):
+            timer.wrap(cv2, name, 'vision')
+    for name in ('getImage', 'getHSV', 'displayFrame'):
+        timer.wrap(CustomCamera, name, 'vision')
+    timer.wrap(ColorBlobTracker, 'find', 'vision')
+    timer.wrap(ColorBlobTracker, 'segment', 'vision')
+    timer.wrap(WindowedBlobTracker, 'track', 'vision')
+    timer.wrap(DisplaySink, 'show', 'vision')
+
+
+def bench(name, sensors, frames, steps, warmup):
+    timer = CategoryTimer()
+    instrument(timer)
+    session = TimedSession(timer, warmup, sensors, frames, steps=steps + warmup, loop=True, prepare=True)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            replay.run_controller(replay.controller_script(name), session, workdir)
+    finally:
+        timer.restore()
+
+    latencies = np.array(session.latencies) * 1000
+    measured = max(len(latencies), 1)
+    return {
+        'steps': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'max_ms': float(latencies.max()),
+        'steps_per_s': float(1000 / latencies.mean()),
+        'fuzzy_ms_per_step': 1000 * timer.total['fuzzy'] / measured,
+        'fuzzy_calls': timer.calls['fuzzy'],
+        'vision_ms_per_step': 1000 * timer.total['vision'] / measured,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=replay.ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    print("{:<24} {:>8} {:>8} {:>8} {:>9} {:>9} {:>9}".format(
+        'controller', 'p50 ms', 'p95 ms', 'p99 ms', 'steps/s', 'fuzzy ms', 'vision ms'))
+    for name, row in results.items():
+        line = "{:<24} {:8.2f} {:8.2f} {:8.2f} {:9.0f} {:9.2f} {:9.2f}".format(
+            name, row['p50_ms'], row['p95_ms'], row['p99_ms'], row['steps_per_s'],
+            row['fuzzy_ms_per_step'], row['vision_ms_per_step'])
+        if baseline and name in baseline:
+            line += "   p50 {:+.0%} vs baseline".format(row['p50_ms'] / baseline[name]['p50_ms'] - 1)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('controllers', nargs='*', default=list(CONTROLLERS))
+    parser.add_argument('--sensors', default=DEFAULT_SENSORS, help="CSV or .col sensor recording")
+    parser.add_argument('--frames', default='synthetic', help="image directory, .npy stack or 'synthetic'")
+    parser.add_argument('--frame-count', type=int, default=40, help="synthetic frames, replayed in a loop")
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--out', default='bench_controllers.json')
+    parser.add_argument('--compare', help="earlier results file to compare p50 against")
+    args = parser.parse_args()
+
+    sensors = replay.load_sensors(args.sensors)
+    frames = replay.load_frames(args.frames, count=args.frame_count)
+    results = {}
+    for name in args.controllers:
+        results[name] = bench(name, sensors, frames if name in CAMERA_CONTROLLERS else [], args.steps,
+                              args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['controllers']
+    print_table(results, baseline)
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'steps': args.steps,
+        'warmup': args.warmup,
+        'sensors': os.path.relpath(args.sensors, replay.ROOT),
+        'frames': args.frames,
+        'controllers': results,
+    }
+    with open(args.out, 'w') as file:
+        json.dump(report, file, indent=2)
+    print("results -> {}".format(args.out))
+
+
+if __name__ == "__main__":
+    main()
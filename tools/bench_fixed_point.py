@@ -0,0 +1,120 @@
+"""Error and step time of the fixed-point engines against skfuzzy.
+
+For the two-input distance rule bases (H2 and my_controller123 by default)
+this reports the absolute error of ``FixedPointSurface`` (one row per
+``--shifts`` value) and ``FixedPointMamdani`` against ``BatchMamdani``,
+which equals skfuzzy within 1e-15 (checked on ``--loop-samples`` rows):
+
+* ``codes``: every pair of input codes, at the inputs the codes stand for,
+  so the error of the tables and the integer arithmetic,
+* ``inputs``: ``--samples`` random real inputs, which adds the 8-bit
+  quantization of the inputs.
+
+Inputs where no rule fires are left out.  It then times one ``compute`` per
+sample, as a controller step runs it: skfuzzy's
+``ControlSystemSimulation``, ``ActiveRuleEngine`` and the fixed-point
+engines, the latter also from codes (``compute_codes``).  The size of the C
+tables is listed last.
+
+    python tools/bench_fixed_point.py --samples 20000 --shifts 2 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.activerules import ActiveRuleEngine  # noqa: E402
+from obstacle_avoidance.batch import BatchMamdani  # noqa: E402
+from obstacle_avoidance.fixedpoint import (FixedPointMamdani, FixedPointSurface, code_values,  # noqa: E402
+                                           input_codes)
+from obstacle_avoidance.rulebases import RULE_BASES  # noqa: E402
+
+
+def step_time(compute, rows):
+    start = time.perf_counter()
+    for row in rows:
+        compute(*row)
+    return (time.perf_counter() - start) / len(rows)
+
+
+def skfuzzy_step(engine):
+    from skfuzzy.control import ControlSystemSimulation
+
+    sim = ControlSystemSimulation(engine.control_system)
+
+    def compute(*row):
+        for label, value in zip(engine.inputs, row):
+            sim.input[label] = value
+        sim.compute()
+    return compute
+
+
+def errors(values, reference):
+    """Max, mean and 99th percentile of the absolute error, over rows where every output is defined."""
+    covered = ~np.isnan(reference).any(axis=1)
+    error = np.abs(values[covered] - reference[covered])
+    return error.max(), error.mean(), np.percentile(error, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rule_bases', nargs='*', default=['H2', 'my_controller123'])
+    parser.add_argument('--shifts', type=int, nargs='+', default=[2, 3], help="surface node spacings, 2**shift")
+    parser.add_argument('--samples', type=int, default=20000, help="random inputs for the error")
+    parser.add_argument('--rows', type=int, default=2000, help="single-sample calls timed")
+    parser.add_argument('--loop-samples', type=int, default=200, help="rows run through skfuzzy")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for name in args.rule_bases:
+        if name not in RULE_BASES:
+            parser.error("unknown rule base '{}', expected one of {}".format(name, list(RULE_BASES)))
+        if len(RULE_BASES[name][1]) != 2:
+            parser.error("'{}' does not have two inputs".format(name))
+
+    rng = np.random.default_rng(args.seed)
+    for name in args.rule_bases:
+        builder, inputs, outputs = RULE_BASES[name]
+        system = builder()
+        reference = BatchMamdani(system, inputs, outputs)
+        engines = [('surface, shift {}'.format(shift), FixedPointSurface(system, inputs, outputs, shift))
+                   for shift in args.shifts]
+        engines.append(('mamdani', FixedPointMamdani(system, inputs, outputs)))
+        ranges = engines[0][1].ranges
+        low, high = np.array(ranges).T
+        samples = rng.uniform(low, high, size=(args.samples, len(inputs)))
+        skfuzzy = max(reference.compare_with_skfuzzy(samples[:args.loop_samples]))
+        codes = np.stack(np.meshgrid(np.arange(256), np.arange(256), indexing='ij'), axis=-1).reshape(-1, 2)
+        at_codes = reference.compute(code_values(codes, ranges))
+        at_samples = reference.compute(samples)
+
+        print("== {} (BatchMamdani within {:.1e} of skfuzzy)".format(name, skfuzzy))
+        print("{:<22} {:>24} {:>24}".format('error', 'codes: max mean p99', 'inputs: max mean p99'))
+        for label, engine in engines:
+            scales = 2. ** -np.array(engine.frac_bits)
+            by_code = engine.compute_many(codes)
+            by_sample = engine.compute_many(input_codes(samples, ranges))
+            if isinstance(engine, FixedPointMamdani):
+                by_code, by_sample = by_code[0], by_sample[0]
+            print("{:<22} {:8.4f}{:8.4f}{:8.4f} {:8.4f}{:8.4f}{:8.4f}".format(
+                label, *errors(by_code * scales, at_codes), *errors(by_sample * scales, at_samples)))
+
+        rows = samples[:args.rows].tolist()
+        row_codes = input_codes(samples[:args.rows], ranges).tolist()
+        times = [('skfuzzy', step_time(skfuzzy_step(reference), rows[:args.loop_samples])),
+                 ('active', step_time(ActiveRuleEngine(system, inputs, outputs).compute, rows))]
+        for label, engine in engines:
+            times.append((label, step_time(engine.compute, rows)))
+            times.append((label + ', codes', step_time(engine.compute_codes, row_codes)))
+        print("{:<22} {:>10} {:>9}".format('step', 'time', 'speedup'))
+        for label, seconds in times:
+            print("{:<22} {:8.1f}us {:8.0f}x".format(label, 1e6 * seconds, times[0][1] / seconds))
+        print("C tables: {}\n".format(', '.join("{} {} bytes".format(label, engine.nbytes)
+                                               for label, engine in engines)))
+
+if __name__ == '__main__':
+    main()
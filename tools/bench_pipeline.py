@@ -0,0 +1,59 @@
+"""Per-step wall time of inline vs pipelined vision.
+
+``robot.step`` blocks the controller while Webots advances the world; it is
+stood in for by a sleep of ``--step-ms``.  Each step then runs the full-frame
+blob search (HSV conversion included) on a frame of a drifting target,
+either inline or through ``VisionPipeline``.
+
+    python tools/bench_pipeline.py --size 220 --steps 300 --step-ms 2
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from bench_vision import moving_frames  # noqa: E402
+from obstacle_avoidance.pipeline import VisionPipeline  # noqa: E402
+from obstacle_avoidance.vision import ColorBlobTracker  # noqa: E402
+
+
+def run(frames, steps, step_seconds, threaded):
+    tracker = ColorBlobTracker()
+
+    def find_blob(image):
+        return tracker.find(cv2.cvtColor(image, cv2.COLOR_BGR2HSV))
+
+    vision = VisionPipeline(find_blob, threaded=threaded)
+    start = time.perf_counter()
+    for step in range(steps):
+        time.sleep(step_seconds)
+        vision.submit(frames[step % len(frames)])
+    elapsed = time.perf_counter() - start
+    vision.close()
+    return elapsed / steps, vision
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=220)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--step-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    frames = moving_frames(args.size, 50)
+    results = {}
+    for threaded in (False, True):
+        per_step, vision = run(frames, args.steps, args.step_ms / 1000, threaded)
+        results[threaded] = per_step
+        print("{:<9} {:7.3f} ms/step".format('threaded' if threaded else 'inline', per_step * 1000))
+        print("  " + vision.summary())
+    print("wall time saved per step: {:.3f} ms".format((results[False] - results[True]) * 1000))
+
+
+if __name__ == "__main__":
+    main()
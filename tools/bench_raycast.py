@@ -0,0 +1,71 @@
+"""Cost of batched sensor ray queries against the number of boxes in the arena.
+
+Fills the 1 m arena with ``M`` random walls and casts 7 cm rays from random
+points, through the arena's grid index (``Arena.ray_distance`` with a finite
+range) and against every box.  The brute-force test is timed on a sample of
+the rays and scaled, and the two results are compared on that sample.
+``pairs/ray`` is the number of candidate boxes the index returns per ray;
+once walls overlap everywhere it grows with their number whatever the index.
+
+    python tools/bench_raycast.py --boxes 7 70 700 7000 --rays 80000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.arena import Arena  # noqa: E402
+from obstacle_avoidance.simulator import PS_RANGE  # noqa: E402
+
+
+def random_arena(count, rng, radius=1.0):
+    """``count`` walls 2-30 cm long and 1-3 cm thick, anywhere in the arena."""
+    centres = rng.uniform(-0.9, 0.9, (count, 2)) * radius
+    boxes = np.column_stack([centres, rng.uniform(0.01, 0.15, count), rng.uniform(0.005, 0.015, count),
+                             rng.uniform(-np.pi, np.pi, count)])
+    return Arena(radius, boxes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--boxes', type=int, nargs='+', default=[7, 70, 700, 7000])
+    parser.add_argument('--rays', type=int, default=80000)
+    parser.add_argument('--sample', type=int, default=2000, help="rays cast by the brute-force test")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    origins = rng.uniform(-0.9, 0.9, (args.rays, 2))
+    angles = rng.uniform(-np.pi, np.pi, args.rays)
+    directions = np.column_stack([np.cos(angles), np.sin(angles)])
+    sample = min(args.sample, args.rays)
+
+    print("{:>6} {:>9} {:>10} {:>12} {:>12} {:>9} {:>10}".format('boxes', 'cells', 'pairs/ray', 'grid ms',
+                                                                'all ms', 'speedup', 'max diff'))
+    for count in args.boxes:
+        arena = random_arena(count, rng)
+        arena.ray_distance(origins[:10], directions[:10], PS_RANGE)
+        grid = min(timed(arena.ray_distance, origins, directions, PS_RANGE) for _ in range(args.repeat))
+        brute = timed(arena.ray_distance, origins[:sample], directions[:sample]) * args.rays / sample
+        indexed = arena.ray_distance(origins[:sample], directions[:sample], PS_RANGE)
+        everything = np.minimum(arena.ray_distance(origins[:sample], directions[:sample]), PS_RANGE)
+        rays, _ = arena.index.segment_pairs(origins, origins + directions * PS_RANGE)
+        print("{:>6} {:>9} {:10.2f} {:12.2f} {:12.2f} {:8.1f}x {:10.2g}".format(
+            count, '{}x{}'.format(*arena.index.shape), len(rays) / args.rays, 1000 * grid, 1000 * brute, brute / grid,
+            np.abs(indexed - everything).max()))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Rule evaluation of the compiled rule matrices against skfuzzy's rule graph.
+
+For every rule base in ``rulebases.RULE_BASES`` this reports, per sample:
+
+* ``compute()``: a full ``ControlSystemSimulation.compute()``, timed on
+  ``--loop-samples`` rows,
+* the rule stage alone (firing strengths and cuts from fuzzified inputs),
+  in a batch of ``--samples`` rows and for one row at a time as a
+  controller step sees it: skfuzzy's graph walked per rule (as
+  ``BatchMamdani(compile_rules=False)`` does) against the sparse and dense
+  ``RuleMatrix`` layouts,
+* the whole batched inference, defuzzification included, both ways.
+
+The compiled cuts, of the rule base pruned for execution (see
+``ruleanalysis``), are checked to equal the graph walk exactly.  The rule
+base is also compiled again from its own table rows, to check the tabular
+spec gives the same matrices.
+
+    python tools/bench_rules.py --samples 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.batch import BatchMamdani  # noqa: E402
+from obstacle_avoidance.rulebases import RULE_BASES  # noqa: E402
+from obstacle_avoidance.rulematrix import RuleMatrix  # noqa: E402
+
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def graph_stage(engine, samples):
+    """Firing strengths and cuts through skfuzzy's rule graph, for memberships fuzzified up front."""
+    memberships = engine.fuzzify(samples)
+
+    def run():
+        firing = np.column_stack([engine._antecedent_value(rule.antecedent, memberships, rule)
+                                  for rule in engine.rules])
+        return np.column_stack([engine._cuts(out, firing) for out in engine._output_vars])
+    return run
+
+
+def matrix_stage(engine, matrix, samples):
+    """The same through ``matrix``, with its term-major memberships fuzzified up front."""
+    memberships = engine.fuzzify(samples)
+    memberships = np.array([memberships[key] for key in matrix.input_terms])
+    columns = np.concatenate([out['columns'] for out in engine._output_vars]).astype(np.intp)
+
+    def run():
+        return matrix.evaluate(memberships)[columns].T
+    return run
+
+
+def row_time(stage, engine, samples, repeat):
+    """Time of the rule stage on one sample, as a controller step runs it."""
+    runs = [stage(engine, samples[n:n + 1]) for n in range(len(samples))]
+    return best_time(lambda: [run() for run in runs], repeat) / len(samples)
+
+
+def skfuzzy_loop(engine):
+    from skfuzzy.control import ControlSystemSimulation
+
+    sim = ControlSystemSimulation(engine.control_system)
+
+    def run(samples):
+        for row in samples:
+            for label, value in zip(engine.inputs, row):
+                sim.input[label] = value
+            sim.compute()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rule_bases', nargs='*', default=list(RULE_BASES), help="default: all")
+    parser.add_argument('--samples', type=int, default=100000, help="batch size")
+    parser.add_argument('--rows', type=int, default=2000, help="single-row calls timed")
+    parser.add_argument('--loop-samples', type=int, default=200, help="rows run through compute()")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for name in args.rule_bases:
+        if name not in RULE_BASES:
+            parser.error("unknown rule base '{}', expected one of {}".format(name, list(RULE_BASES)))
+
+    rng = np.random.default_rng(args.seed)
+    print("{:<23} {:>6} {:>11} {:>13} {:>13} {:>13} {:>13}".format(
+        '', 'rules', 'compute()', 'graph', 'sparse', 'dense', 'inference'))
+    for name in args.rule_bases:
+        builder, inputs, outputs = RULE_BASES[name]
+        system = builder()
+        graph = BatchMamdani(system, inputs, outputs, compile_rules=False)
+        compiled = BatchMamdani(system, inputs, outputs)
+        sparse = compiled.matrix
+        dense = sparse.with_layout('dense')
+
+        low = [u[0] for u in graph._universes]
+        high = [u[-1] for u in graph._universes]
+        samples = rng.uniform(low, high, size=(args.samples, len(inputs)))
+
+        stages = [graph_stage(graph, samples)] + [matrix_stage(compiled, matrix, samples) for matrix in (sparse, dense)]
+        expected = stages[0]()
+        for matrix, stage in zip((sparse, dense), stages[1:]):
+            got = stage()
+            if not np.array_equal(got, expected):
+                raise SystemExit("{}: {} cuts differ from the rule graph by {:g}".format(
+                    name, matrix.layout, np.abs(got - expected).max()))
+        every = compiled.rule_matrix
+        table = RuleMatrix.from_table(every.inputs, every.outputs, every.rows(), every.connectives[0])
+        if table.antecedents != every.antecedents or table.consequents != every.consequents:
+            raise SystemExit("{}: the table rows compile to different matrices".format(name))
+
+        loop = best_time(lambda: skfuzzy_loop(graph)(samples[:args.loop_samples]), 1) / args.loop_samples
+        batch = [best_time(stage, args.repeat) / len(samples) for stage in stages]
+        rows = [row_time(graph_stage, graph, samples[:args.rows], args.repeat)]
+        rows += [row_time(lambda engine, block, m=m: matrix_stage(engine, m, block), compiled, samples[:args.rows],
+                          args.repeat) for m in (sparse, dense)]
+        inference = [best_time(lambda: engine.compute(samples), args.repeat) / len(samples)
+                     for engine in (graph, compiled)]
+
+        print("{:<23} {:>6} {:9.1f}us {:11.0f}ns {:11.0f}ns {:11.0f}ns {:11.0f}ns  per sample, batch of {}".format(
+            name, sparse.rule_count, 1e6 * loop, *[1e9 * t for t in batch], 1e9 * inference[1], args.samples))
+        print("{:<23} {:>6} {:>11} {:11.1f}us {:11.1f}us {:11.1f}us {:11.0f}ns  one sample; graph inference".format(
+            '', '', '', *[1e6 * t for t in rows], 1e9 * inference[0]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Throughput of the batched arena simulator, in robot-steps per millisecond.
+
+Steps N e-pucks through ``worlds/OBSTACLE ARENA.wbt`` with each policy and
+reports the time per batch step, the throughput and what the robots did
+(mean distance travelled, share of robots that collided at least once).
+One Webots e-puck runs at about 1/32 robot-steps per millisecond of wall
+time.
+
+    python tools/bench_simulator.py --robots 1000 10000 --steps 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance import policies  # noqa: E402
+from obstacle_avoidance.arena import Arena  # noqa: E402
+from obstacle_avoidance.rulebases import h2_system  # noqa: E402
+from obstacle_avoidance.simulator import ArenaSimulator  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--world', default=None, help="world file (default: worlds/OBSTACLE ARENA.wbt)")
+    parser.add_argument('--robots', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--dtype', choices=('float32', 'float64'), default='float32')
+    parser.add_argument('--noise', action='store_true', help="sample the sensor noise")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    arena = Arena.from_wbt(args.world) if args.world else Arena.from_wbt()
+    print("{} boxes, arena radius {:g} m".format(len(arena.boxes), arena.radius))
+    candidates = {
+        'threshold': policies.threshold_turn,
+        'obstacle1': policies.obstacle1,
+        'fuzzy H2': policies.FuzzyDistancePolicy(h2_system(), inputs='front'),
+    }
+
+    print("{:<10} {:>7} {:>11} {:>15} {:>10} {:>10}".format('policy', 'robots', 'ms/step', 'robot-steps/ms',
+                                                           'distance', 'collided'))
+    for name, policy in candidates.items():
+        for count in args.robots:
+            sim = ArenaSimulator(arena, n=count, seed=args.seed, noise=args.noise, dtype=args.dtype)
+            # Warm-up, outside the timing
+            sim.run(policy, 2)
+            sim.reset()
+            start = time.perf_counter()
+            stats = sim.run(policy, args.steps)
+            elapsed = time.perf_counter() - start
+            print("{:<10} {:>7} {:11.3f} {:15.0f} {:9.3f}m {:9.1%}".format(
+                name, count, 1000 * elapsed / args.steps, count * args.steps / (1000 * elapsed),
+                np.mean(stats['distance']), np.mean(stats['collisions'] > 0)))
+
+
+if __name__ == '__main__':
+    main()
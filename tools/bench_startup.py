@@ -0,0 +1,152 @@
+"""Startup time of the controllers, from process start to the first robot.step().
+
+Every run is a fresh interpreter, as Webots launches it on a world reload.
+The controller script runs unmodified against the stand-in ``controller``
+package of the replay harness (no sensor data, black camera frames) for two
+steps.  Reported per controller, as the median over ``--repeat`` runs:
+
+* ``interpreter``: process start to the first line of the bootstrap,
+* ``first step``: process start to the first ``robot.step()`` call, which
+  covers the controller's imports and its setup (fuzzy system, LUT, devices),
+* ``first step done``: process start to the second ``robot.step()`` call,
+  so work deferred to the first iteration (lazy imports) is not hidden.
+
+The heavy modules already imported when ``robot.step()`` is first called
+are listed too.  ``baseline`` is an empty controller, i.e. the cost of the
+interpreter and the stand-in package alone.
+
+    python tools/bench_startup.py --repeat 5 --out bench_startup.json
+
+The process start is taken just before ``subprocess`` spawns the child;
+``time.monotonic()`` is system-wide on Linux, so the child's timestamps are
+comparable to it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+
+CONTROLLERS = ('baseline', 'Obstacle1', 'my_controller57', 'my_controller11', 'my_controller12',
+               'my_controller123', 'Obstacle_Avoidance_FLC', 'H2', 'my_controller1', 'cobain1', 'HHH1')
+HEAVY_MODULES = ('numpy', 'scipy', 'skfuzzy', 'cv2', 'csv')
+
+# Runs in the child: times the stand-in Robot.step() calls, then runs the script
+BOOTSTRAP = r"""
+import time
+entered = time.monotonic()
+import json, os, runpy, sys
+script, result_path, root = sys.argv[1:4]
+sys.path.insert(0, os.path.join(root, 'tools', 'replay'))
+sys.path.insert(0, os.path.join(root, 'libraries', 'python'))
+import controller
+
+marks = {'interpreter': entered}
+
+class StartupSession(controller.ReplaySession):
+    def advance(self, duration):
+        if self.index == 0:
+            marks['first step'] = time.monotonic()
+            marks['modules'] = [m for m in HEAVY_MODULES if m in sys.modules]
+        elif self.index == 1:
+            marks['first step done'] = time.monotonic()
+        return super().advance(duration)
+
+controller.install(StartupSession(steps=2))
+try:
+    if script != 'baseline':
+        sys.path.insert(0, os.path.dirname(script))
+        runpy.run_path(script, run_name='__main__')
+    else:
+        robot = controller.Robot()
+        while robot.step(32) != -1:
+            pass
+except SystemExit:
+    pass
+finally:
+    # Also written when the controller fails on the replayed (blank) data
+    with open(result_path, 'w') as file:
+        json.dump(marks, file)
+"""
+
+
+def controller_script(name):
+    if name == 'baseline':
+        return name
+    if os.path.isfile(name):
+        return os.path.abspath(name)
+    return os.path.abspath(os.path.join(ROOT, 'controllers', name, name + '.py'))
+
+
+def run_once(name, workdir):
+    result_path = os.path.join(workdir, 'startup.json')
+    bootstrap = 'HEAVY_MODULES = {!r}\n'.format(HEAVY_MODULES) + BOOTSTRAP
+    start = time.monotonic()
+    completed = subprocess.run([sys.executable, '-c', bootstrap, controller_script(name), result_path,
+                                os.path.abspath(ROOT)], cwd=workdir, capture_output=True, text=True)
+    if not os.path.exists(result_path):
+        raise RuntimeError("{} failed to start:\n{}".format(name, completed.stderr.strip()))
+    with open(result_path) as file:
+        marks = json.load(file)
+    os.remove(result_path)
+    if 'first step' not in marks:
+        raise RuntimeError("{} failed before its first step:\n{}".format(name, completed.stderr.strip()))
+    # A failure after the first step (in the control loop) still leaves the startup measured
+    error = completed.stderr.strip().splitlines()[-1] if completed.returncode != 0 else None
+    timings = {stage: 1000 * (marks[stage] - start) for stage in ('interpreter', 'first step', 'first step done')
+               if stage in marks}
+    return timings, marks.get('modules', []), error
+
+
+def bench(name, repeat):
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(repeat):
+            runs.append(run_once(name, workdir))
+    timings, modules, error = runs[-1]
+    if error:
+        print("warning: {} exited with an error after starting: {}".format(name, error), file=sys.stderr)
+    result = {'modules': modules, 'error': error}
+    for stage in timings:
+        result[stage.replace(' ', '_') + '_ms'] = statistics.median(run[0][stage] for run in runs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('controllers', nargs='*', default=list(CONTROLLERS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    print("{:<24} {:>12} {:>12} {:>16}  {}".format('controller', 'interp ms', 'first step', 'first step done',
+                                                   'imported at first step'))
+    for name in args.controllers:
+        row = results[name] = bench(name, args.repeat)
+        print("{:<24} {:12.1f} {:12.1f} {:16.1f}  {}".format(
+            name, row['interpreter_ms'], row.get('first_step_ms', float('nan')),
+            row.get('first_step_done_ms', float('nan')), ' '.join(row['modules'])))
+
+    if args.out:
+        report = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'repeat': args.repeat,
+            'controllers': results,
+        }
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+        print("results -> {}".format(args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Memory and per-step cost of the telemetry recording.
+
+Compares the old ``self.data`` list (written to CSV at the end) with
+``TelemetryRecorder`` for ``--rows`` steps of the four-column
+robot_performance_data layout.  Python heap growth is measured with
+``tracemalloc``.  The files are then read back: one column parsed with the
+``csv`` module against the same column mapped from the columnar spool.
+
+    python tools/bench_telemetry.py --rows 200000
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.columnar import ColumnarFile  # noqa: E402
+from obstacle_avoidance.telemetry import PERFORMANCE_COLUMNS, TelemetryRecorder  # noqa: E402
+
+
+def step_rows(count, seed=0, block=1024):
+    """Fresh list per step, like the controllers build, generated in small blocks."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, block):
+        yield from rng.uniform(0, 100, (min(block, count - start), 4)).tolist()
+
+
+def bench_list(count, directory):
+    tracemalloc.start()
+    data = []
+    start = time.perf_counter()
+    for row in step_rows(count):
+        data.append(row)
+    append_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    with open(os.path.join(directory, 'list.csv'), 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(PERFORMANCE_COLUMNS)
+        writer.writerows(data)
+    return append_time, peak, time.perf_counter() - start
+
+
+def bench_recorder(count, directory, chunk_rows):
+    tracemalloc.start()
+    recorder = TelemetryRecorder(PERFORMANCE_COLUMNS, os.path.join(directory, 'spool.col'), chunk_rows=chunk_rows)
+    start = time.perf_counter()
+    for row in step_rows(count):
+        recorder.append(row)
+    append_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    recorder.export_csv(os.path.join(directory, 'recorder.csv'), keep_spool=True)
+    return append_time, peak, time.perf_counter() - start, recorder.stats()
+
+
+def bench_load(directory, column):
+    start = time.perf_counter()
+    with open(os.path.join(directory, 'list.csv'), newline='') as file:
+        reader = csv.reader(file)
+        index = next(reader).index(column)
+        values = np.array([float(row[index]) for row in reader])
+    csv_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mapped = ColumnarFile(os.path.join(directory, 'spool.col')).column(column)
+    total = float(mapped.sum())
+    col_time = time.perf_counter() - start
+    assert np.isclose(total, values.sum())
+    return csv_time, col_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-rows', type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        list_append, list_peak, list_csv = bench_list(args.rows, directory)
+        rec_append, rec_peak, rec_csv, stats = bench_recorder(args.rows, directory, args.chunk_rows)
+        csv_load, col_load = bench_load(directory, PERFORMANCE_COLUMNS[0])
+        csv_size = os.path.getsize(os.path.join(directory, 'list.csv'))
+        col_size = os.path.getsize(os.path.join(directory, 'spool.col'))
+
+    print("rows: {}".format(args.rows))
+    print("list      append {:6.2f} us/row  peak heap {:8.1f} MB  csv at end {:.2f} s".format(
+        list_append / args.rows * 1e6, list_peak / 1e6, list_csv))
+    print("recorder  append {:6.2f} us/row  peak heap {:8.1f} MB  csv export {:.2f} s".format(
+        rec_append / args.rows * 1e6, rec_peak / 1e6, rec_csv))
+    print("recorder  ring {} kB, {} chunks flushed, {:.3f} ms mean / {:.3f} ms max per flush, "
+          "{:.1f} ms stalled".format(stats['ring_bytes'] // 1024, stats['flushed_chunks'], stats['mean_flush_ms'],
+                                     stats['max_flush_ms'], stats['stall_ms']))
+    print("load one column: csv {:.3f} s ({:.1f} MB), columnar {:.4f} s ({:.1f} MB), {:.0f}x".format(
+        csv_load, csv_size / 1e6, col_load, col_size / 1e6, csv_load / col_load))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Per-frame latency of the blue target search on synthetic frames.
+
+Compares the inline code the controllers used (``findContours(RETR_TREE)``
+plus a Python ``contourArea`` loop) with both ``ColorBlobTracker`` methods,
+and checks that the ``'contours'`` method finds the same centroid.
+
+A second run follows a target drifting a few pixels per frame and compares
+a full-frame search (HSV conversion included) with
+``WindowedBlobTracker.track()``.
+
+    python tools/bench_vision.py --size 220 --frames 300
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.vision import TRACKER_METHODS, ColorBlobTracker, WindowedBlobTracker  # noqa: E402
+
+
+def synthetic_frames(size, count, seed=0):
+    """HSV frames with a blue target, a few distractors and speckle noise."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        bgr = rng.integers(60, 200, (size, size, 3), dtype=np.uint8)
+        bgr[:, :, 0] //= 3
+        cx, cy = rng.integers(size // 8, size - size // 8, 2)
+        radius = int(rng.integers(size // 20, size // 6))
+        cv2.circle(bgr, (int(cx), int(cy)), radius, (255, 40, 20), -1)
+        for _ in range(3):
+            x, y = rng.integers(0, size - 10, 2)
+            cv2.rectangle(bgr, (int(x), int(y)), (int(x) + 6, int(y) + 4), (230, 30, 30), -1)
+        noise = rng.random((size, size)) < 0.002
+        bgr[noise] = (240, 20, 20)
+        frames.append(cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV))
+    return frames
+
+
+def moving_frames(size, count, step=3, seed=0):
+    """BGR frames of a blue target drifting across a cluttered background."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 200, (size, size, 3), dtype=np.uint8)
+    background[:, :, 0] //= 3
+    radius = size // 12
+    x, y = size / 2, size / 2
+    vx, vy = step, step / 2
+    frames = []
+    for _ in range(count):
+        if not radius <= x + vx <= size - radius:
+            vx = -vx
+        if not radius <= y + vy <= size - radius:
+            vy = -vy
+        x, y = x + vx, y + vy
+        bgr = background.copy()
+        cv2.circle(bgr, (int(x), int(y)), radius, (255, 40, 20), -1)
+        frames.append(bgr)
+    return frames
+
+
+def legacy_find(hsv_image):
+    lower_blue = np.array([110, 50, 50])
+    upper_blue = np.array([130, 255, 255])
+    mask = cv2.inRange(hsv_image, lower_blue, upper_blue)
+    contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    largest_contour = None
+    max_area = 0
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area > max_area:
+            max_area = area
+            largest_contour = contour
+    if largest_contour is not None:
+        M = cv2.moments(largest_contour)
+        if M["m00"] != 0:
+            return int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"])
+    return None
+
+
+def timed(function, frames, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            function(frame)
+    return (time.perf_counter() - start) / (repeat * len(frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=220)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.size, args.frames)
+    results = {'legacy': timed(legacy_find, frames, args.repeat)}
+    for method in TRACKER_METHODS:
+        tracker = ColorBlobTracker(method=method)
+        results[method] = timed(tracker.find, frames, args.repeat)
+
+    for name, seconds in results.items():
+        print("{:<11} {:8.1f} us/frame  ({:.1f}x)".format(name, seconds * 1e6, results['legacy'] / seconds))
+
+    tracker = ColorBlobTracker(method='contours')
+    mismatches = 0
+    for frame in frames:
+        blob = tracker.find(frame)
+        if legacy_find(frame) != (None if blob is None else (blob.x, blob.y)):
+            mismatches += 1
+    print("contours centroid mismatches vs legacy: {}/{}".format(mismatches, len(frames)))
+
+    sequence = moving_frames(args.size, args.frames)
+    full = ColorBlobTracker()
+
+    def full_search(frame):
+        return full.find(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV))
+
+    tracker = WindowedBlobTracker()
+    full_time = timed(full_search, sequence, args.repeat)
+    track_time = timed(tracker.track, sequence, args.repeat)
+    print("moving target, full frame {:8.1f} us/frame".format(full_time * 1e6))
+    print("moving target, windowed   {:8.1f} us/frame  ({:.1f}x, {} full / {} window searches)".format(
+        track_time * 1e6, full_time / track_time, tracker.full_searches, tracker.window_searches))
+
+    tracker = WindowedBlobTracker()
+    mismatches = sum(tracker.track(frame) != full_search(frame) for frame in sequence)
+    print("windowed blob mismatches vs full frame: {}/{}".format(mismatches, len(sequence)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Check the offline rule bases against the controllers they copy.
+
+``obstacle_avoidance.rulebases`` rebuilds each controller's fuzzy system by
+hand, and the tools, the tuner and the C exporter all start from those
+copies.  Every rule base is named after its controller directory.  This
+runs that controller for a couple of steps through the replay stand-in
+(``tools/replay``), records the ``ControlSystem`` it builds and compares
+its ``definition_hash`` (membership functions, rules, defuzzification) with
+the copy's.  The controllers of ``rulebases.SHARED_RULE_BASES`` are
+checked against the copy they share.
+
+It exits with status 1 when a copy differs from its controller.  A
+controller that fails before building its system is listed as not checked.
+
+    python tools/check_rulebases.py H2 my_controller123
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'libraries', 'python'))
+sys.path.insert(0, os.path.join(HERE, 'replay'))
+
+import controller  # noqa: E402
+from skfuzzy import control as ctrl  # noqa: E402
+
+from obstacle_avoidance.cache import definition_hash  # noqa: E402
+from obstacle_avoidance.rulebases import RULE_BASES, SHARED_RULE_BASES  # noqa: E402
+from replay import controller_script, run_controller  # noqa: E402
+
+
+@contextlib.contextmanager
+def recorded_systems():
+    """List of the ``ControlSystem`` instances built inside the block."""
+    systems = []
+    original = ctrl.ControlSystem
+
+    class Recording(original):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            systems.append(self)
+
+    ctrl.ControlSystem = Recording
+    try:
+        yield systems
+    finally:
+        ctrl.ControlSystem = original
+
+
+def controller_system(name, steps=2):
+    """The first ``ControlSystem`` the controller ``name`` builds, and the error it stopped with, if any."""
+    session = controller.ReplaySession({}, [], steps=steps)
+    error = None
+    with recorded_systems() as systems, tempfile.TemporaryDirectory() as workdir:
+        try:
+            run_controller(controller_script(name), session, workdir)
+        except Exception as exc:
+            # Zero readings can leave skfuzzy without an output, after the system is built
+            error = exc
+    return (systems[0] if systems else None), error
+
+
+def check(name):
+    """``('matches' | 'differs' | 'not checked', detail)`` for the copy of the controller ``name``."""
+    copy = SHARED_RULE_BASES.get(name, name)
+    system, error = controller_system(name)
+    if system is None:
+        return 'not checked', "the controller stopped before building its system: {}: {}".format(
+            type(error).__name__, error)
+    if definition_hash(system) != definition_hash(RULE_BASES[copy][0]()):
+        return 'differs', "edit the {} rule base in rulebases.py to match controllers/{}".format(copy, name)
+    return 'matches', "controllers/{}".format(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    controllers = list(RULE_BASES) + list(SHARED_RULE_BASES)
+    parser.add_argument('rule_bases', nargs='*', default=controllers, help="default: all")
+    args = parser.parse_args()
+    for name in args.rule_bases:
+        if name not in controllers:
+            parser.error("unknown rule base '{}', expected one of {}".format(name, controllers))
+
+    differs = []
+    for name in args.rule_bases:
+        status, detail = check(name)
+        print("{:<23} {:<12} {}".format(name, status, detail))
+        if status == 'differs':
+            differs.append(name)
+    if differs:
+        raise SystemExit("rule bases out of sync: {}".format(', '.join(differs)))
+
+if __name__ == '__main__':
+    main()
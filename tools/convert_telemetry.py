@@ -0,0 +1,41 @@
+"""Convert telemetry between CSV and the columnar format.
+
+Each ``.csv`` argument is converted to a ``.col`` file next to it and each
+``.col`` argument back to ``.csv``:
+
+    python tools/convert_telemetry.py controllers/*/robot_performance_data.csv
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.columnar import ColumnarFile, columnar_to_csv, csv_to_columnar  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--chunk-rows', type=int, default=4096)
+    args = parser.parse_args()
+
+    for path in args.paths:
+        stem, extension = os.path.splitext(path)
+        start = time.perf_counter()
+        if extension == '.csv':
+            target = stem + '.col'
+            rows = csv_to_columnar(path, target, args.chunk_rows)
+        elif extension == '.col':
+            target = stem + '.csv'
+            columnar_to_csv(path, target)
+            rows = len(ColumnarFile(path))
+        else:
+            parser.error("'{}' is neither a .csv nor a .col file".format(path))
+        print("{} -> {} ({} rows, {:.3f} s)".format(path, target, rows, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
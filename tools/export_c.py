@@ -0,0 +1,166 @@
+"""Write the fixed-point tables of a rule base as a C header.
+
+The header holds the int16 control surface and / or the uint8 membership,
+rule and output tables of ``obstacle_avoidance.fixedpoint``, with C
+functions running the same integer inference on 8-bit input codes.  It
+needs only ``<stdint.h>``.  ``--engines`` defaults to both for two-input
+rule bases and to ``mamdani`` for the others, which have no surface.  Only the outputs of
+``rulebases.CONSUMED_OUTPUTS`` are exported, where the rule base has an
+entry.  The rule base is checked against its controller first (see
+``tools/check_rulebases.py``), so the header cannot drift from the robot.
+
+``--verify`` then compiles the header with a small driver (``cc``, or
+``--cc``) and runs it over every input code pair, or ``--samples`` random
+codes for more than two inputs.  Every output, and the covered flag of the
+Mamdani engine, must equal ``compute_many`` in Python; the run exits with
+status 1 on any difference.
+
+    python tools/export_c.py H2 -o h2_fuzzy.h --shift 3 --verify
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.fixedpoint import FixedPointMamdani, FixedPointSurface, c_header, c_prefix  # noqa: E402
+from obstacle_avoidance.rulebases import CONSUMED_OUTPUTS, RULE_BASES  # noqa: E402
+from check_rulebases import check  # noqa: E402
+
+ENGINES = ('surface', 'mamdani')
+CFLAGS = ['-std=c99', '-O2', '-Wall', '-Wextra', '-pedantic', '-Werror']
+
+DRIVER = """#include <stdio.h>
+#include "fuzzy.h"
+
+/* Reads {inputs} input codes per line, prints the outputs of each engine */
+int main(void)
+{{
+    uint8_t code[{inputs}];
+    int16_t out[{upper}_OUTPUTS];
+    unsigned int value;
+    int k;
+
+    for (;;) {{
+        for (k = 0; k < {inputs}; k++) {{
+            if (scanf("%u", &value) != 1)
+                return 0;
+            code[k] = (uint8_t)value;
+        }}
+{calls}        putchar('\\n');
+    }}
+}}
+"""
+
+SURFACE_CALL = """        {prefix}_surface_compute(code[0], code[1], out);
+        for (k = 0; k < {upper}_OUTPUTS; k++)
+            printf("%d ", out[k]);
+"""
+
+MAMDANI_CALL = """        value = {prefix}_mamdani_compute(code, out);
+        for (k = 0; k < {upper}_OUTPUTS; k++)
+            printf("%d ", out[k]);
+        printf("%u ", value);
+"""
+
+
+def verify(name, source, surface, mamdani, compiler, samples, seed):
+    """Compile ``source`` and compare the C engines with ``compute_many`` on input codes.
+
+    Returns a description of the differences, or None if there are none.
+    """
+    if shutil.which(compiler) is None:
+        raise SystemExit("--verify needs a C compiler, '{}' was not found (see --cc)".format(compiler))
+    engine = surface or mamdani
+    n_inputs = len(engine.inputs)
+    if n_inputs == 2:
+        codes = np.stack(np.meshgrid(np.arange(256), np.arange(256), indexing='ij'), -1).reshape(-1, 2)
+    else:
+        codes = np.random.default_rng(seed).integers(0, 256, size=(samples, n_inputs))
+
+    expected, labels = [], []
+    if surface is not None:
+        expected.append(surface.compute_many(codes))
+        labels += ['surface ' + label for label in surface.outputs]
+    if mamdani is not None:
+        result, covered = mamdani.compute_many(codes)
+        expected += [result, covered[:, None]]
+        labels += ['mamdani ' + label for label in mamdani.outputs] + ['mamdani covered']
+    expected = np.hstack(expected).astype(np.int64)
+
+    prefix = c_prefix(name)
+    keys = {'prefix': prefix, 'upper': prefix.upper()}
+    calls = (SURFACE_CALL.format(**keys) if surface is not None else '') + \
+        (MAMDANI_CALL.format(**keys) if mamdani is not None else '')
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'fuzzy.h'), 'w') as f:
+            f.write(source)
+        with open(os.path.join(directory, 'main.c'), 'w') as f:
+            f.write(DRIVER.format(inputs=n_inputs, calls=calls, **keys))
+        program = os.path.join(directory, 'verify')
+        build = subprocess.run([compiler] + CFLAGS + ['-o', program, os.path.join(directory, 'main.c')],
+                               capture_output=True, text=True)
+        if build.returncode:
+            raise SystemExit("{}: the header does not compile:\n{}".format(name, build.stderr.strip()))
+        lines = '\n'.join(' '.join(map(str, row)) for row in codes.tolist()) + '\n'
+        run = subprocess.run([program], input=lines, capture_output=True, text=True, check=True)
+    output = np.array(run.stdout.split(), dtype=np.int64).reshape(len(codes), -1)
+
+    differs = (output != expected).any(axis=1)
+    if not differs.any():
+        print("{}: C matches compute_many on {} input codes".format(name, len(codes)))
+        return None
+    row = int(np.argmax(differs))
+    columns = np.flatnonzero(output[row] != expected[row])
+    return "{} of {} input codes differ, e.g. {}: {} is {} in C, {} in Python".format(
+        int(differs.sum()), len(codes), codes[row].tolist(), ', '.join(labels[k] for k in columns),
+        output[row, columns].tolist(), expected[row, columns].tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rule_base', choices=list(RULE_BASES))
+    parser.add_argument('-o', '--output', help="header path, default: <rule_base>_fuzzy.h")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES,
+                        help="default: both for two inputs, otherwise mamdani")
+    parser.add_argument('--shift', type=int, default=3, help="surface nodes every 2**shift codes")
+    parser.add_argument('--verify', action='store_true', help="compile the header and compare it with Python")
+    parser.add_argument('--cc', default=os.environ.get('CC', 'cc'), help="C compiler for --verify, default: $CC or cc")
+    parser.add_argument('--samples', type=int, default=100000, help="random codes verified for more than two inputs")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    status, detail = check(args.rule_base)
+    if status == 'differs':
+        raise SystemExit("{}: the rule base differs from its controller, {}".format(args.rule_base, detail))
+    builder, inputs, outputs = RULE_BASES[args.rule_base]
+    outputs = CONSUMED_OUTPUTS.get(args.rule_base, outputs)
+    if args.engines is None:
+        args.engines = list(ENGINES) if len(inputs) == 2 else ['mamdani']
+    elif 'surface' in args.engines and len(inputs) != 2:
+        parser.error("{} has {} inputs, the surface engine needs two".format(args.rule_base, len(inputs)))
+    system = builder()
+    try:
+        surface = FixedPointSurface(system, inputs, outputs, args.shift) if 'surface' in args.engines else None
+        mamdani = FixedPointMamdani(system, inputs, outputs) if 'mamdani' in args.engines else None
+    except ValueError as error:
+        raise SystemExit("{}: {}".format(args.rule_base, error))
+    source = c_header(args.rule_base, surface, mamdani)
+    path = args.output or '{}_fuzzy.h'.format(args.rule_base.lower())
+    with open(path, 'w') as f:
+        f.write(source)
+    sizes = ["{} {} bytes".format(kind, engine.nbytes) for kind, engine in zip(ENGINES, (surface, mamdani)) if engine]
+    print("{}: tables of {}".format(path, ', '.join(sizes)))
+    if args.verify:
+        problem = verify(args.rule_base, source, surface, mamdani, args.cc, args.samples, args.seed)
+        if problem:
+            raise SystemExit("{}: {}".format(args.rule_base, problem))
+
+if __name__ == '__main__':
+    main()
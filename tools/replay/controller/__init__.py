@@ -0,0 +1,212 @@
+"""Offline stand-in for the Webots ``controller`` module.
+
+Only the part of the API the controllers in this repository use is
+provided: ``Robot`` with ``getBasicTimeStep``, ``step``, ``getTime`` and
+``getDevice``, and the ``DistanceSensor``, ``Motor`` and ``Camera`` devices.
+
+Nothing is simulated.  A ``ReplaySession`` holds recorded sensor streams
+(one value per control step, keyed by device name) and recorded camera
+frames, and captures every motor command.  ``Robot.step()`` advances to the
+next sample and returns -1 once the session has run its number of steps, so
+an unmodified controller script runs as fast as it can compute.
+
+Install a session before the controller creates its ``Robot``::
+
+    import controller
+    session = controller.ReplaySession(sensors={'ps0': values}, steps=500)
+    controller.install(session)
+
+``tools/replay/replay.py`` does that from the command line.  This package
+must never be on the path inside Webots, where it would shadow the real one.
+
+numpy is imported inside the methods that need it, so that like the real
+module, importing this one costs nothing (see ``tools/bench_startup.py``).
+"""
+
+_session = None
+
+
+def install(session):
+    """Make ``session`` the one used by every ``Robot`` created from now on."""
+    global _session
+    _session = session
+
+
+class ReplaySession:
+    def __init__(self, sensors=None, frames=None, steps=None, time_step=32, default_value=0.0,
+                 camera_size=(220, 220), loop=False, prepare=False):
+        self.sensors = {}
+        if sensors:
+            import numpy as np
+            self.sensors = {name: np.asarray(values, dtype=float) for name, values in sensors.items()}
+        self.frames = list(frames or [])
+        lengths = [len(values) for values in self.sensors.values()] + ([len(self.frames)] if self.frames else [])
+        if steps is None:
+            if not lengths:
+                raise ValueError("steps is required when there is nothing to replay")
+            steps = max(lengths)
+        self.steps = steps
+        self.time_step = time_step
+        self.default_value = default_value
+        self.camera_size = camera_size
+        self.loop = loop
+        # Number of completed steps; sample index - 1 is the one being read
+        self.index = 0
+        self.time = 0.0
+        self.motors = []
+        self.commands = []
+        self._bytes = {}
+        self._arrays = {}
+        if prepare:
+            # Build both camera representations up front so their cost is not
+            # charged to the controller steps
+            for self.index in range(1, len(self.frames) + 1):
+                self.frame_bytes()
+                self.frame_array()
+            self.index = 0
+
+    def sample(self, name):
+        values = self.sensors.get(name)
+        if values is None or not len(values):
+            return self.default_value
+        index = max(self.index - 1, 0)
+        if self.loop:
+            index %= len(values)
+        else:
+            index = min(index, len(values) - 1)
+        return float(values[index])
+
+    def frame_index(self):
+        if not self.frames:
+            return None
+        index = max(self.index - 1, 0)
+        return index % len(self.frames) if self.loop else min(index, len(self.frames) - 1)
+
+    def frame(self):
+        """Current BGR frame, or a black one when no frames were recorded."""
+        index = self.frame_index()
+        if index is None:
+            import numpy as np
+            width, height = self.camera_size
+            return np.zeros((height, width, 3), dtype=np.uint8)
+        return self.frames[index]
+
+    def frame_bytes(self):
+        """Current frame as the BGRA bytes ``Camera.getImage()`` returns."""
+        index = self.frame_index()
+        if index not in self._bytes:
+            import numpy as np
+            bgr = self.frame()
+            alpha = np.full(bgr.shape[:2] + (1,), 255, dtype=np.uint8)
+            self._bytes[index] = np.concatenate([bgr, alpha], axis=2).tobytes()
+        return self._bytes[index]
+
+    def frame_array(self):
+        """Current frame as the ``[x][y][rgb]`` list ``Camera.getImageArray()`` returns."""
+        index = self.frame_index()
+        if index not in self._arrays:
+            self._arrays[index] = self.frame()[:, :, ::-1].transpose(1, 0, 2).tolist()
+        return self._arrays[index]
+
+    def advance(self, duration):
+        # The velocities set before a step are the ones the previous sample led to
+        if len(self.commands) < self.index:
+            self.commands.append((self.time,) + tuple(motor.velocity for motor in self.motors))
+        if self.index >= self.steps:
+            return -1
+        self.index += 1
+        self.time += duration / 1000.0
+        return 0
+
+    def command_log(self):
+        """Motor names and a ``steps x (1 + motors)`` array of time and velocities."""
+        import numpy as np
+        names = ('time',) + tuple(motor.name for motor in self.motors)
+        return names, np.array(self.commands, dtype=float).reshape(-1, len(names))
+
+
+class Device:
+    def __init__(self, name, session):
+        self.name = name
+        self.session = session
+        self.sampling_period = 0
+
+    def getName(self):
+        return self.name
+
+    def enable(self, sampling_period):
+        self.sampling_period = sampling_period
+
+    def disable(self):
+        self.sampling_period = 0
+
+    def getSamplingPeriod(self):
+        return self.sampling_period
+
+
+class DistanceSensor(Device):
+    def getValue(self):
+        return self.session.sample(self.name)
+
+
+class Motor(Device):
+    def __init__(self, name, session, max_velocity=6.28):
+        super().__init__(name, session)
+        self.max_velocity = max_velocity
+        self.position = 0.0
+        self.velocity = 0.0
+        session.motors.append(self)
+
+    def setPosition(self, position):
+        self.position = position
+
+    def setVelocity(self, velocity):
+        self.velocity = velocity
+
+    def getVelocity(self):
+        return self.velocity
+
+    def getMaxVelocity(self):
+        return self.max_velocity
+
+
+class Camera(Device):
+    def getWidth(self):
+        return self.session.frame().shape[1]
+
+    def getHeight(self):
+        return self.session.frame().shape[0]
+
+    def getImage(self):
+        return self.session.frame_bytes()
+
+    def getImageArray(self):
+        return self.session.frame_array()
+
+
+class Robot:
+    def __init__(self):
+        if _session is None:
+            raise RuntimeError("No replay session installed; run the controller through tools/replay/replay.py")
+        self.session = _session
+        self.devices = {}
+
+    def getBasicTimeStep(self):
+        return float(self.session.time_step)
+
+    def getTime(self):
+        return self.session.time
+
+    def step(self, duration):
+        return self.session.advance(duration)
+
+    def getDevice(self, name):
+        if name not in self.devices:
+            if 'camera' in name:
+                device = Camera(name, self.session)
+            elif 'motor' in name:
+                device = Motor(name, self.session)
+            else:
+                device = DistanceSensor(name, self.session)
+            self.devices[name] = device
+        return self.devices[name]
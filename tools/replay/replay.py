@@ -0,0 +1,153 @@
+"""Run a controller offline against recorded sensor data and camera frames.
+
+The controller script runs unmodified: the stand-in ``controller`` package
+next to this file replaces the Webots one, replays the recorded streams and
+captures the motor commands.
+
+    python tools/replay/replay.py H2 --sensors controllers/H2/robot_performance_data.csv \
+        --frames synthetic --commands h2_commands.csv
+
+``--sensors`` takes a CSV or columnar (``.col``) file.  A column named after
+a device (``ps0`` ... ``ps7``, ``front infrared sensor``, ...) feeds that
+device.  The ``robot_performance_data`` layout is recognised: ``Left
+Distance`` feeds ps4-ps7 and ``Right Distance`` feeds ps0-ps3, which gives
+the controllers back the inputs they logged.  ``--map DEVICE=COLUMN`` adds
+or overrides entries.
+
+``--frames`` is a directory of images (sorted by name), a ``.npy`` stack of
+BGR frames, or ``synthetic`` for a drifting blue target.  Files the
+controller writes go to ``--workdir`` (a temporary directory by default).
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import os
+import runpy
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..', '..')
+sys.path.insert(0, os.path.join(ROOT, 'libraries', 'python'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+sys.path.insert(0, HERE)
+
+import controller  # noqa: E402
+from obstacle_avoidance.columnar import ColumnarFile  # noqa: E402
+from obstacle_avoidance.telemetry import PERFORMANCE_COLUMNS  # noqa: E402
+
+# Devices fed by the robot_performance_data.csv columns
+PERFORMANCE_MAP = {'ps{}'.format(i): PERFORMANCE_COLUMNS[1] for i in range(4)}
+PERFORMANCE_MAP.update({'ps{}'.format(i): PERFORMANCE_COLUMNS[0] for i in range(4, 8)})
+
+
+def controller_script(name):
+    """Path of a controller given as a name under controllers/ or a path."""
+    if os.path.isfile(name):
+        return os.path.abspath(name)
+    return os.path.abspath(os.path.join(ROOT, 'controllers', name, name + '.py'))
+
+
+def read_table(path):
+    """Column name -> values of a CSV or columnar file."""
+    if path.endswith('.col'):
+        table = ColumnarFile(path)
+        return {name: np.asarray(table.column(name)) for name in table.columns}
+    with open(path, newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        rows = np.array([[float(value) for value in row] for row in reader if row]).reshape(-1, len(header))
+    return {name: rows[:, index] for index, name in enumerate(header)}
+
+
+def load_sensors(path, mapping=None):
+    """Device name -> values, from matching column names plus ``mapping``."""
+    table = read_table(path)
+    streams = {name: values for name, values in table.items()}
+    if all(column in table for column in PERFORMANCE_COLUMNS):
+        streams.update({device: table[column] for device, column in PERFORMANCE_MAP.items()})
+    for device, column in (mapping or {}).items():
+        streams[device] = table[column]
+    return streams
+
+
+def load_frames(source, count=300, size=220):
+    if source is None:
+        return []
+    if source == 'synthetic':
+        from bench_vision import moving_frames
+        return moving_frames(size, count)
+    if source.endswith('.npy'):
+        return list(np.load(source))
+    import cv2
+    return [cv2.imread(path) for path in sorted(glob.glob(os.path.join(source, '*')))]
+
+
+def run_controller(script, session, workdir, quiet=True):
+    """Run ``script`` as ``__main__`` against ``session``; returns the wall time."""
+    controller.install(session)
+    previous_dir = os.getcwd()
+    previous_path = list(sys.path)
+    sys.path.insert(0, os.path.dirname(script))
+    os.chdir(workdir)
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+            runpy.run_path(script, run_name='__main__')
+    finally:
+        elapsed = time.perf_counter() - start
+        os.chdir(previous_dir)
+        sys.path[:] = previous_path
+        controller.install(None)
+    return elapsed
+
+
+def save_commands(session, path):
+    names, log = session.command_log()
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(names)
+        writer.writerows(log.tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('controller', help="name of a directory under controllers/, or a script path")
+    parser.add_argument('--sensors', help="CSV or .col file with the sensor streams")
+    parser.add_argument('--map', nargs='*', default=[], metavar='DEVICE=COLUMN')
+    parser.add_argument('--frames', help="image directory, .npy stack or 'synthetic'")
+    parser.add_argument('--steps', type=int, help="number of steps (default: length of the recording)")
+    parser.add_argument('--loop', action='store_true', help="wrap around the recording")
+    parser.add_argument('--time-step', type=int, default=32)
+    parser.add_argument('--commands', help="write the captured motor commands to this CSV")
+    parser.add_argument('--workdir', help="directory the controller runs in")
+    parser.add_argument('--verbose', action='store_true', help="keep the controller's own output")
+    args = parser.parse_args()
+
+    mapping = dict(item.split('=', 1) for item in args.map)
+    sensors = load_sensors(args.sensors, mapping) if args.sensors else {}
+    frames = load_frames(args.frames, count=args.steps or 300)
+    session = controller.ReplaySession(sensors, frames, steps=args.steps, time_step=args.time_step,
+                                       loop=args.loop)
+
+    script = controller_script(args.controller)
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory())
+        elapsed = run_controller(script, session, workdir, quiet=not args.verbose)
+
+    print("{}: {} steps in {:.2f} s ({:.0f} steps/s, {:.1f}x real time)".format(
+        os.path.basename(script), len(session.commands), elapsed, len(session.commands) / elapsed,
+        session.time / elapsed))
+    if args.commands:
+        save_commands(session, args.commands)
+        print("motor commands -> {}".format(args.commands))
+
+
+if __name__ == "__main__":
+    main()
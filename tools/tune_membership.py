@@ -0,0 +1,70 @@
+"""Tune the distance controllers' override threshold and membership functions with CMA-ES on all cores.
+
+Evaluates candidate override thresholds, and with ``--cruise fuzzy`` the
+membership breakpoints, in headless episodes of the batched arena
+simulator (see obstacle_avoidance.tuning), checkpoints after every
+generation and writes the best parameters to a file the controllers load
+through their FUZZY_PARAMS setting.  ``--cruise`` must match the CRUISE of
+the controller that loads the file: 'straight' (their default, the fuzzy
+speeds are never used) or 'fuzzy'.  Run it again with the same checkpoint
+to resume.
+
+    python tools/tune_membership.py --generations 40 --checkpoint tuning.json --out fuzzy_params.json
+    python tools/tune_membership.py --cruise fuzzy --inputs front --out h2_fuzzy_params.json
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libraries', 'python'))
+
+from obstacle_avoidance.parameters import save_parameters  # noqa: E402
+from obstacle_avoidance.tuning import (COLLISION_WEIGHT, CRUISES, H2_TERMS, SMOOTHNESS_WEIGHT,  # noqa: E402
+                                       INPUT_RULE_BASES, THRESHOLD_RANGE, ParameterSpace, default_config, tune)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--generations', type=int, default=30)
+    parser.add_argument('--population', type=int, default=None, help="candidates per generation (default 4 + 3 ln n)")
+    parser.add_argument('--sigma', type=float, default=0.2, help="initial step, as a share of each range")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument('--robots', type=int, default=64, help="robots per episode")
+    parser.add_argument('--steps', type=int, default=300, help="steps per episode")
+    parser.add_argument('--episodes', type=int, default=2)
+    parser.add_argument('--cruise', choices=CRUISES, default='straight',
+                        help="CRUISE of the controllers the file is for; only 'fuzzy' tunes the membership functions")
+    parser.add_argument('--inputs', choices=list(INPUT_RULE_BASES), default='groups',
+                        help="fuzzy inputs and rule base: ps7/ps0 (H2) or group minima (my_controller1, cobain1)")
+    parser.add_argument('--world', default=None, help="world file (default: worlds/OBSTACLE ARENA.wbt)")
+    parser.add_argument('--collision-weight', type=float, default=COLLISION_WEIGHT)
+    parser.add_argument('--smoothness-weight', type=float, default=SMOOTHNESS_WEIGHT)
+    parser.add_argument('--fixed-threshold', action='store_true', help="keep the override threshold at 100")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', default=None, help="state file, resumed from when it exists")
+    parser.add_argument('--out', default='fuzzy_params.json')
+    args = parser.parse_args()
+
+    terms = H2_TERMS if args.cruise == 'fuzzy' else ()
+    if not terms and args.fixed_threshold:
+        parser.error("--fixed-threshold leaves nothing to tune with --cruise straight")
+    space = ParameterSpace(terms, threshold_range=None if args.fixed_threshold else THRESHOLD_RANGE)
+    config = default_config(robots=args.robots, steps=args.steps, episodes=args.episodes, seed=args.seed,
+                            cruise=args.cruise, inputs=args.inputs, world=args.world, collision_weight=args.collision_weight,
+                            smoothness_weight=args.smoothness_weight)
+    result = tune(space, config, args.generations, population=args.population, sigma=args.sigma,
+                  workers=args.workers, checkpoint=args.checkpoint, seed=args.seed)
+
+    parameters = dict(result['parameters'], cruise=args.cruise, score=result['score'], baseline=result['baseline'],
+                      generation=result['generation'], config=config)
+    if args.cruise == 'fuzzy':
+        # What the terms were tuned with, checked by the controllers that load them
+        parameters.update(rule_base=INPUT_RULE_BASES[args.inputs], inputs=args.inputs)
+    save_parameters(args.out, parameters)
+    print("best score {:.4f} against {:.4f} for the hand-picked parameters, written to {}".format(
+        result['score']['score'], result['baseline']['score'], args.out))
+
+
+if __name__ == '__main__':
+    main()